@@ -3,9 +3,9 @@ from sqlalchemy import engine_from_config, pool
 from alembic import context
 import os
 import sys
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'app')))
-from db import Base
-from models import models  # noqa: F401
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app.db import Base
+from app.models import models  # noqa: F401
 
 config = context.config
 fileConfig(config.config_file_name)
@@ -0,0 +1,31 @@
+"""
+Add sync_changes: monotonic change sequence backing delta sync
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table('sync_changes',
+        sa.Column('seq', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('entity', sa.String(), nullable=False),
+        sa.Column('entity_id', sa.Integer(), nullable=False),
+        sa.Column('op', sa.String(), nullable=False),
+        sa.Column('worker_id', sa.Integer()),
+        sa.Column('job_id', sa.Integer()),
+        sa.Column('changed_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sqlite_autoincrement=True,
+    )
+    op.create_index('ix_sync_changes_worker_seq', 'sync_changes', ['worker_id', 'seq'])
+    op.create_index('ix_sync_changes_job_seq', 'sync_changes', ['job_id', 'seq'])
+    op.create_index('ix_sync_changes_entity_seq', 'sync_changes', ['entity', 'seq'])
+
+def downgrade():
+    op.drop_index('ix_sync_changes_entity_seq', table_name='sync_changes')
+    op.drop_index('ix_sync_changes_job_seq', table_name='sync_changes')
+    op.drop_index('ix_sync_changes_worker_seq', table_name='sync_changes')
+    op.drop_table('sync_changes')
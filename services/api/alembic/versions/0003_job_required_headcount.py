@@ -0,0 +1,17 @@
+"""
+Add jobs.required_headcount used by the dispatch optimizer
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.add_column('jobs', sa.Column('required_headcount', sa.Integer(), nullable=False, server_default='1'))
+
+def downgrade():
+    with op.batch_alter_table('jobs') as batch_op:
+        batch_op.drop_column('required_headcount')
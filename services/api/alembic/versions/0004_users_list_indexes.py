@@ -0,0 +1,18 @@
+"""
+Add users indexes backing keyset pagination, sorting and filters of GET /api/users
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_index('ix_users_name_id', 'users', ['name', 'id'])
+    op.create_index('ix_users_role_id', 'users', ['role', 'id'])
+
+def downgrade():
+    op.drop_index('ix_users_role_id', table_name='users')
+    op.drop_index('ix_users_name_id', table_name='users')
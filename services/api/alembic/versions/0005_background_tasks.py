@@ -0,0 +1,39 @@
+"""
+Add background_tasks: persistent queue for the background task workers
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table('background_tasks',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('kind', sa.String(), nullable=False),
+        sa.Column('status', sa.String(), nullable=False, server_default='queued'),
+        sa.Column('priority', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('payload', sa.JSON()),
+        sa.Column('result', sa.JSON()),
+        sa.Column('error', sa.Text()),
+        sa.Column('progress', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('progress_message', sa.String()),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('max_attempts', sa.Integer(), nullable=False, server_default='3'),
+        sa.Column('run_after', sa.DateTime(), nullable=False),
+        sa.Column('lease_until', sa.DateTime()),
+        sa.Column('worker', sa.String()),
+        sa.Column('created_by', sa.Integer(), sa.ForeignKey('users.id')),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column('started_at', sa.DateTime()),
+        sa.Column('finished_at', sa.DateTime()),
+    )
+    op.create_index('ix_background_tasks_claim', 'background_tasks', ['status', 'priority', 'run_after'])
+    op.create_index('ix_background_tasks_created_by', 'background_tasks', ['created_by', 'id'])
+
+def downgrade():
+    op.drop_index('ix_background_tasks_created_by', table_name='background_tasks')
+    op.drop_index('ix_background_tasks_claim', table_name='background_tasks')
+    op.drop_table('background_tasks')
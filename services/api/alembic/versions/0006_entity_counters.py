@@ -0,0 +1,23 @@
+"""
+Add entity_counters: denormalized per-user/per-job counts maintained on write
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table('entity_counters',
+        sa.Column('entity', sa.String(), primary_key=True),
+        sa.Column('entity_id', sa.Integer(), primary_key=True),
+        sa.Column('name', sa.String(), primary_key=True),
+        sa.Column('bucket', sa.String(), primary_key=True, server_default=''),
+        sa.Column('value', sa.Integer(), nullable=False, server_default='0'),
+    )
+    # Existing rows are counted by running reconcile_counters.py once after upgrading
+
+def downgrade():
+    op.drop_table('entity_counters')
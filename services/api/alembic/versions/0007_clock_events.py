@@ -0,0 +1,29 @@
+"""
+Add clock_events: accepted clock-in/out events, deduplicated by client idempotency key
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table('clock_events',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('worker_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=False),
+        sa.Column('idempotency_key', sa.String(), nullable=False),
+        sa.Column('job_id', sa.Integer(), sa.ForeignKey('jobs.id'), nullable=False),
+        sa.Column('kind', sa.String(), nullable=False),
+        sa.Column('occurred_at', sa.DateTime(), nullable=False),
+        sa.Column('received_at', sa.DateTime(), nullable=False),
+        sa.Column('time_entry_id', sa.Integer(), sa.ForeignKey('time_entries.id')),
+        sa.UniqueConstraint('worker_id', 'idempotency_key', name='uq_clock_events_worker_key'),
+    )
+    # Finding a worker's open entry on clock-out
+    op.create_index('ix_time_entries_worker_open', 'time_entries', ['worker_id', 'end_time'])
+
+def downgrade():
+    op.drop_index('ix_time_entries_worker_open', table_name='time_entries')
+    op.drop_table('clock_events')
@@ -1,9 +1,266 @@
-from sqlalchemy import create_engine
+from sqlalchemy import Index, create_engine, event, inspect, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.schema import CreateColumn, CreateIndex
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker, declarative_base
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
 import os
+import re
+import threading
+import time
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./test.db")
+# WAL lets readers run alongside the writer and makes commits much cheaper; set to false to keep the rollback journal
+SQLITE_WAL = os.getenv("SQLITE_WAL", "true").lower() not in ("0", "false", "no")
+
+# Tenants (contractor companies), each with its own database. Empty: a single
+# database at DATABASE_URL, served as the "default" tenant.
+DEFAULT_TENANT = "default"
+TENANT_NAME = re.compile(r"^[a-z0-9](?:[a-z0-9-]{0,30}[a-z0-9])?$")
+TENANTS = [t.strip().lower() for t in os.getenv("TENANTS", "").split(",") if t.strip()]
+# Database of each tenant; the default tenant always uses DATABASE_URL.
+# Default for SQLite: tenants/{tenant}.db next to the DATABASE_URL file
+TENANT_DATABASE_URL = os.getenv("TENANT_DATABASE_URL", "")
+# Engines kept open at once (least recently used closed first) and idle time before closing one
+TENANT_ENGINE_CACHE = int(os.getenv("TENANT_ENGINE_CACHE", "16"))
+TENANT_ENGINE_IDLE_SECONDS = float(os.getenv("TENANT_ENGINE_IDLE_SECONDS", "600"))
+IDLE_SWEEP_SECONDS = 30
+
+for _name in TENANTS:
+    if not TENANT_NAME.match(_name):
+        raise ValueError(f"Invalid tenant name in TENANTS: {_name!r}")
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {})
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
+
+# Tenant of the current request or task; set by TenantMiddleware (app/utils/tenancy.py) and the task workers
+current_tenant: ContextVar[str] = ContextVar("current_tenant", default=DEFAULT_TENANT)
+
+
+def tenants() -> list:
+    """Names of all tenants this deployment serves"""
+    return list(TENANTS) if TENANTS else [DEFAULT_TENANT]
+
+
+def is_tenant(name: str) -> bool:
+    return name in (TENANTS or (DEFAULT_TENANT,))
+
+
+@contextmanager
+def use_tenant(tenant: str):
+    """Run a block (a task, a script step) against one tenant's database"""
+    token = current_tenant.set(tenant)
+    try:
+        yield
+    finally:
+        current_tenant.reset(token)
+
+
+def tenant_url(tenant: str) -> str:
+    if tenant == DEFAULT_TENANT:
+        return DATABASE_URL
+    if not TENANT_NAME.match(tenant):
+        raise ValueError(f"Invalid tenant name: {tenant!r}")
+    if TENANT_DATABASE_URL:
+        return TENANT_DATABASE_URL.format(tenant=tenant)
+    url = make_url(DATABASE_URL)
+    if url.get_backend_name() != "sqlite":
+        raise ValueError("Set TENANT_DATABASE_URL to give each tenant a database")
+    directory = os.path.dirname(url.database or "") or "."
+    return url.set(database=os.path.join(directory, "tenants", f"{tenant}.db")).render_as_string(hide_password=False)
+
+
+def _sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    # Wait for a competing writer (other process) instead of failing with "database is locked"
+    cursor.execute("PRAGMA busy_timeout=5000")
+    if SQLITE_WAL:
+        cursor.execute("PRAGMA journal_mode=WAL")
+        # Durable at checkpoints rather than every commit; safe against corruption in WAL mode
+        cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.close()
+
+
+def _create_engine(url: str):
+    is_sqlite = url.startswith("sqlite")
+    if is_sqlite:
+        database = make_url(url).database
+        if database and database != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(database)), exist_ok=True)
+    engine = create_engine(url, connect_args={"check_same_thread": False} if is_sqlite else {})
+    if is_sqlite:
+        event.listen(engine, "connect", _sqlite_pragmas)
+    return engine
+
+
+def missing_schema(engine) -> list:
+    """Tables, columns and indexes of the models that the database lacks: [(table, None | Column | Index)]"""
+    inspector = inspect(engine)
+    existing = set(inspector.get_table_names())
+    missing = []
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing:
+            missing.append((table, None))
+            continue
+        columns = {c["name"] for c in inspector.get_columns(table.name)}
+        missing.extend((table, column) for column in table.columns if column.name not in columns)
+        indexes = {i["name"] for i in inspector.get_indexes(table.name)}
+        missing.extend((table, index) for index in table.indexes if index.name not in indexes)
+    return missing
+
+
+def upgrade_schema(engine) -> list:
+    """
+    Bring tables created by an older version up to the models. create_all()
+    only creates missing tables, so columns and indexes added to existing
+    tables since (e.g. jobs.required_headcount) are added here. New columns
+    must be nullable or have a server default. Returns what was added.
+    """
+    added = []
+    for table, item in missing_schema(engine):
+        if item is None:
+            continue  # Missing tables are create_all()'s
+        if isinstance(item, Index):
+            with engine.begin() as connection:
+                connection.execute(CreateIndex(item, if_not_exists=True))
+            added.append(item.name)
+            continue
+        ddl = CreateColumn(item).compile(dialect=engine.dialect)
+        try:
+            with engine.begin() as connection:
+                connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {ddl}"))
+        except OperationalError:
+            # Another process starting at the same time may have added it
+            if item.name not in {c["name"] for c in inspect(engine).get_columns(table.name)}:
+                raise
+            continue
+        added.append(f"{table.name}.{item.name}")
+    return added
+
+
+# setup(tenant, engine) callbacks run when an engine is opened, e.g. to create the schema of a new tenant database
+engine_setup = []
+
+
+class _OpenEngine:
+    __slots__ = ("engine", "last_used")
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.last_used = time.monotonic()
+
+
+class EngineRegistry:
+    """
+    One engine per tenant database, opened on first use and kept in an LRU:
+    beyond TENANT_ENGINE_CACHE the least recently used engine is closed, and
+    engines idle for TENANT_ENGINE_IDLE_SECONDS are closed as well. Closing
+    disposes the connection pool; connections checked out at that moment
+    finish normally, and the next use opens the engine again.
+    """
+
+    def __init__(self, capacity: int = TENANT_ENGINE_CACHE, idle_seconds: float = TENANT_ENGINE_IDLE_SECONDS):
+        self.capacity = max(capacity, 1)
+        self.idle_seconds = idle_seconds
+        self.engines = OrderedDict()  # tenant -> _OpenEngine, least recently used first
+        # Reentrant: engine_setup callbacks open sessions on the engine being set up
+        self.lock = threading.RLock()
+        self.swept_at = time.monotonic()
+        self.opened = 0
+        self.evicted = 0
+        self.closed_idle = 0
+
+    def get(self, tenant: str):
+        now = time.monotonic()
+        entry = self.engines.get(tenant)
+        if entry is not None:
+            entry.last_used = now
+            if now - self.swept_at < IDLE_SWEEP_SECONDS:
+                with self.lock:
+                    if tenant in self.engines:
+                        self.engines.move_to_end(tenant)
+                return entry.engine
+        with self.lock:
+            if now - self.swept_at >= IDLE_SWEEP_SECONDS:
+                self.close_idle(keep=tenant)
+            entry = self.engines.get(tenant)
+            if entry is None:
+                if not is_tenant(tenant):
+                    raise LookupError(f"Unknown tenant: {tenant}")
+                entry = _OpenEngine(_create_engine(tenant_url(tenant)))
+                self.engines[tenant] = entry
+                try:
+                    for setup in engine_setup:
+                        setup(tenant, entry.engine)
+                except BaseException:
+                    del self.engines[tenant]
+                    entry.engine.dispose()
+                    raise
+                self.opened += 1
+                while len(self.engines) > self.capacity:
+                    _, oldest = self.engines.popitem(last=False)
+                    oldest.engine.dispose()
+                    self.evicted += 1
+            self.engines.move_to_end(tenant)
+            entry.last_used = now
+            return entry.engine
+
+    def close_idle(self, keep: str = None):
+        with self.lock:
+            self.swept_at = time.monotonic()
+            for tenant, entry in list(self.engines.items()):
+                if tenant != keep and self.swept_at - entry.last_used > self.idle_seconds:
+                    del self.engines[tenant]
+                    entry.engine.dispose()
+                    self.closed_idle += 1
+
+    def dispose_all(self):
+        with self.lock:
+            for entry in self.engines.values():
+                entry.engine.dispose()
+            self.engines.clear()
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        return {
+            "tenants": len(tenants()),
+            "capacity": self.capacity,
+            "idle_seconds": self.idle_seconds,
+            "open": {tenant: round(now - entry.last_used, 1) for tenant, entry in list(self.engines.items())},
+            "opened": self.opened,
+            "evicted": self.evicted,
+            "closed_idle": self.closed_idle,
+        }
+
+
+engines = EngineRegistry()
+
+
+def get_engine(tenant: str = None):
+    """Engine of a tenant's database (the current tenant by default)"""
+    return engines.get(tenant or current_tenant.get())
+
+
+_session_factory = sessionmaker(autocommit=False, autoflush=False)
+
+
+def begin_write(session):
+    """
+    Start the session's transaction now, holding SQLite's write lock.
+    pysqlite only opens a transaction at the first INSERT/UPDATE/DELETE, so a
+    SAVEPOINT issued before that starts (and its release commits) the whole
+    transaction; call this before using session.begin_nested(), and before
+    reads whose results decide what is written (no other writer can commit
+    in between).
+    """
+    if session.get_bind().dialect.name == "sqlite":
+        session.execute(text("BEGIN IMMEDIATE"))
+
+
+def SessionLocal(tenant: str = None):
+    """New session on a tenant's database (the current tenant by default)"""
+    tenant = tenant or current_tenant.get()
+    session = _session_factory(bind=get_engine(tenant))
+    session.info["tenant"] = tenant
+    return session
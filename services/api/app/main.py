@@ -1,9 +1,47 @@
 ﻿
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.routers import auth, users, logs
+from app.routers import auth, users, logs, sync, batch, admin, dispatch, availability, tasks, clock
+from app.db import engines
+from app.utils.admission import admission
+from app.utils.backup import backup_scheduler
+from app.utils.clock_ingest import clock_writer
+from app.utils.compression import CompressionMiddleware
+from app.utils.profiling import profiling_middleware
+from app.utils.tenancy import TenantMiddleware
+from app.utils.tasks import TASK_WORKERS, task_pool
 
-app = FastAPI(title="Worker App API", version="0.1")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Background task workers run next to the API (TASK_WORKERS=0 to run them separately)
+    task_pool.start(TASK_WORKERS)
+    # Scheduled online backups (BACKUP_INTERVAL_MINUTES=0, the default, disables them)
+    backup_scheduler.start()
+    yield
+    backup_scheduler.stop()
+    for _, writer in clock_writer.instances():
+        writer.stop()
+    task_pool.stop()
+    engines.dispose_all()
+
+
+app = FastAPI(title="Worker App API", version="0.1", lifespan=lifespan)
+
+# Opt-in per-request profiling (X-Profile: 1 from an admin, or PROFILE_SAMPLE_RATE)
+app.middleware("http")(profiling_middleware)
+
+# Per-user/global rate limits and read/write concurrency caps (see app/utils/admission.py).
+# Registered before CORS so that CORS stays outermost and 429/503 responses carry its headers.
+app.middleware("http")(admission)
+
+# gzip (or brotli/zstd when installed) for large JSON, ETag/304 and a cache of compressed bodies
+app.add_middleware(CompressionMiddleware)
+
+# Tenant of each request (host name, checked against the token) for database routing and per-tenant limits.
+# Outside admission so rate limits and write lanes are per tenant; unknown tenants are rejected here.
+app.add_middleware(TenantMiddleware)
 
 # CORS for local dev
 app.add_middleware(
@@ -23,3 +61,10 @@ def healthz():
 app.include_router(auth.router, prefix="/api/auth", tags=["auth"])
 app.include_router(users.router, prefix="/api/users", tags=["users"])
 app.include_router(logs.router, prefix="/api/logs", tags=["logs"])
+app.include_router(sync.router, prefix="/api/sync", tags=["sync"])
+app.include_router(batch.router, prefix="/api/batch", tags=["batch"])
+app.include_router(dispatch.router, prefix="/api/dispatch", tags=["dispatch"])
+app.include_router(availability.router, prefix="/api/availability", tags=["availability"])
+app.include_router(admin.router, prefix="/api/admin", tags=["admin"])
+app.include_router(tasks.router, prefix="/api/tasks", tags=["tasks"])
+app.include_router(clock.router, prefix="/api/clock", tags=["clock"])
\ No newline at end of file
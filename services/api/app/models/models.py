@@ -16,6 +16,11 @@ class User(Base):
     # Relationships
     assignments = relationship('JobAssignment', back_populates='worker')
     expertise = relationship('WorkerExpertise', back_populates='worker')
+    # Keyset pagination and filters of the user list (email is already indexed by its unique constraint)
+    __table_args__ = (
+        Index('ix_users_name_id', 'name', 'id'),
+        Index('ix_users_role_id', 'role', 'id'),
+    )
 
 class ActivityLog(Base):
     __tablename__ = 'activity_logs'
@@ -41,6 +46,7 @@ class Job(Base):
     planned_start = Column(DateTime(timezone=True), nullable=False)
     planned_end = Column(DateTime(timezone=True), nullable=False)
     status = Column(String, nullable=False, default='planned')
+    required_headcount = Column(Integer, nullable=False, default=1, server_default='1')  # Workers needed on site
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     # Relationships
@@ -75,6 +81,9 @@ class TimeEntry(Base):
     # Relationships
     job = relationship('Job', back_populates='time_entries')
     worker = relationship('User')
+    __table_args__ = (
+        Index('ix_time_entries_worker_open', 'worker_id', 'end_time'),  # Open entries on clock-out
+    )
 
 class JobChangeLog(Base):
     __tablename__ = 'job_change_log'
@@ -147,3 +156,69 @@ class JobRequiredExpertise(Base):
     __table_args__ = (
         UniqueConstraint('job_id', 'expertise_id', name='uq_job_required_expertise'),
     )
+
+class SyncChange(Base):
+    __tablename__ = 'sync_changes'
+    seq = Column(Integer, primary_key=True, autoincrement=True)  # Monotonic change sequence, used as the sync token
+    entity = Column(String, nullable=False)  # job, assignment, time_entry, worker_expertise, expertise, user
+    entity_id = Column(Integer, nullable=False)
+    op = Column(String, nullable=False)  # upsert, delete, deactivate
+    worker_id = Column(Integer, nullable=True)  # Worker the changed row belongs to (NULL for jobs and catalog rows)
+    job_id = Column(Integer, nullable=True)  # Job the changed row belongs to
+    changed_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index('ix_sync_changes_worker_seq', 'worker_id', 'seq'),
+        Index('ix_sync_changes_job_seq', 'job_id', 'seq'),
+        Index('ix_sync_changes_entity_seq', 'entity', 'seq'),
+        {'sqlite_autoincrement': True},
+    )
+
+class BackgroundTask(Base):
+    __tablename__ = 'background_tasks'
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String, nullable=False)  # Registered handler name, e.g. 'users_export'
+    status = Column(String, nullable=False, default='queued')  # queued, running, succeeded, failed
+    priority = Column(Integer, nullable=False, default=0)  # Higher runs first
+    payload = Column(JSON, nullable=True)
+    result = Column(JSON, nullable=True)
+    error = Column(Text, nullable=True)  # Last failure (kept across retries)
+    progress = Column(Integer, nullable=False, default=0)  # Percent
+    progress_message = Column(String, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    run_after = Column(DateTime, nullable=False)  # Naive UTC; retries are pushed back with backoff
+    lease_until = Column(DateTime, nullable=True)  # Running task is reclaimed if its worker stops renewing this
+    worker = Column(String, nullable=True)  # Process that holds / last held the task
+    created_by = Column(Integer, ForeignKey('users.id'), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index('ix_background_tasks_claim', 'status', 'priority', 'run_after'),
+        Index('ix_background_tasks_created_by', 'created_by', 'id'),
+    )
+
+class EntityCounter(Base):
+    __tablename__ = 'entity_counters'
+    entity = Column(String, primary_key=True)  # user, job
+    entity_id = Column(Integer, primary_key=True)
+    name = Column(String, primary_key=True)  # assignments, open_completions, time_entries, ...
+    bucket = Column(String, primary_key=True, default='')  # '' for totals, week start (YYYY-MM-DD, Monday) for weekly counts
+    value = Column(Integer, nullable=False, default=0)
+
+class ClockEvent(Base):
+    __tablename__ = 'clock_events'
+    id = Column(Integer, primary_key=True, index=True)
+    worker_id = Column(Integer, ForeignKey('users.id'), nullable=False)
+    idempotency_key = Column(String, nullable=False)  # Chosen by the client; retries reuse it
+    job_id = Column(Integer, ForeignKey('jobs.id'), nullable=False)
+    kind = Column(String, nullable=False)  # in, out
+    occurred_at = Column(DateTime, nullable=False)  # Naive UTC, as reported by the device
+    received_at = Column(DateTime, nullable=False)
+    time_entry_id = Column(Integer, ForeignKey('time_entries.id'), nullable=True)  # Entry opened or closed
+
+    __table_args__ = (
+        UniqueConstraint('worker_id', 'idempotency_key', name='uq_clock_events_worker_key'),
+    )
@@ -0,0 +1,117 @@
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
+from fastapi.responses import JSONResponse
+
+from app.db import current_tenant, engines
+from app.routers.auth import get_current_user
+from app.utils.admission import admission
+from app.utils.availability import availability_index
+from app.utils.backup import backup_scheduler
+from app.utils.clock_ingest import clock_writer
+from app.utils.compression import compressor
+from app.utils.refdata import refdata
+from app.utils.tasks import task_pool
+from app.utils import profiling
+
+router = APIRouter()
+
+
+def require_admin(current_user: dict = Depends(get_current_user)):
+    if current_user.get("role") != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only administrators can view server diagnostics"
+        )
+    return current_user
+
+
+@router.get("/admission")
+def admission_stats(current_user: dict = Depends(require_admin)):
+    """
+    Admission control counters: rate-limit rejections, per-lane concurrency,
+    queue depth, load shed and recent queue waits.
+    """
+    return admission.stats()
+
+
+@router.get("/availability")
+def availability_stats(current_user: dict = Depends(require_admin)):
+    """Availability bitmap index: horizon, indexed workers, memory and refresh counters"""
+    return availability_index.stats()
+
+
+@router.get("/backups")
+def backup_stats(current_user: dict = Depends(require_admin)):
+    """
+    Online database backups: schedule, rotation settings and the stored snapshots
+    with their throughput and writer lock-wait impact. Take one with the `db_backup` task.
+    """
+    return backup_scheduler.stats()
+
+
+@router.get("/clock")
+def clock_stats(current_user: dict = Depends(require_admin)):
+    """Clock event ingestion: events per outcome, group-commit sizes and last commit time"""
+    return clock_writer.stats()
+
+
+@router.get("/compression")
+def compression_stats(current_user: dict = Depends(require_admin)):
+    """Response compression: bytes saved per encoding, 304 revalidations and compressed-body cache"""
+    return compressor.stats()
+
+
+@router.get("/refdata")
+def refdata_stats(current_user: dict = Depends(require_admin)):
+    """Reference-data cache: version, loads, hit ratio and memory footprint"""
+    return refdata.stats()
+
+
+@router.get("/tasks")
+def task_stats(current_user: dict = Depends(require_admin)):
+    """Background task queue: tasks per status, age of the oldest due task and local workers"""
+    return task_pool.stats()
+
+
+@router.get("/tenants")
+def tenant_stats(current_user: dict = Depends(require_admin)):
+    """Tenant database engines: which are open (seconds since last use), LRU evictions and idle closes"""
+    return {"tenant": current_tenant.get(), **engines.stats()}
+
+
+@router.get("/profiles")
+def list_profiles(current_user: dict = Depends(require_admin)):
+    """Stored request profiles, newest first"""
+    return profiling.list_profiles()
+
+
+@router.get("/profiles/{profile_id}")
+def download_profile(
+    profile_id: str,
+    format: str = Query(default="speedscope", pattern="^(speedscope|pstats|raw)$"),
+    current_user: dict = Depends(require_admin),
+):
+    """
+    Download a request profile: `speedscope` (open at speedscope.app), `pstats`
+    (python -m pstats / snakeviz) or `raw` (samples plus captured SQL with timings).
+    """
+    try:
+        data = profiling.load_profile(profile_id)
+    except (OSError, ValueError):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profile not found")
+
+    if format == "pstats":
+        try:
+            content = profiling.to_pstats(data)
+        except ValueError as e:
+            # Shorter than PROFILE_INTERVAL_MS: use the raw format for its SQL and timings
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+        return Response(
+            content=content,
+            media_type="application/octet-stream",
+            headers={"Content-Disposition": f'attachment; filename="{profile_id}.pstats"'},
+        )
+    content = profiling.to_speedscope(data) if format == "speedscope" else data
+    return JSONResponse(
+        content=content,
+        headers={"Content-Disposition": f'attachment; filename="{profile_id}.{format}.json"'},
+    )
@@ -2,9 +2,12 @@ from fastapi import APIRouter, HTTPException, status, Depends, Header
 from pydantic import BaseModel
 from typing import Optional
 
-from app.db import SessionLocal, engine, Base
+from app.db import (
+    DEFAULT_TENANT, SessionLocal, Base, current_tenant, engine_setup, get_engine, is_tenant, upgrade_schema,
+)
 from app.models.models import User
 from app.utils.password import verify_password
+from app.utils.tenancy import split_token, tenant_token
 
 router = APIRouter()
 
@@ -42,16 +45,19 @@ class MeResponse(BaseModel):
     email: str
 
 
-def _ensure_db_and_seed():
+def _ensure_db_and_seed(tenant: str, engine):
     """Create tables (if missing) and insert seed users when not present.
 
     This is intentionally simple for local/dev testing so the SQLite file
     will contain default users which can be persisted by Docker volumes.
+    Runs whenever a tenant's database is opened (see engine_setup in app/db.py).
     """
-    # Create tables if not already created
+    # Create tables if not already created, and add columns/indexes that
+    # databases created by an older version lack
     Base.metadata.create_all(bind=engine)
+    upgrade_schema(engine)
 
-    db = SessionLocal()
+    db = SessionLocal(tenant)
     try:
         # Only insert seed users if the users table is empty
         user_count = db.query(User).count()
@@ -69,8 +75,11 @@ def _ensure_db_and_seed():
         db.close()
 
 
+engine_setup.append(_ensure_db_and_seed)
+
 # Ensure seed users exist on import so the DB file is populated for tests
-_ensure_db_and_seed()
+if is_tenant(DEFAULT_TENANT):
+    get_engine(DEFAULT_TENANT)
 
 
 @router.post("/login", response_model=LoginResponse)
@@ -84,7 +93,7 @@ def login(data: LoginRequest):
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
         # Return a user-specific demo token that includes the user ID
         return {
-            "access_token": f"demo-token-{user.id}-{user.role}",
+            "access_token": tenant_token(f"demo-token-{user.id}-{user.role}", current_tenant.get()),
             "role": user.role,
             "name": user.name,
             "user_id": user.id,
@@ -94,15 +103,19 @@ def login(data: LoginRequest):
         db.close()
 
 
+def token_user_id(token: str) -> int:
+    """Extract the user ID from token format: demo-token-{id}-{role}[@{tenant}]"""
+    parts = split_token(token)[0].replace("demo-token-", "").split("-")
+    return int(parts[0])
+
+
 def get_current_user(authorization: str | None = Header(default=None)):
     token = authorization or "demo-token-1-admin"
     if not token.startswith("demo-token-"):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
     
-    # Extract user ID from token format: demo-token-{id}-{role}
     try:
-        parts = token.replace("demo-token-", "").split("-")
-        user_id = int(parts[0])
+        user_id = token_user_id(token)
     except (ValueError, IndexError):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token format")
 
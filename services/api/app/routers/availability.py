@@ -0,0 +1,81 @@
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from typing import List, Optional
+from pydantic import BaseModel
+from datetime import datetime, timedelta
+
+from app.db import SessionLocal
+from app.models.models import User
+from app.routers.auth import get_current_user
+from app.utils.availability import SLOT_SECONDS, availability_index
+from app.utils.refdata import refdata
+from app.utils.timeutil import naive_utc, to_epoch, utc_now
+
+router = APIRouter()
+
+
+class WindowWorker(BaseModel):
+    id: int
+    name: str
+
+
+class FreeWindow(BaseModel):
+    start: datetime
+    end: datetime
+    workers: List[WindowWorker]  # Every matching worker free for the whole window
+
+
+@router.get("/windows", response_model=List[FreeWindow])
+def find_free_windows(
+    duration_minutes: int = Query(..., ge=15, le=24 * 60),
+    headcount: int = Query(default=1, ge=1, le=50),
+    expertise: Optional[str] = Query(default=None, description="Expertise key workers must have"),
+    min_level: int = Query(default=1, ge=1),
+    verified: bool = False,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    limit: int = Query(default=5, ge=1, le=50),
+    current_user: dict = Depends(get_current_user),
+):
+    """
+    Earliest non-overlapping windows of `duration_minutes` in which at least
+    `headcount` matching workers are free. Searches the next 14 days by default,
+    on 15-minute slot boundaries. Admins and managers only.
+    """
+    if current_user.get("role") not in ("admin", "manager"):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only administrators and managers can search availability"
+        )
+    start = naive_utc(start) if start else utc_now()
+    end = naive_utc(end) if end else start + timedelta(days=14)
+    if end <= start:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="end must be after start")
+
+    qualified = None
+    if expertise:
+        snapshot = refdata.snapshot()
+        record = snapshot.by_key.get(expertise)
+        if not record:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Expertise not found")
+        qualified = set(snapshot.matrix.workers_with(record.id, min_level, verified))
+
+    db = SessionLocal()
+    try:
+        query = db.query(User.id, User.name).filter(User.role == 'worker', User.is_active == True)
+        names = {row.id: row.name for row in query.order_by(User.id) if qualified is None or row.id in qualified}
+    finally:
+        db.close()
+
+    windows = availability_index.find_windows(
+        list(names), to_epoch(start), to_epoch(end), duration_minutes * 60, headcount, limit
+    )
+    length = timedelta(seconds=-(-duration_minutes * 60 // SLOT_SECONDS) * SLOT_SECONDS)
+    result = []
+    for slot, worker_ids in windows:
+        window_start = availability_index.slot_time(slot)
+        result.append({
+            "start": window_start,
+            "end": window_start + length,
+            "workers": [{"id": w, "name": names[w]} for w in worker_ids],
+        })
+    return result
@@ -0,0 +1,143 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from typing import List, Literal, Optional
+from pydantic import BaseModel, Field, ValidationError
+from sqlalchemy.exc import IntegrityError
+
+from app.db import SessionLocal, begin_write
+from app.models.models import User
+from app.routers.auth import get_current_user
+from app.routers.users import UserCreate, UserResponse, UserUpdate, add_user, apply_user_update, log_activity
+
+router = APIRouter()
+
+MAX_BATCH_OPERATIONS = 1000
+
+
+class BatchOperation(BaseModel):
+    op: Literal["create", "update", "deactivate"]
+    user_id: Optional[int] = None  # Required for update/deactivate
+    data: Optional[dict] = None  # UserCreate fields for create, UserUpdate fields for update
+
+
+class BatchRequest(BaseModel):
+    operations: List[BatchOperation] = Field(..., min_length=1, max_length=MAX_BATCH_OPERATIONS)
+    atomic: bool = False  # Roll back the whole batch and stop at the first failed operation
+
+
+class BatchResult(BaseModel):
+    index: int
+    op: str
+    status: int
+    user: Optional[UserResponse] = None
+    detail: Optional[str] = None
+
+
+class BatchResponse(BaseModel):
+    committed: bool
+    applied: int
+    failed: int
+    results: List[BatchResult]
+
+
+def _get_user(db, user_id: Optional[int]) -> User:
+    if user_id is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="user_id is required")
+    user = db.query(User).filter(User.id == user_id).first()
+    if not user:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    return user
+
+
+def _run_operation(db, operation: BatchOperation, current_user: dict):
+    """Apply one operation to the session. Returns (status, user, log entry)."""
+    if operation.op == "create":
+        user = add_user(db, UserCreate(**(operation.data or {})))
+        db.flush()
+        return status.HTTP_201_CREATED, user, {"user_id": user.id, "email": user.email, "role": user.role}
+
+    user = _get_user(db, operation.user_id)
+    if operation.op == "update":
+        changes, old_values = apply_user_update(db, user, UserUpdate(**(operation.data or {})))
+        db.flush()
+        return status.HTTP_200_OK, user, {"user_id": user.id, "changes": changes, "old_values": old_values}
+
+    # Prevent self-deactivation, as DELETE /api/users/{id} does
+    if user.id == current_user['id']:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="You cannot delete your own account")
+    user.is_active = False
+    db.flush()
+    return status.HTTP_200_OK, user, {"user_id": user.id, "email": user.email}
+
+
+def _not_applied(operations: List[BatchOperation], failed: dict) -> list:
+    """Results of an atomic batch rolled back because of the `failed` operation"""
+    detail = f"Not applied: operation {failed['index']} failed and the batch is atomic"
+    return [
+        failed if index == failed["index"] else
+        {"index": index, "op": operation.op, "status": status.HTTP_424_FAILED_DEPENDENCY, "detail": detail}
+        for index, operation in enumerate(operations)
+    ]
+
+
+@router.post("", response_model=BatchResponse)
+def run_batch(batch: BatchRequest, current_user: dict = Depends(get_current_user)):
+    """
+    Apply an ordered list of user create/update/deactivate operations in one
+    transaction with a single grouped activity-log entry. Only accessible by admin users.
+    Each operation runs in a savepoint: a failed one is undone and reported per index
+    while the others are kept. With `atomic` the first failure rolls back the batch;
+    every other operation is reported as 424 (not applied) without a user.
+    """
+    if current_user.get("role") != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only administrators can run batch operations"
+        )
+
+    db = SessionLocal()
+    try:
+        begin_write(db)
+        results = []
+        logged = []
+        for index, operation in enumerate(batch.operations):
+            try:
+                # A savepoint per operation: a failure undoes only that operation's changes
+                with db.begin_nested():
+                    op_status, user, entry = _run_operation(db, operation, current_user)
+            except HTTPException as e:
+                results.append({"index": index, "op": operation.op, "status": e.status_code, "detail": e.detail})
+            except ValidationError as e:
+                results.append({"index": index, "op": operation.op, "status": status.HTTP_422_UNPROCESSABLE_ENTITY,
+                                "detail": str(e)})
+            except IntegrityError:
+                results.append({"index": index, "op": operation.op, "status": status.HTTP_409_CONFLICT,
+                                "detail": "Violates a uniqueness constraint"})
+            else:
+                results.append({"index": index, "op": operation.op, "status": op_status,
+                                "user": UserResponse.model_validate(user)})
+                logged.append({"index": index, "op": operation.op, **entry})
+                continue
+            if batch.atomic:
+                db.rollback()
+                return {"committed": False, "applied": 0, "failed": 1,
+                        "results": _not_applied(batch.operations, failed=results[-1])}
+
+        failed = len(results) - len(logged)
+        if not logged:
+            db.rollback()
+            return {"committed": False, "applied": 0, "failed": failed, "results": results}
+
+        counts = {op: sum(1 for e in logged if e["op"] == op) for op in ("create", "update", "deactivate")}
+        log_activity(
+            db=db,
+            action="users_batch",
+            description=(
+                f"{current_user['name']} applied a batch of {len(logged)} user operations "
+                f"({counts['create']} created, {counts['update']} updated, {counts['deactivate']} deactivated)"
+            ),
+            performed_by=current_user['id'],
+            metadata={"operations": logged, "failed": failed}
+        )
+        return {"committed": True, "applied": len(logged), "failed": failed, "results": results}
+    finally:
+        db.close()
@@ -0,0 +1,86 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from typing import List, Literal, Optional
+from pydantic import BaseModel, Field
+from datetime import datetime
+
+from app.routers.auth import get_current_user
+from app.utils.clock_ingest import ClockEventIn, clock_writer
+from app.utils.timeutil import naive_utc
+
+router = APIRouter()
+
+MAX_CLOCK_EVENTS = 1000
+# How long a request waits for the group-commit writer before giving up
+WRITE_TIMEOUT_SECONDS = 30
+
+
+class ClockEventCreate(BaseModel):
+    idempotency_key: str = Field(..., min_length=1, max_length=128)  # Reused by the client when retrying
+    job_id: int
+    type: Literal["in", "out"]
+    at: datetime
+    worker_id: Optional[int] = None  # Admins and managers may clock workers in/out; defaults to the caller
+
+
+class ClockBatch(BaseModel):
+    events: List[ClockEventCreate] = Field(..., min_length=1, max_length=MAX_CLOCK_EVENTS)
+
+
+class ClockEventResult(BaseModel):
+    index: int
+    idempotency_key: str
+    status: Literal["accepted", "duplicate", "rejected"]
+    time_entry_id: Optional[int] = None
+    detail: Optional[str] = None
+
+
+class ClockBatchResponse(BaseModel):
+    accepted: int
+    duplicates: int
+    rejected: int
+    results: List[ClockEventResult]
+
+
+@router.post("/events", response_model=ClockBatchResponse)
+def ingest_clock_events(batch: ClockBatch, current_user: dict = Depends(get_current_user)):
+    """
+    Record clock-in/clock-out events. Each event is accepted (opens or closes a
+    time entry), a duplicate of an already accepted idempotency key (safe
+    retry; nothing is written) or rejected with a reason. Workers clock
+    themselves; admins and managers may pass worker_id.
+    """
+    may_act_for_others = current_user.get("role") in ("admin", "manager")
+    events = []
+    for event in batch.events:
+        worker_id = event.worker_id if event.worker_id is not None else current_user["id"]
+        if worker_id != current_user["id"] and not may_act_for_others:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="You can only clock in and out yourself"
+            )
+        events.append(ClockEventIn(worker_id, event.idempotency_key, event.job_id, event.type, naive_utc(event.at)))
+
+    try:
+        results = clock_writer.submit(events).result(timeout=WRITE_TIMEOUT_SECONDS)
+    except TimeoutError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Clock events could not be written in time; retry with the same idempotency keys"
+        )
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Clock events could not be written; retry with the same idempotency keys"
+        )
+
+    counts = {"accepted": 0, "duplicate": 0, "rejected": 0}
+    response = []
+    for index, (event, result) in enumerate(zip(batch.events, results)):
+        counts[result["status"]] += 1
+        response.append({"index": index, "idempotency_key": event.idempotency_key, **result})
+    return {
+        "accepted": counts["accepted"],
+        "duplicates": counts["duplicate"],
+        "rejected": counts["rejected"],
+        "results": response,
+    }
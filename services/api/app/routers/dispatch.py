@@ -0,0 +1,181 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from typing import Dict, List
+from pydantic import BaseModel, Field
+from datetime import datetime
+from sqlalchemy import and_, not_
+
+from app.db import SessionLocal
+from app.models.models import Job, JobAssignment, JobRequiredExpertise, User
+from app.routers.auth import get_current_user
+from app.routers.users import log_activity
+from app.utils.dispatch import DispatchJob, plan_dispatch
+from app.utils.refdata import refdata
+from app.utils.timeutil import naive_utc, to_epoch
+
+router = APIRouter()
+
+# Jobs in these states are not staffed by the optimizer
+CLOSED_JOB_STATUSES = ('completed', 'cancelled')
+
+
+class DispatchRequest(BaseModel):
+    start: datetime
+    end: datetime
+    dry_run: bool = True
+    time_budget_ms: int = Field(default=5000, ge=100, le=60000)
+
+
+class PlannedAssignment(BaseModel):
+    job_id: int
+    worker_id: int
+    fit: int
+
+
+class RemovedAssignment(BaseModel):
+    assignment_id: int
+    job_id: int
+    worker_id: int
+
+
+class DispatchDiff(BaseModel):
+    added: List[PlannedAssignment]
+    removed: List[RemovedAssignment]
+    kept: int
+
+
+class DispatchResponse(BaseModel):
+    jobs: int
+    workers: int
+    slots: int
+    filled: int
+    unfilled: Dict[int, int]  # job_id -> missing headcount
+    total_fit: int
+    optimal: bool
+    elapsed_ms: float
+    applied: bool
+    assignments: List[PlannedAssignment]
+    diff: DispatchDiff
+
+
+def _load_problem(db, start: datetime, end: datetime):
+    """Jobs in range with their requirements, active workers' skills and bookings outside the plan"""
+    in_plan = and_(
+        Job.planned_start >= start,
+        Job.planned_start < end,
+        Job.status.notin_(CLOSED_JOB_STATUSES),
+    )
+    job_rows = db.query(Job.id, Job.planned_start, Job.planned_end, Job.required_headcount).filter(in_plan).all()
+    requirements = {}
+    for row in (
+        db.query(JobRequiredExpertise.job_id, JobRequiredExpertise.expertise_id,
+                 JobRequiredExpertise.min_level, JobRequiredExpertise.required)
+        .join(Job, Job.id == JobRequiredExpertise.job_id)
+        .filter(in_plan)
+    ):
+        requirements.setdefault(row.job_id, []).append((row.expertise_id, row.min_level, row.required is not False))
+    jobs = [
+        DispatchJob(j.id, to_epoch(j.planned_start), to_epoch(j.planned_end), j.required_headcount or 1,
+                    requirements.get(j.id, []))
+        for j in job_rows
+    ]
+
+    matrix = refdata.snapshot().matrix
+    skills = {
+        row.id: matrix.skills(row.id)
+        for row in db.query(User.id).filter(User.role == 'worker', User.is_active == True)
+    }
+
+    busy = {}
+    if job_rows:
+        horizon_end = max(j.planned_end for j in job_rows)
+        for row in (
+            db.query(JobAssignment.worker_id, Job.planned_start, Job.planned_end)
+            .join(Job, Job.id == JobAssignment.job_id)
+            .filter(not_(in_plan), Job.planned_end > start, Job.planned_start < horizon_end)
+        ):
+            busy.setdefault(row.worker_id, []).append((to_epoch(row.planned_start), to_epoch(row.planned_end)))
+
+    existing = (
+        db.query(JobAssignment)
+        .join(Job, Job.id == JobAssignment.job_id)
+        .filter(in_plan)
+        .all()
+    )
+    return jobs, skills, busy, existing
+
+
+@router.post("/plan", response_model=DispatchResponse)
+def plan(request: DispatchRequest, current_user: dict = Depends(get_current_user)):
+    """
+    Plan assignments for every open job starting in [start, end) at once,
+    maximizing total expertise fit while respecting required headcount and
+    worker time overlaps. With dry_run (the default) only the plan and its
+    diff against existing assignments are returned; otherwise the plan
+    replaces the assignments of those jobs. Admins and managers only.
+    """
+    if current_user.get("role") not in ("admin", "manager"):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only administrators and managers can run dispatch"
+        )
+    start, end = naive_utc(request.start), naive_utc(request.end)
+    if end <= start:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="end must be after start")
+
+    db = SessionLocal()
+    try:
+        jobs, skills, busy, existing = _load_problem(db, start, end)
+        result = plan_dispatch(jobs, skills, busy, time_budget=request.time_budget_ms / 1000)
+
+        planned = {(job_id, worker_id): fit for job_id, worker_id, fit in result.assignments}
+        current = {(a.job_id, a.worker_id): a for a in existing}
+        added = [key for key in planned if key not in current]
+        removed = [a for key, a in current.items() if key not in planned]
+
+        response = {
+            "jobs": len(jobs),
+            "workers": len(skills),
+            "slots": sum(j.headcount for j in jobs),
+            "filled": len(result.assignments),
+            "unfilled": result.unfilled,
+            "total_fit": result.total_fit,
+            "optimal": result.optimal,
+            "elapsed_ms": result.elapsed_ms,
+            "applied": False,
+            "assignments": [{"job_id": j, "worker_id": w, "fit": f} for j, w, f in result.assignments],
+            "diff": {
+                "added": [{"job_id": j, "worker_id": w, "fit": planned[(j, w)]} for j, w in added],
+                "removed": [{"assignment_id": a.id, "job_id": a.job_id, "worker_id": a.worker_id} for a in removed],
+                "kept": len(current) - len(removed),
+            },
+        }
+        if request.dry_run or not (added or removed):
+            return response
+
+        for assignment in removed:
+            db.delete(assignment)
+        for job_id, worker_id in added:
+            db.add(JobAssignment(job_id=job_id, worker_id=worker_id))
+        log_activity(
+            db=db,
+            action="dispatch_applied",
+            description=(
+                f"{current_user['name']} applied a dispatch plan for {len(jobs)} jobs "
+                f"({len(added)} assignments added, {len(removed)} removed)"
+            ),
+            performed_by=current_user['id'],
+            metadata={
+                "start": start.isoformat(),
+                "end": end.isoformat(),
+                "added": len(added),
+                "removed": len(removed),
+                "unfilled": result.unfilled,
+                "total_fit": result.total_fit,
+            },
+            commit=False
+        )
+        db.commit()
+        response["applied"] = True
+        return response
+    finally:
+        db.close()
@@ -0,0 +1,147 @@
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from typing import Dict, List, Optional
+from pydantic import BaseModel
+
+from app.db import SessionLocal
+from app.models.models import Expertise, Job, JobAssignment, SyncChange, TimeEntry, User, WorkerExpertise
+from app.routers.auth import get_current_user
+from app.utils import change_tracking  # noqa: F401  (registers the write hooks that feed sync_changes)
+
+router = APIRouter()
+
+# Entity name in sync_changes -> (model, key in the response)
+_ENTITIES = {
+    "job": (Job, "jobs"),
+    "assignment": (JobAssignment, "assignments"),
+    "time_entry": (TimeEntry, "time_entries"),
+    "worker_expertise": (WorkerExpertise, "worker_expertise"),
+    "expertise": (Expertise, "expertise"),
+}
+
+_PROFILE_FIELDS = ("id", "name", "email", "phone", "role", "is_active", "created_at")
+
+
+class SyncResponse(BaseModel):
+    token: str
+    full: bool
+    profile: Optional[dict] = None
+    jobs: List[dict] = []
+    assignments: List[dict] = []
+    time_entries: List[dict] = []
+    worker_expertise: List[dict] = []
+    expertise: List[dict] = []
+    deleted: Dict[str, List[int]] = {}
+
+
+def _row_dict(obj, fields=None) -> dict:
+    """Plain column values of an ORM row"""
+    keys = fields or [c.key for c in obj.__table__.columns]
+    return {k: getattr(obj, k) for k in keys}
+
+
+def _head_seq(db) -> int:
+    """Latest change sequence (primary key lookup)"""
+    head = db.query(SyncChange.seq).order_by(SyncChange.seq.desc()).limit(1).scalar()
+    return head or 0
+
+
+def _parse_token(since: Optional[str]) -> int:
+    if not since:
+        return 0
+    try:
+        value = int(since)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid sync token")
+    if value < 0:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid sync token")
+    return value
+
+
+def _full_snapshot(db, worker_id: int, token: int) -> dict:
+    assignments = db.query(JobAssignment).filter(JobAssignment.worker_id == worker_id).all()
+    job_ids = {a.job_id for a in assignments}
+    jobs = db.query(Job).filter(Job.id.in_(job_ids)).all() if job_ids else []
+    entries = db.query(TimeEntry).filter(TimeEntry.worker_id == worker_id).all()
+    skills = db.query(WorkerExpertise).filter(WorkerExpertise.worker_id == worker_id).all()
+    catalog = db.query(Expertise).all()
+    profile = db.query(User).filter(User.id == worker_id).first()
+    return {
+        "token": str(token),
+        "full": True,
+        "profile": _row_dict(profile, _PROFILE_FIELDS) if profile else None,
+        "jobs": [_row_dict(j) for j in jobs],
+        "assignments": [_row_dict(a) for a in assignments],
+        "time_entries": [_row_dict(t) for t in entries],
+        "worker_expertise": [_row_dict(s) for s in skills],
+        "expertise": [_row_dict(e) for e in catalog],
+        "deleted": {},
+    }
+
+
+def _delta(db, worker_id: int, since: int, token: int) -> dict:
+    window = (SyncChange.seq > since, SyncChange.seq <= token)
+    changes = db.query(SyncChange).filter(SyncChange.worker_id == worker_id, *window).all()
+
+    # Jobs are relevant while the worker is assigned, and also when an assignment
+    # was removed in this window (so the client receives the job's tombstone too)
+    job_ids = {row.job_id for row in db.query(JobAssignment.job_id).filter(JobAssignment.worker_id == worker_id)}
+    job_ids |= {c.job_id for c in changes if c.entity == "assignment" and c.job_id is not None}
+    if job_ids:
+        changes += db.query(SyncChange).filter(
+            SyncChange.entity == "job", SyncChange.job_id.in_(job_ids), *window
+        ).all()
+    changes += db.query(SyncChange).filter(SyncChange.entity == "expertise", *window).all()
+
+    # Collapse to the latest operation per row
+    latest = {}
+    for change in sorted(changes, key=lambda c: c.seq):
+        latest[(change.entity, change.entity_id)] = change.op
+
+    result = {"token": str(token), "full": False, "profile": None, "deleted": {}}
+    upserts = {}
+    for (entity, entity_id), op in latest.items():
+        if entity == "user":
+            continue
+        if op == "delete":
+            result["deleted"].setdefault(_ENTITIES[entity][1], []).append(entity_id)
+        else:
+            upserts.setdefault(entity, set()).add(entity_id)
+
+    # Assignments first: a new assignment to an unchanged job still needs the job row
+    for entity in ("assignment", "job", "time_entry", "worker_expertise", "expertise"):
+        model, key = _ENTITIES[entity]
+        ids = upserts.get(entity)
+        rows = db.query(model).filter(model.id.in_(ids)).all() if ids else []
+        result[key] = [_row_dict(r) for r in rows]
+        if entity == "assignment":
+            upserts.setdefault("job", set()).update(r.job_id for r in rows)
+
+    if ("user", worker_id) in latest:
+        profile = db.query(User).filter(User.id == worker_id).first()
+        result["profile"] = _row_dict(profile, _PROFILE_FIELDS) if profile else None
+    return result
+
+
+@router.get("", response_model=SyncResponse)
+def sync(
+    since: Optional[str] = Query(default=None, description="Token returned by the previous sync"),
+    current_user: dict = Depends(get_current_user),
+):
+    """
+    Delta sync for offline-capable clients.
+    Returns the caller's jobs, assignments, time entries and expertise changed
+    since `since`, plus tombstones for deleted rows. Omit `since` for a full sync.
+    """
+    since_seq = _parse_token(since)
+
+    db = SessionLocal()
+    try:
+        token = _head_seq(db)
+        if since_seq and since_seq == token:
+            return {"token": str(token), "full": False}
+        # Unknown or future token (e.g. restored database): start over
+        if not since_seq or since_seq > token:
+            return _full_snapshot(db, current_user["id"], token)
+        return _delta(db, current_user["id"], since_seq, token)
+    finally:
+        db.close()
@@ -0,0 +1,138 @@
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
+from fastapi.responses import FileResponse
+from typing import Any, List, Optional
+from pydantic import BaseModel, Field
+from datetime import datetime
+import os
+
+from app.db import SessionLocal
+from app.models.models import BackgroundTask
+from app.routers.auth import get_current_user
+from app.utils import task_kinds  # noqa: F401  (registers the task kinds)
+from app.utils.tasks import REGISTRY, TASK_STATUSES, enqueue, task_output_dir
+
+router = APIRouter()
+
+
+class TaskCreate(BaseModel):
+    kind: str
+    payload: Optional[dict] = None
+    priority: int = Field(default=0, ge=-10, le=10)
+
+
+class TaskResponse(BaseModel):
+    id: int
+    kind: str
+    status: str
+    priority: int
+    progress: int
+    progress_message: Optional[str]
+    attempts: int
+    max_attempts: int
+    result: Optional[Any]
+    error: Optional[str]
+    created_by: Optional[int]
+    created_at: Optional[datetime]
+    run_after: datetime
+    started_at: Optional[datetime]
+    finished_at: Optional[datetime]
+
+    class Config:
+        from_attributes = True
+
+
+def _get_visible_task(db, task_id: int, current_user: dict) -> BackgroundTask:
+    """Admins see every task, others only the tasks they created"""
+    background_task = db.query(BackgroundTask).filter(BackgroundTask.id == task_id).first()
+    if not background_task or (
+        current_user.get("role") != "admin" and background_task.created_by != current_user.get("id")
+    ):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Task not found")
+    return background_task
+
+
+@router.post("/", response_model=TaskResponse, status_code=status.HTTP_202_ACCEPTED)
+def create_task(task_data: TaskCreate, response: Response, current_user: dict = Depends(get_current_user)):
+    """
+    Queue a background task and return immediately; poll GET /api/tasks/{id}
+    for progress and the result.
+    """
+    spec = REGISTRY.get(task_data.kind)
+    if spec is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown task kind. Must be one of: {', '.join(sorted(REGISTRY))}"
+        )
+    if current_user.get("role") not in spec.roles:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=f"Not allowed to run {task_data.kind} tasks"
+        )
+
+    db = SessionLocal()
+    try:
+        background_task = enqueue(
+            db, task_data.kind, task_data.payload, priority=task_data.priority, created_by=current_user['id']
+        )
+        db.commit()
+        db.refresh(background_task)
+        response.headers["Location"] = f"/api/tasks/{background_task.id}"
+        return background_task
+    finally:
+        db.close()
+
+
+@router.get("/", response_model=List[TaskResponse])
+def list_tasks(
+    status_filter: Optional[str] = Query(default=None, alias="status"),
+    kind: Optional[str] = None,
+    limit: int = Query(default=50, ge=1, le=500),
+    current_user: dict = Depends(get_current_user),
+):
+    """Most recent tasks first. Admins see every task, others their own."""
+    if status_filter is not None and status_filter not in TASK_STATUSES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid status. Must be one of: {', '.join(TASK_STATUSES)}"
+        )
+    db = SessionLocal()
+    try:
+        query = db.query(BackgroundTask)
+        if current_user.get("role") != "admin":
+            query = query.filter(BackgroundTask.created_by == current_user.get("id"))
+        if status_filter is not None:
+            query = query.filter(BackgroundTask.status == status_filter)
+        if kind is not None:
+            query = query.filter(BackgroundTask.kind == kind)
+        return query.order_by(BackgroundTask.id.desc()).limit(limit).all()
+    finally:
+        db.close()
+
+
+@router.get("/{task_id}", response_model=TaskResponse)
+def get_task(task_id: int, current_user: dict = Depends(get_current_user)):
+    """Task status, progress and, once finished, its result or error"""
+    db = SessionLocal()
+    try:
+        return _get_visible_task(db, task_id, current_user)
+    finally:
+        db.close()
+
+
+@router.get("/{task_id}/download")
+def download_task_output(task_id: int, current_user: dict = Depends(get_current_user)):
+    """File produced by a finished task (e.g. the CSV of users_export)"""
+    db = SessionLocal()
+    try:
+        background_task = _get_visible_task(db, task_id, current_user)
+        result = background_task.result if background_task.status == 'succeeded' else None
+    finally:
+        db.close()
+
+    file_name = result.get("file") if isinstance(result, dict) else None
+    if not file_name or os.path.basename(file_name) != file_name:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Task has no output file")
+    path = os.path.join(task_output_dir(), file_name)
+    if not os.path.isfile(path):
+        raise HTTPException(status_code=status.HTTP_410_GONE, detail="Task output is no longer available")
+    return FileResponse(path, filename=file_name)
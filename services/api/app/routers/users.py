@@ -1,12 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
 from typing import List, Optional
 from pydantic import BaseModel, EmailStr
 from datetime import datetime
+from sqlalchemy import and_, func, tuple_
+import base64
 import json
 
 from app.db import SessionLocal
 from app.models.models import User, ActivityLog
 from app.routers.auth import get_current_user
+from app.utils.counters import TOTAL, current_week, read_counters
 
 router = APIRouter()
 
@@ -40,7 +43,10 @@ class UserUpdate(BaseModel):
     is_active: Optional[bool] = None
 
 
-def log_activity(db, action: str, description: str, performed_by: int, target_user: int = None, metadata: dict = None):
+VALID_ROLES = ['admin', 'manager', 'worker']
+
+
+def log_activity(db, action: str, description: str, performed_by: int, target_user: int = None, metadata: dict = None, commit: bool = True):
     """Helper function to create activity log entries"""
     log = ActivityLog(
         action=action,
@@ -50,13 +56,165 @@ def log_activity(db, action: str, description: str, performed_by: int, target_us
         meta_data=metadata  # Using meta_data column (metadata is reserved in SQLAlchemy)
     )
     db.add(log)
-    db.commit()
+    if commit:
+        db.commit()
+
+
+def validate_role(role: str):
+    """Raise 400 unless role is one of VALID_ROLES"""
+    if role not in VALID_ROLES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid role. Must be one of: {', '.join(VALID_ROLES)}"
+        )
+
+
+def add_user(db, user_data: UserCreate) -> User:
+    """Validate and stage a new user in the session (caller commits)"""
+    validate_role(user_data.role)
+
+    # Check if email already exists
+    existing = db.query(User).filter(User.email == user_data.email).first()
+    if existing:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Email already registered"
+        )
+
+    new_user = User(
+        name=user_data.name,
+        email=user_data.email,
+        phone=user_data.phone,
+        role=user_data.role,
+        is_active=user_data.is_active
+    )
+    db.add(new_user)
+    return new_user
 
 
-@router.get("/", response_model=List[UserResponse])
-def get_all_users(current_user: dict = Depends(get_current_user)):
+def apply_user_update(db, user: User, user_data: UserUpdate):
     """
-    Get all users. Only accessible by admin users.
+    Apply the provided fields to user (caller commits).
+    Returns (changes, old_values) for activity logging.
+    """
+    if user_data.role:
+        validate_role(user_data.role)
+
+    changes = {}
+    old_values = {}
+
+    if user_data.name is not None and user_data.name != user.name:
+        old_values['name'] = user.name
+        user.name = user_data.name
+        changes['name'] = user_data.name
+
+    if user_data.email is not None and user_data.email != user.email:
+        # Check if new email is already taken
+        existing = db.query(User).filter(User.email == user_data.email, User.id != user.id).first()
+        if existing:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Email already registered"
+            )
+        old_values['email'] = user.email
+        user.email = user_data.email
+        changes['email'] = user_data.email
+
+    if user_data.phone is not None and user_data.phone != user.phone:
+        old_values['phone'] = user.phone
+        user.phone = user_data.phone
+        changes['phone'] = user_data.phone
+
+    if user_data.role is not None and user_data.role != user.role:
+        old_values['role'] = user.role
+        user.role = user_data.role
+        changes['role'] = user_data.role
+
+    if user_data.is_active is not None and user_data.is_active != user.is_active:
+        old_values['is_active'] = user.is_active
+        user.is_active = user_data.is_active
+        changes['is_active'] = user_data.is_active
+
+    return changes, old_values
+
+
+# Columns the list can be sorted on, each backed by an index for keyset paging.
+# Ids are assigned in creation order, so `id` doubles as sort-by-creation.
+SORT_COLUMNS = {
+    'id': User.id,
+    'name': User.name,
+    'email': User.email,
+}
+LIST_FIELDS = ['id', 'name', 'email', 'phone', 'role', 'is_active', 'created_at']
+
+
+class UserListItem(BaseModel):
+    """UserResponse with every field optional, for `fields=` sparse responses"""
+    id: Optional[int] = None
+    name: Optional[str] = None
+    email: Optional[str] = None
+    phone: Optional[str] = None
+    role: Optional[str] = None
+    is_active: Optional[bool] = None
+    created_at: Optional[datetime] = None
+    counters: Optional[dict] = None  # With include_counters
+
+
+# Counters shown with include_counters: response key -> (counter name, bucket or None for this week)
+LIST_COUNTERS = {
+    'assignments_this_week': ('assignments', None),
+    'open_completions': ('open_completions', TOTAL),
+    'open_time_entries': ('open_time_entries', TOTAL),
+}
+
+
+def _prefix_range(column, prefix: str):
+    """column starts with prefix, as a range the column's index can serve (LIKE cannot in SQLite)"""
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    return and_(column >= prefix, column < upper)
+
+
+def encode_cursor(sort: str, value, last_id: int) -> str:
+    raw = json.dumps({"s": sort, "v": value, "id": last_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str):
+    """Returns (value, last_id) of the row the previous page ended on"""
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if data["s"] != sort:
+            raise ValueError("cursor belongs to a different sort order")
+        return data["v"], int(data["id"])
+    except (ValueError, KeyError, TypeError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid cursor: {e}"
+        )
+
+
+@router.get("/", response_model=List[UserListItem], response_model_exclude_unset=True)
+def get_all_users(
+    response: Response,
+    limit: int = Query(default=200, ge=1, le=1000),
+    cursor: Optional[str] = Query(default=None, description="X-Next-Cursor of the previous page"),
+    role: Optional[str] = None,
+    is_active: Optional[bool] = None,
+    name_prefix: Optional[str] = Query(default=None, min_length=1),
+    email_prefix: Optional[str] = Query(default=None, min_length=1),
+    sort: str = Query(default='id', description="id, name or email; prefix with - for descending"),
+    fields: Optional[str] = Query(default=None, description="Comma-separated subset of " + ", ".join(LIST_FIELDS)),
+    include_counters: bool = Query(default=False, description="Add each user's maintained counters"),
+    current_user: dict = Depends(get_current_user),
+):
+    """
+    List users a page at a time. Only accessible by admin users.
+
+    Keyset pagination: when more rows follow, the response carries an
+    `X-Next-Cursor` header to pass back as `cursor`. Prefix filters are
+    case-sensitive. With `fields`, only those columns are selected and returned.
+    `include_counters` adds assignments this week and open completion records
+    and time entries, read from the maintained counters (no COUNT queries).
     """
     # Check if user is admin
     if current_user.get("role") != "admin":
@@ -64,15 +222,106 @@ def get_all_users(current_user: dict = Depends(get_current_user)):
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Only administrators can access user list"
         )
-    
+
+    descending = sort.startswith('-')
+    sort_key = sort.lstrip('-')
+    if sort_key not in SORT_COLUMNS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid sort. Must be one of: {', '.join(SORT_COLUMNS)}"
+        )
+    if fields:
+        selected = [f.strip() for f in fields.split(',') if f.strip()]
+        unknown = [f for f in selected if f not in LIST_FIELDS]
+        if unknown:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unknown fields: {', '.join(unknown)}. Must be among: {', '.join(LIST_FIELDS)}"
+            )
+    else:
+        selected = LIST_FIELDS
+
+    sort_column = SORT_COLUMNS[sort_key]
+    # id and the sort column are always loaded: the cursor is built from them
+    loaded = list(dict.fromkeys(['id', sort_key] + selected))
+
     db = SessionLocal()
     try:
-        users = db.query(User).order_by(User.id.asc()).all()
+        query = db.query(*[getattr(User, name) for name in loaded])
+        if role is not None:
+            query = query.filter(User.role == role)
+        if is_active is not None:
+            query = query.filter(User.is_active == is_active)
+        if name_prefix:
+            query = query.filter(_prefix_range(User.name, name_prefix))
+        if email_prefix:
+            query = query.filter(_prefix_range(User.email, email_prefix))
+
+        if cursor:
+            value, last_id = decode_cursor(cursor, sort)
+            if sort_key == 'id':
+                query = query.filter(User.id < last_id if descending else User.id > last_id)
+            elif descending:
+                query = query.filter(tuple_(sort_column, User.id) < tuple_(value, last_id))
+            else:
+                query = query.filter(tuple_(sort_column, User.id) > tuple_(value, last_id))
+
+        if sort_key == 'id':
+            order = [User.id.desc() if descending else User.id.asc()]
+        elif descending:
+            order = [sort_column.desc(), User.id.desc()]
+        else:
+            order = [sort_column.asc(), User.id.asc()]
+        rows = query.order_by(*order).limit(limit + 1).all()
+
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            response.headers["X-Next-Cursor"] = encode_cursor(sort, getattr(last, sort_key), last.id)
+        users = [{name: getattr(row, name) for name in selected} for row in rows]
+        if include_counters:
+            week = current_week()
+            wanted = [(name, week if bucket is None else bucket) for name, bucket in LIST_COUNTERS.values()]
+            counts = read_counters(db, 'user', [row.id for row in rows], wanted)
+            for row, user in zip(rows, users):
+                user['counters'] = {key: counts[row.id][name] for key, (name, _) in LIST_COUNTERS.items()}
         return users
     finally:
         db.close()
 
 
+class UserSummary(BaseModel):
+    total: int
+    active: int
+    by_role: dict
+
+
+@router.get("/summary", response_model=UserSummary)
+def get_user_summary(current_user: dict = Depends(get_current_user)):
+    """
+    Counts of users by role and of active users (one GROUP BY query), so the
+    admin page can show totals without loading every page of the list.
+    """
+    if current_user.get("role") != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only administrators can access user list"
+        )
+
+    db = SessionLocal()
+    try:
+        summary = {"total": 0, "active": 0, "by_role": {role: 0 for role in VALID_ROLES}}
+        rows = db.query(User.role, User.is_active, func.count(User.id)).group_by(User.role, User.is_active)
+        for role, is_active, count in rows:
+            summary["total"] += count
+            summary["by_role"][role] = summary["by_role"].get(role, 0) + count
+            if is_active:
+                summary["active"] += count
+        return summary
+    finally:
+        db.close()
+
+
 @router.get("/{user_id}", response_model=UserResponse)
 def get_user(user_id: int, current_user: dict = Depends(get_current_user)):
     """
@@ -110,32 +359,12 @@ def create_user(user_data: UserCreate, current_user: dict = Depends(get_current_
         )
     
     # Validate role
-    valid_roles = ['admin', 'manager', 'worker']
-    if user_data.role not in valid_roles:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Invalid role. Must be one of: {', '.join(valid_roles)}"
-        )
+    validate_role(user_data.role)
     
     db = SessionLocal()
     try:
-        # Check if email already exists
-        existing = db.query(User).filter(User.email == user_data.email).first()
-        if existing:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Email already registered"
-            )
-        
         # Create new user
-        new_user = User(
-            name=user_data.name,
-            email=user_data.email,
-            phone=user_data.phone,
-            role=user_data.role,
-            is_active=user_data.is_active
-        )
-        db.add(new_user)
+        new_user = add_user(db, user_data)
         db.commit()
         db.refresh(new_user)
         
@@ -170,12 +399,7 @@ def update_user(user_id: int, user_data: UserUpdate, current_user: dict = Depend
     
     # Validate role if provided
     if user_data.role:
-        valid_roles = ['admin', 'manager', 'worker']
-        if user_data.role not in valid_roles:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Invalid role. Must be one of: {', '.join(valid_roles)}"
-            )
+        validate_role(user_data.role)
     
     db = SessionLocal()
     try:
@@ -186,42 +410,8 @@ def update_user(user_id: int, user_data: UserUpdate, current_user: dict = Depend
                 detail="User not found"
             )
         
-        # Track changes for logging
-        changes = {}
-        old_values = {}
-        
-        # Update fields
-        if user_data.name is not None and user_data.name != user.name:
-            old_values['name'] = user.name
-            user.name = user_data.name
-            changes['name'] = user_data.name
-        
-        if user_data.email is not None and user_data.email != user.email:
-            # Check if new email is already taken
-            existing = db.query(User).filter(User.email == user_data.email, User.id != user_id).first()
-            if existing:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="Email already registered"
-                )
-            old_values['email'] = user.email
-            user.email = user_data.email
-            changes['email'] = user_data.email
-        
-        if user_data.phone is not None and user_data.phone != user.phone:
-            old_values['phone'] = user.phone
-            user.phone = user_data.phone
-            changes['phone'] = user_data.phone
-        
-        if user_data.role is not None and user_data.role != user.role:
-            old_values['role'] = user.role
-            user.role = user_data.role
-            changes['role'] = user_data.role
-        
-        if user_data.is_active is not None and user_data.is_active != user.is_active:
-            old_values['is_active'] = user.is_active
-            user.is_active = user_data.is_active
-            changes['is_active'] = user_data.is_active
+        # Update fields, tracking changes for logging
+        changes, old_values = apply_user_update(db, user, user_data)
         
         db.commit()
         db.refresh(user)
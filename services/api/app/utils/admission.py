@@ -0,0 +1,227 @@
+"""
+Admission control for the API.
+
+SQLite has a single writer, so a burst of writes queues behind the file lock
+and drags every endpoint's latency up with it. The controller here sits in
+front of the routers and:
+
+- applies a token bucket per caller (user from the token, else client IP)
+  and a global one, answering 429 with Retry-After when either is empty.
+  Logins only count against the global bucket: behind the nginx proxy every
+  unauthenticated request has the proxy's address, and a shift-start login
+  storm would otherwise share one caller's bucket;
+- caps concurrent write-path and read-path requests with separate
+  semaphores, answering 503 with Retry-After when a request would wait
+  longer than the queue budget for a slot. Each tenant has its own
+  database (app/utils/tenancy.py) and so its own write lane: a tenant
+  saturating its writes does not hold up another tenant's. Clock event
+  ingestion has a larger lane of its own: its requests only wait for the
+  group-commit writer (app/utils/clock_ingest.py), which serializes the
+  commits itself and needs many concurrent requests to form large groups.
+
+Limits are per process and configured with ADMISSION_* environment variables.
+"""
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict, deque
+
+from fastapi.responses import JSONResponse
+
+from app.db import current_tenant
+from app.routers.auth import token_user_id
+
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+USER_RATE = float(os.getenv("ADMISSION_USER_RATE", "20"))  # requests/second per caller
+USER_BURST = float(os.getenv("ADMISSION_USER_BURST", "40"))
+GLOBAL_RATE = float(os.getenv("ADMISSION_GLOBAL_RATE", "500"))  # requests/second for the process
+GLOBAL_BURST = float(os.getenv("ADMISSION_GLOBAL_BURST", "1000"))
+MAX_CONCURRENT_WRITES = int(os.getenv("ADMISSION_MAX_WRITES", "4"))
+MAX_CONCURRENT_READS = int(os.getenv("ADMISSION_MAX_READS", "32"))
+MAX_CONCURRENT_INGEST = int(os.getenv("ADMISSION_MAX_INGEST", "64"))
+QUEUE_BUDGET_MS = float(os.getenv("ADMISSION_QUEUE_BUDGET_MS", "500"))
+MAX_TRACKED_CALLERS = int(os.getenv("ADMISSION_MAX_TRACKED_CALLERS", "10000"))
+
+WRITE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+# POST endpoints that only read from the database
+READ_ONLY_POSTS = {"/api/auth/login"}
+EXEMPT_PATHS = {"/healthz", "/api/admin/admission"}
+# Unauthenticated endpoints limited by the global bucket only
+CALLER_EXEMPT_PATHS = {"/api/auth/login"}
+# Writes that go through a group-commit writer: admitted to the ingest lane
+GROUP_COMMIT_PATHS = {"/api/clock/events"}
+
+
+class TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def take(self, now: float) -> float:
+        """Take one token. Returns 0 on success, else seconds until one is available."""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class _Lane:
+    """Concurrency cap for one class of requests (reads, writes or ingest)"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.semaphore = None  # Created lazily inside the running event loop
+        self.in_flight = 0
+        self.queued = 0
+        self.admitted = 0
+        self.shed = 0
+        self.waits = deque(maxlen=1024)  # Recent queue waits in seconds
+
+    def stats(self) -> dict:
+        waits = sorted(self.waits)
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "admitted": self.admitted,
+            "shed": self.shed,
+            "queue_wait_ms": {
+                "p50": round(waits[len(waits) // 2] * 1000, 2) if waits else 0.0,
+                "p99": round(waits[int(len(waits) * 0.99)] * 1000, 2) if waits else 0.0,
+                "max": round(waits[-1] * 1000, 2) if waits else 0.0,
+            },
+        }
+
+
+class AdmissionController:
+    def __init__(self, user_rate=USER_RATE, user_burst=USER_BURST, global_rate=GLOBAL_RATE,
+                 global_burst=GLOBAL_BURST, max_writes=MAX_CONCURRENT_WRITES,
+                 max_reads=MAX_CONCURRENT_READS, max_ingest=MAX_CONCURRENT_INGEST,
+                 queue_budget_ms=QUEUE_BUDGET_MS):
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.queue_budget = queue_budget_ms / 1000
+        self.global_bucket = TokenBucket(global_rate, global_burst, time.monotonic())
+        self.callers = OrderedDict()  # caller key -> TokenBucket, least recently seen first
+        self.max_writes = max_writes
+        self.write_lanes = {}  # tenant -> _Lane
+        self.max_ingest = max_ingest
+        self.ingest_lanes = {}  # tenant -> _Lane
+        self.reads = _Lane(max_reads)
+        self.rejected_user_rate = 0
+        self.rejected_global_rate = 0
+
+    def _caller_key(self, request) -> str:
+        token = request.headers.get("authorization")
+        if token and token.startswith("demo-token-"):
+            try:
+                return f"user:{current_tenant.get()}:{token_user_id(token)}"
+            except (ValueError, IndexError):
+                pass
+        return f"ip:{request.client.host if request.client else 'unknown'}"
+
+    @staticmethod
+    def _tenant_lane(lanes: dict, limit: int) -> _Lane:
+        tenant = current_tenant.get()
+        lane = lanes.get(tenant)
+        if lane is None:
+            lane = lanes[tenant] = _Lane(limit)
+        return lane
+
+    def _write_lane(self) -> _Lane:
+        return self._tenant_lane(self.write_lanes, self.max_writes)
+
+    def _ingest_lane(self) -> _Lane:
+        return self._tenant_lane(self.ingest_lanes, self.max_ingest)
+
+    def _lane(self, request) -> _Lane:
+        path = request.url.path
+        if request.method not in WRITE_METHODS or path in READ_ONLY_POSTS:
+            return self.reads
+        if path in GROUP_COMMIT_PATHS:
+            return self._ingest_lane()
+        return self._write_lane()
+
+    def _caller_bucket(self, key: str, now: float) -> TokenBucket:
+        bucket = self.callers.get(key)
+        if bucket is None:
+            bucket = TokenBucket(self.user_rate, self.user_burst, now)
+            self.callers[key] = bucket
+            if len(self.callers) > MAX_TRACKED_CALLERS:
+                self.callers.popitem(last=False)
+        else:
+            self.callers.move_to_end(key)
+        return bucket
+
+    @staticmethod
+    def _reject(status_code: int, detail: str, retry_after: float) -> JSONResponse:
+        return JSONResponse(
+            status_code=status_code,
+            content={"detail": detail},
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+        )
+
+    async def __call__(self, request, call_next):
+        path = request.url.path
+        if not ADMISSION_ENABLED or path in EXEMPT_PATHS:
+            return await call_next(request)
+
+        now = time.monotonic()
+        wait = 0.0 if path in CALLER_EXEMPT_PATHS else self._caller_bucket(self._caller_key(request), now).take(now)
+        if wait:
+            self.rejected_user_rate += 1
+            return self._reject(429, "Rate limit exceeded", wait)
+        wait = self.global_bucket.take(now)
+        if wait:
+            self.rejected_global_rate += 1
+            return self._reject(429, "Server is busy", wait)
+
+        lane = self._lane(request)
+        if lane.semaphore is None:
+            lane.semaphore = asyncio.Semaphore(lane.limit)
+
+        lane.queued += 1
+        try:
+            await asyncio.wait_for(lane.semaphore.acquire(), timeout=self.queue_budget)
+        except asyncio.TimeoutError:
+            lane.shed += 1
+            return self._reject(503, "Server is overloaded, retry later", self.queue_budget)
+        finally:
+            lane.queued -= 1
+
+        lane.waits.append(time.monotonic() - now)
+        lane.admitted += 1
+        lane.in_flight += 1
+        try:
+            return await call_next(request)
+        finally:
+            lane.in_flight -= 1
+            lane.semaphore.release()
+
+    def stats(self) -> dict:
+        return {
+            "enabled": ADMISSION_ENABLED,
+            "queue_budget_ms": self.queue_budget * 1000,
+            "user_bucket": {"rate": self.user_rate, "burst": self.user_burst, "tracked_callers": len(self.callers)},
+            "global_bucket": {
+                "rate": self.global_bucket.rate,
+                "burst": self.global_bucket.capacity,
+                "tokens": round(self.global_bucket.tokens, 2),
+            },
+            "rejected_user_rate": self.rejected_user_rate,
+            "rejected_global_rate": self.rejected_global_rate,
+            "writes": self._write_lane().stats(),  # The current tenant's
+            "write_lanes": len(self.write_lanes),
+            "ingest": self._ingest_lane().stats(),  # The current tenant's
+            "reads": self.reads.stats(),
+        }
+
+
+admission = AdmissionController()
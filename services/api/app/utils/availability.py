@@ -0,0 +1,280 @@
+"""
+Per-worker availability bitmaps.
+
+Each worker's booked time is a bitmap of 15-minute slots over a rolling
+horizon, held as a Python int: bit i set means slot i (counted from the
+index origin) is booked. Python ints are arbitrary-precision bitsets whose
+AND/OR/shift run in C over whole machine words, so window searches below are
+vectorized without NumPy.
+
+The index is built from job assignments on first use and kept current by
+rebuilding only the workers touched by committed writes (assignments added
+or removed, jobs rescheduled). Commits in this process mark them through the
+session hooks below; writes by other processes (task workers, other API
+workers) are found in the sync change sequence (`sync_changes`, see
+app/utils/change_tracking.py), read at most every AVAILABILITY_CHECK_SECONDS
+before answering. It is per process and per tenant database
+(`availability_index` is TenantLocal, see app/utils/tenancy.py).
+"""
+import os
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import event, func, inspect, select
+from sqlalchemy.orm import Session
+
+from app.db import SessionLocal
+from app.models.models import Job, JobAssignment, SyncChange
+from app.utils.tenancy import TenantLocal
+from app.utils.timeutil import from_epoch, to_epoch, utc_now
+
+SLOT_SECONDS = 15 * 60
+HORIZON_DAYS = int(os.getenv("AVAILABILITY_HORIZON_DAYS", "60"))
+# Rebuild from scratch once the origin is this far in the past
+REBASE_AFTER_DAYS = 7
+# How often to look for bookings changed by other processes (0: before every query)
+AVAILABILITY_CHECK_SECONDS = float(os.getenv("AVAILABILITY_CHECK_SECONDS", "1"))
+# Change entities that can move bookings
+BOOKING_ENTITIES = ("assignment", "job")
+
+
+class AvailabilityIndex:
+    def __init__(self, tenant: str = None, horizon_days: int = HORIZON_DAYS):
+        self.tenant = tenant
+        self.horizon_slots = horizon_days * 86400 // SLOT_SECONDS
+        self.full = (1 << self.horizon_slots) - 1
+        self.origin = None  # Epoch seconds of slot 0
+        self.busy = {}  # worker_id -> int bitmap
+        self.stale = set()  # Workers to rebuild before the next query
+        self.seq = 0  # Last sync change seq reflected in the bitmaps
+        self.checked_at = 0.0
+        self.lock = threading.Lock()
+        self.rebuilds = 0
+        self.refreshed_workers = 0
+        self.changes_seen = 0
+
+    # Slot arithmetic
+
+    def slot(self, epoch: float) -> int:
+        """Slot index containing epoch, clamped to the horizon"""
+        return min(max(int((epoch - self.origin) // SLOT_SECONDS), 0), self.horizon_slots)
+
+    def slot_end(self, epoch: float) -> int:
+        """First slot at or after epoch, clamped to the horizon"""
+        return min(max(-int((self.origin - epoch) // SLOT_SECONDS), 0), self.horizon_slots)
+
+    def slot_time(self, slot: int) -> datetime:
+        return from_epoch(self.origin + slot * SLOT_SECONDS)
+
+    def _interval_bits(self, start: float, end: float) -> int:
+        first, last = self.slot(start), self.slot_end(end)
+        if last <= first:
+            return 0
+        return ((1 << (last - first)) - 1) << first
+
+    # Building
+
+    def _bookings(self, db, worker_ids=None):
+        horizon_end = from_epoch(self.origin + self.horizon_slots * SLOT_SECONDS)
+        query = (
+            db.query(JobAssignment.worker_id, Job.planned_start, Job.planned_end)
+            .join(Job, Job.id == JobAssignment.job_id)
+            .filter(Job.planned_end > from_epoch(self.origin), Job.planned_start < horizon_end)
+        )
+        if worker_ids is not None:
+            query = query.filter(JobAssignment.worker_id.in_(worker_ids))
+        return query
+
+    def rebuild(self):
+        """Rebuild every bitmap with the origin at the start of today (UTC)"""
+        today = utc_now().replace(hour=0, minute=0, second=0, microsecond=0)
+        self.origin = to_epoch(today)
+        busy = {}
+        db = SessionLocal(self.tenant)
+        try:
+            # Read the change head first: a write landing mid-build is caught up on the next check
+            self.seq = db.query(func.max(SyncChange.seq)).scalar() or 0
+            self.checked_at = time.monotonic()
+            for row in self._bookings(db):
+                bits = self._interval_bits(to_epoch(row.planned_start), to_epoch(row.planned_end))
+                busy[row.worker_id] = busy.get(row.worker_id, 0) | bits
+        finally:
+            db.close()
+        self.busy = busy
+        self.stale.clear()
+        self.rebuilds += 1
+
+    def _refresh(self, worker_ids: set):
+        db = SessionLocal(self.tenant)
+        try:
+            busy = dict.fromkeys(worker_ids, 0)
+            for row in self._bookings(db, list(worker_ids)):
+                busy[row.worker_id] |= self._interval_bits(to_epoch(row.planned_start), to_epoch(row.planned_end))
+        finally:
+            db.close()
+        for worker_id, bits in busy.items():
+            if bits:
+                self.busy[worker_id] = bits
+            else:
+                self.busy.pop(worker_id, None)
+        self.refreshed_workers += len(worker_ids)
+
+    def _changed_elsewhere(self):
+        """Mark workers whose bookings changed since self.seq, in any process, as stale"""
+        now = time.monotonic()
+        if now - self.checked_at < AVAILABILITY_CHECK_SECONDS:
+            return
+        self.checked_at = now
+        db = SessionLocal(self.tenant)
+        try:
+            head = db.query(func.max(SyncChange.seq)).scalar() or 0
+            if head <= self.seq:
+                return
+            changes = db.query(SyncChange.entity, SyncChange.worker_id, SyncChange.job_id).filter(
+                SyncChange.entity.in_(BOOKING_ENTITIES), SyncChange.seq > self.seq, SyncChange.seq <= head
+            ).all()
+            workers = {c.worker_id for c in changes if c.entity == "assignment" and c.worker_id is not None}
+            jobs = {c.job_id for c in changes if c.entity == "job" and c.job_id is not None}
+            if jobs:
+                # Rescheduled jobs move the bookings of everyone assigned to them
+                workers.update(db.execute(
+                    select(JobAssignment.worker_id).where(JobAssignment.job_id.in_(jobs))
+                ).scalars())
+        finally:
+            db.close()
+        self.seq = head
+        self.changes_seen += len(changes)
+        self.stale.update(workers)
+
+    def ensure_current(self):
+        with self.lock:
+            if self.origin is None or time.time() - self.origin > REBASE_AFTER_DAYS * 86400:
+                self.rebuild()
+                return
+            self._changed_elsewhere()
+            if self.stale:
+                stale, self.stale = self.stale, set()
+                self._refresh(stale)
+
+    def invalidate(self, worker_ids):
+        with self.lock:
+            self.stale.update(worker_ids)
+
+    # Queries
+
+    def free_runs(self, bits: int, first: int, last: int, length: int) -> int:
+        """
+        Bitmap of slots s in [first, last) where the worker is free for
+        slots s .. s+length-1. Shift-and-AND by doubling, so log2(length) steps.
+        """
+        free = ~bits & self.full
+        run = free
+        span = 1
+        while span < length:
+            step = min(span, length - span)
+            run &= run >> step
+            span += step
+        # Bits past the horizon are never free, so runs cannot overhang it
+        window = ((1 << max(last - first, 0)) - 1) << first
+        return run & window
+
+    def find_windows(self, worker_ids, start: float, end: float, duration: float, headcount: int, limit: int):
+        """
+        Earliest non-overlapping windows of `duration` seconds inside [start, end)
+        where at least `headcount` of worker_ids are all free.
+        Returns [(start_slot, [worker_id, ...])].
+        """
+        self.ensure_current()
+        length = max(1, -int(-duration // SLOT_SECONDS))
+        first, last = self.slot_end(start), self.slot(end)
+        last = min(last - length + 1, self.horizon_slots)
+        if last <= first:
+            return []
+
+        runs = []
+        for worker_id in worker_ids:
+            run = self.free_runs(self.busy.get(worker_id, 0), first, last, length)
+            if run:
+                runs.append((worker_id, run))
+        if len(runs) < headcount:
+            return []
+
+        # at_least[k]: slots where at least k+1 workers are free (bit-sliced threshold count)
+        at_least = [0] * headcount
+        for _, run in runs:
+            for k in range(headcount - 1, 0, -1):
+                at_least[k] |= at_least[k - 1] & run
+            at_least[0] |= run
+        starts = at_least[-1]
+
+        windows = []
+        while starts and len(windows) < limit:
+            slot = (starts & -starts).bit_length() - 1
+            free_workers = [worker_id for worker_id, run in runs if run >> slot & 1]
+            windows.append((slot, free_workers))
+            # Next window may start once this one ends
+            starts &= ~((1 << (slot + length)) - 1)
+        return windows
+
+    def stats(self) -> dict:
+        return {
+            "origin": self.slot_time(0).isoformat() if self.origin is not None else None,
+            "slot_minutes": SLOT_SECONDS // 60,
+            "horizon_slots": self.horizon_slots,
+            "workers_indexed": len(self.busy),
+            "stale_workers": len(self.stale),
+            "bytes": sum((bits.bit_length() + 7) // 8 for bits in self.busy.values()),
+            "rebuilds": self.rebuilds,
+            "refreshed_workers": self.refreshed_workers,
+            "seq": self.seq,
+            "changes_seen": self.changes_seen,
+            "check_seconds": AVAILABILITY_CHECK_SECONDS,
+        }
+
+
+availability_index = TenantLocal(AvailabilityIndex)
+
+
+# Keep the index current: collect workers touched in each flush, invalidate them on commit
+
+def _touched_workers(session) -> set:
+    workers = set()
+    for obj in list(session.new) + list(session.deleted):
+        if isinstance(obj, JobAssignment):
+            workers.add(obj.worker_id)
+    for obj in session.dirty:
+        if isinstance(obj, JobAssignment):
+            # Moved to another job or worker: both the old and new worker change
+            workers.add(obj.worker_id)
+            workers.update(w for w in inspect(obj).attrs.worker_id.history.deleted or () if w is not None)
+        elif isinstance(obj, Job):
+            state = inspect(obj)
+            if state.attrs.planned_start.history.has_changes() or state.attrs.planned_end.history.has_changes():
+                rows = session.connection().execute(
+                    select(JobAssignment.worker_id).where(JobAssignment.job_id == obj.id)
+                )
+                workers.update(row.worker_id for row in rows)
+    return workers
+
+
+@event.listens_for(Session, "after_flush")
+def _collect(session, flush_context):
+    touched = _touched_workers(session)
+    if touched:
+        session.info.setdefault("availability_touched", set()).update(touched)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate(session):
+    touched = session.info.pop("availability_touched", None)
+    if touched:
+        index = availability_index.get(session.info.get("tenant"))
+        if index.origin is not None:
+            index.invalidate(touched)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard(session):
+    session.info.pop("availability_touched", None)
+
@@ -0,0 +1,459 @@
+"""
+Online backups of the SQLite database.
+
+Copying the database file while the API runs either blocks writers (a lock
+held for the whole copy) or produces a torn file. Snapshots here use
+SQLite's online backup API instead, copying BACKUP_PAGES_PER_STEP pages per
+step and sleeping BACKUP_STEP_SLEEP_MS between steps:
+
+- In WAL mode (the default, see SQLITE_WAL in app/db.py) the source
+  connection holds one read transaction for the whole backup, so the copy is
+  the database as of its start while writers keep committing to the WAL.
+- With the rollback journal each step takes a shared lock only while it
+  copies; a commit by another connection restarts the copy, given up after
+  BACKUP_MAX_RESTARTS restarts.
+
+Every snapshot reports its throughput and its effect on writers: how long
+acquiring the write lock takes just before the copy (a few probes), and how
+long each backup step held the source. Nothing touches the write lock while
+the copy runs. With the rollback journal a writer waits at most for the step
+in progress; in WAL mode writers never wait for the backup.
+
+Snapshots are written to BACKUP_DIR as `<db>-<UTC timestamp>.db[.gz]` with a
+`.json` sidecar (size, checksum, timings), and only the newest BACKUP_KEEP
+are kept. BACKUP_INTERVAL_MINUTES schedules them from the API process;
+backup_db.py takes, lists, verifies and restores them from the shell.
+Everything applies to the current tenant's database (app/utils/tenancy.py);
+other tenants' snapshots go to a directory per tenant.
+"""
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy.engine import make_url
+
+from app.db import DEFAULT_TENANT, current_tenant, tenant_url, tenants, use_tenant
+
+# Default: a `backups` directory next to the database (on the data volume in Docker);
+# other tenants' snapshots go to tenants/<tenant> (BACKUP_DIR) or backups/<tenant> next to their database
+BACKUP_DIR = os.getenv("BACKUP_DIR", "")
+BACKUP_INTERVAL_MINUTES = float(os.getenv("BACKUP_INTERVAL_MINUTES", "0"))
+BACKUP_KEEP = int(os.getenv("BACKUP_KEEP", "7"))
+BACKUP_COMPRESS = os.getenv("BACKUP_COMPRESS", "true").lower() not in ("0", "false", "no")
+BACKUP_PAGES_PER_STEP = int(os.getenv("BACKUP_PAGES_PER_STEP", "256"))
+BACKUP_STEP_SLEEP_MS = float(os.getenv("BACKUP_STEP_SLEEP_MS", "10"))
+BACKUP_MAX_RESTARTS = int(os.getenv("BACKUP_MAX_RESTARTS", "20"))
+BASELINE_PROBES = 10
+BASELINE_PROBE_GAP_MS = 10
+CHECKSUM_CHUNK = 1024 * 1024
+
+
+class BackupError(Exception):
+    """A snapshot, verification or restore could not be completed"""
+
+
+def database_path(tenant: str = None) -> str:
+    """Path of a tenant's SQLite database file (the current tenant by default)"""
+    try:
+        url = make_url(tenant_url(tenant or current_tenant.get()))
+    except ValueError as e:
+        raise BackupError(str(e))
+    if url.get_backend_name() != "sqlite" or url.database in (None, "", ":memory:"):
+        raise BackupError("Online backups are only available for a file-based SQLite database")
+    return os.path.abspath(url.database)
+
+
+def backup_dir(tenant: str = None) -> str:
+    tenant = tenant or current_tenant.get()
+    if tenant == DEFAULT_TENANT:
+        return os.path.abspath(BACKUP_DIR or os.path.join(os.path.dirname(database_path(tenant)), "backups"))
+    if BACKUP_DIR:
+        return os.path.abspath(os.path.join(BACKUP_DIR, "tenants", tenant))
+    return os.path.abspath(os.path.join(os.path.dirname(database_path(tenant)), "backups", tenant))
+
+
+def _connect(path: str, **kwargs) -> sqlite3.Connection:
+    connection = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False, **kwargs)
+    connection.execute("PRAGMA busy_timeout=5000")
+    return connection
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHECKSUM_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _percentiles(samples: list) -> dict:
+    if not samples:
+        return {"samples": 0, "p50_ms": None, "p95_ms": None, "max_ms": None}
+    ordered = sorted(samples)
+    return {
+        "samples": len(ordered),
+        "p50_ms": round(statistics.median(ordered), 2),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 2),
+        "max_ms": round(ordered[-1], 2),
+    }
+
+
+def writer_lock_baseline(path: str, probes: int = BASELINE_PROBES) -> dict:
+    """Time taken to acquire the write lock, sampled on its own connection before a backup"""
+    connection = _connect(path)
+    try:
+        samples = []
+        for _ in range(probes):
+            started = time.perf_counter()
+            connection.execute("BEGIN IMMEDIATE")
+            samples.append((time.perf_counter() - started) * 1000)
+            connection.execute("ROLLBACK")
+            time.sleep(BASELINE_PROBE_GAP_MS / 1000)
+        return _percentiles(samples)
+    finally:
+        connection.close()
+
+
+def _copy(source: sqlite3.Connection, target: sqlite3.Connection, pages: int, sleep_ms: float,
+          snapshot: bool, progress=None) -> dict:
+    """Incremental backup from source to target. Returns page and restart counts and step timings."""
+    state = {"steps": 0, "restarts": 0, "pages": 0, "remaining": None, "step_ms": [],
+             "step_started": time.perf_counter()}
+
+    def step(status, remaining, total):
+        # Called after each step: the time since the last sleep is how long the step held the source
+        state["step_ms"].append((time.perf_counter() - state["step_started"]) * 1000)
+        # Remaining pages going up means another connection wrote and the copy started over
+        if state["remaining"] is not None and remaining > state["remaining"]:
+            state["restarts"] += 1
+            if state["restarts"] > BACKUP_MAX_RESTARTS:
+                raise BackupError(
+                    f"Backup restarted {state['restarts']} times because of concurrent writes; "
+                    "enable WAL (SQLITE_WAL) or retry when the database is quieter"
+                )
+        state["steps"] += 1
+        state["remaining"] = remaining
+        state["pages"] = total
+        if progress:
+            progress((total - remaining) * 100 / max(total, 1), f"{total - remaining}/{total} pages copied")
+        if remaining and sleep_ms > 0:
+            time.sleep(sleep_ms / 1000)
+        state["step_started"] = time.perf_counter()
+
+    if snapshot:
+        # Pin one read snapshot: every step copies the same database version
+        source.execute("BEGIN")
+        source.execute("SELECT count(*) FROM sqlite_master").fetchone()
+    try:
+        source.backup(target, pages=max(pages, 1), progress=step)
+    finally:
+        if snapshot:
+            source.execute("COMMIT")
+    return {"steps": state["steps"], "restarts": state["restarts"], "pages": state["pages"],
+            "step_ms": state["step_ms"]}
+
+
+def _compress(path: str) -> str:
+    compressed = path + ".gz"
+    with open(path, "rb") as src, gzip.open(compressed, "wb", compresslevel=6) as dst:
+        shutil.copyfileobj(src, dst, CHECKSUM_CHUNK)
+    os.remove(path)
+    return compressed
+
+
+def _sidecar(path: str) -> str:
+    return (path[:-3] if path.endswith(".gz") else path) + ".json"
+
+
+def snapshot(compress: bool = BACKUP_COMPRESS, pages: int = BACKUP_PAGES_PER_STEP,
+             sleep_ms: float = BACKUP_STEP_SLEEP_MS, label: str = None, progress=None) -> dict:
+    """Take an online backup into BACKUP_DIR, then rotate old ones. Returns its metadata."""
+    source_path = database_path()
+    directory = backup_dir()
+    os.makedirs(directory, exist_ok=True)
+    stem = os.path.splitext(os.path.basename(source_path))[0]
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+    name = f"{stem}-{stamp}" + (f"-{label}" if label else "") + ".db"
+    final_path = os.path.join(directory, name)
+    part_path = final_path + ".part"
+
+    baseline = writer_lock_baseline(source_path)
+    source = _connect(source_path)
+    target = sqlite3.connect(part_path)
+    try:
+        journal_mode = source.execute("PRAGMA journal_mode").fetchone()[0].lower()
+        page_size = source.execute("PRAGMA page_size").fetchone()[0]
+        started = time.perf_counter()
+        copied = _copy(source, target, pages, sleep_ms, snapshot=journal_mode == "wal", progress=progress)
+        copy_seconds = time.perf_counter() - started
+        # Leave a self-contained rollback-journal file, whatever the source mode
+        target.execute("PRAGMA journal_mode=DELETE")
+    except BaseException:
+        target.close()
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        raise
+    finally:
+        source.close()
+    target.close()
+
+    os.replace(part_path, final_path)
+    path = final_path
+    if compress:
+        path = _compress(final_path)
+    database_bytes = copied["pages"] * page_size
+    meta = {
+        "file": os.path.basename(path),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "label": label,
+        "compressed": compress,
+        "database_bytes": database_bytes,
+        "file_bytes": os.path.getsize(path),
+        "sha256": _sha256(path),
+        "journal_mode": journal_mode,
+        "pages": copied["pages"],
+        "page_size": page_size,
+        "steps": copied["steps"],
+        "restarts": copied["restarts"],
+        "pages_per_step": pages,
+        "step_sleep_ms": sleep_ms,
+        "copy_seconds": round(copy_seconds, 3),
+        "total_seconds": round(time.perf_counter() - started, 3),
+        "pages_per_second": round(copied["pages"] / copy_seconds, 1) if copy_seconds else None,
+        "mb_per_second": round(database_bytes / copy_seconds / 1e6, 2) if copy_seconds else None,
+        "step_ms": _percentiles(copied["step_ms"]),
+        # Longest a writer can wait for the backup: the step in progress (none in WAL mode)
+        "writer_lock_wait": {
+            "baseline": baseline,
+            "during_backup": None if journal_mode == "wal" else _percentiles(copied["step_ms"]),
+        },
+    }
+    with open(_sidecar(path), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    meta["rotated"] = rotate()
+    return meta
+
+
+def list_backups() -> list:
+    """Snapshots in BACKUP_DIR with their metadata, newest first"""
+    directory = backup_dir()
+    if not os.path.isdir(directory):
+        return []
+    backups = []
+    for name in sorted(os.listdir(directory), reverse=True):
+        if name.startswith(".") or not (name.endswith(".db") or name.endswith(".db.gz")):
+            continue
+        path = os.path.join(directory, name)
+        try:
+            with open(_sidecar(path), encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            meta = {"file": name, "file_bytes": os.path.getsize(path)}
+        meta["path"] = path
+        backups.append(meta)
+    return backups
+
+
+def rotate(keep: int = BACKUP_KEEP) -> list:
+    """Delete all but the newest `keep` snapshots. Returns the deleted file names."""
+    if keep <= 0:
+        return []
+    removed = []
+    for meta in list_backups()[keep:]:
+        for path in (meta["path"], _sidecar(meta["path"])):
+            if os.path.exists(path):
+                os.remove(path)
+        removed.append(meta["file"])
+    return removed
+
+
+def resolve(name: str) -> str:
+    """Path of a snapshot given its file name (in BACKUP_DIR) or a path"""
+    path = name if os.path.sep in name else os.path.join(backup_dir(), name)
+    if not os.path.isfile(path):
+        raise BackupError(f"Backup not found: {name}")
+    return path
+
+
+class _Opened:
+    """A snapshot as a plain database file, decompressed to a temporary file if needed"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.temp = None
+
+    def __enter__(self) -> str:
+        if not self.path.endswith(".gz"):
+            return self.path
+        fd, self.temp = tempfile.mkstemp(prefix=".verify-", suffix=".db", dir=os.path.dirname(self.path))
+        try:
+            with os.fdopen(fd, "wb") as dst, gzip.open(self.path, "rb") as src:
+                shutil.copyfileobj(src, dst, CHECKSUM_CHUNK)
+        except (OSError, EOFError) as e:
+            os.remove(self.temp)
+            raise BackupError(f"Cannot decompress {os.path.basename(self.path)}: {e}")
+        return self.temp
+
+    def __exit__(self, *exc):
+        if self.temp and os.path.exists(self.temp):
+            os.remove(self.temp)
+        return False
+
+
+def verify(name: str) -> dict:
+    """Check a snapshot's checksum and run SQLite's integrity check on it"""
+    path = resolve(name)
+    result = {"file": os.path.basename(path), "ok": False, "checksum": None, "integrity": None}
+    try:
+        with open(_sidecar(path), encoding="utf-8") as f:
+            expected = json.load(f).get("sha256")
+    except (OSError, ValueError):
+        expected = None
+    if expected:
+        result["checksum"] = "ok" if _sha256(path) == expected else "mismatch"
+
+    started = time.perf_counter()
+    with _Opened(path) as db_path:
+        connection = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+        try:
+            problems = [row[0] for row in connection.execute("PRAGMA integrity_check")]
+            tables = [row[0] for row in connection.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name"
+            )]
+            try:
+                schema = connection.execute("SELECT version_num FROM alembic_version").fetchone()
+            except sqlite3.DatabaseError:
+                schema = None
+        except sqlite3.DatabaseError as e:
+            problems, tables, schema = [str(e)], [], None
+        finally:
+            connection.close()
+    result.update({
+        "integrity": "ok" if problems == ["ok"] else problems[:20],
+        "tables": len(tables),
+        "schema_revision": schema[0] if schema else None,
+        "seconds": round(time.perf_counter() - started, 3),
+    })
+    result["ok"] = result["integrity"] == "ok" and result["checksum"] != "mismatch"
+    return result
+
+
+def restore(name: str, pages: int = -1) -> dict:
+    """
+    Replace the live database with a verified snapshot, through the backup API
+    so SQLite's locking and WAL are respected. Stop the API (and task workers)
+    first: processes that keep running hold caches of the old data.
+    """
+    path = resolve(name)
+    check = verify(path)
+    if not check["ok"]:
+        raise BackupError(f"Refusing to restore {check['file']}: verification failed ({check})")
+    target_path = database_path()
+    started = time.perf_counter()
+    with _Opened(path) as db_path:
+        source = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+        target = _connect(target_path)
+        try:
+            journal_mode = target.execute("PRAGMA journal_mode").fetchone()[0]
+            source.backup(target, pages=pages)
+            # The backup copies the snapshot's header too; put the live journal mode back
+            target.execute(f"PRAGMA journal_mode={journal_mode}")
+        finally:
+            target.close()
+            source.close()
+    return {"file": check["file"], "restored_to": target_path, "seconds": round(time.perf_counter() - started, 3),
+            "schema_revision": check["schema_revision"]}
+
+
+class BackupScheduler:
+    """Takes a snapshot of each tenant every BACKUP_INTERVAL_MINUTES from a thread in the API process"""
+
+    def __init__(self):
+        self.thread = None
+        self.stop_event = threading.Event()
+        self.lock = threading.Lock()  # One snapshot at a time from this process
+        self.runs = 0
+        self.failures = 0
+        self.last_error = None
+        self.last = None
+
+    def start(self, interval_minutes: float = BACKUP_INTERVAL_MINUTES):
+        if interval_minutes <= 0 or (self.thread is not None and self.thread.is_alive()):
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(
+            target=self._run, args=(interval_minutes * 60,), name="backup-scheduler", daemon=True
+        )
+        self.thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        if self.thread is not None and self.thread.is_alive():
+            self.stop_event.set()
+            self.thread.join(timeout)
+
+    def _due(self, interval: float) -> float:
+        """Seconds until the next snapshot; snapshots taken by other processes count too"""
+        newest = next((m for m in list_backups() if "created_at" in m), None)
+        if newest is None:
+            return 0
+        age = (datetime.now(timezone.utc) - datetime.fromisoformat(newest["created_at"])).total_seconds()
+        return max(interval - age, 0)
+
+    def _run(self, interval: float):
+        while not self.stop_event.is_set():
+            wait = interval
+            for tenant in tenants():
+                if self.stop_event.is_set():
+                    return
+                try:
+                    with use_tenant(tenant):
+                        due = self._due(interval)
+                        if due <= 0:
+                            self.run_now()
+                            due = interval
+                except Exception as e:
+                    self.failures += 1
+                    self.last_error = f"{tenant}: {type(e).__name__}: {e}"
+                    due = min(interval, 300)
+                wait = min(wait, due)
+            self.stop_event.wait(wait)
+
+    def run_now(self, **kwargs) -> dict:
+        with self.lock:
+            meta = snapshot(**kwargs)
+        self.runs += 1
+        self.last = meta
+        self.last_error = None
+        return meta
+
+    def stats(self) -> dict:
+        try:
+            backups = list_backups()
+            directory = backup_dir()
+        except BackupError as e:
+            return {"available": False, "detail": str(e)}
+        return {
+            "available": True,
+            "directory": directory,
+            "interval_minutes": BACKUP_INTERVAL_MINUTES,
+            "keep": BACKUP_KEEP,
+            "compress": BACKUP_COMPRESS,
+            "pages_per_step": BACKUP_PAGES_PER_STEP,
+            "step_sleep_ms": BACKUP_STEP_SLEEP_MS,
+            "scheduler_running": self.thread is not None and self.thread.is_alive(),
+            "scheduled_runs": self.runs,
+            "scheduled_failures": self.failures,
+            "last_error": self.last_error,
+            "backups": [{k: v for k, v in meta.items() if k != "path"} for meta in backups],
+        }
+
+
+backup_scheduler = BackupScheduler()
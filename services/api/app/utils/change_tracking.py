@@ -0,0 +1,115 @@
+"""
+Change sequence maintained on writes.
+
+Every flush that inserts, updates or deletes a tracked row appends an entry to
+`sync_changes` on the same connection, so the change is committed (or rolled
+back) together with the write itself. The entry's `seq` is the monotonically
+increasing value handed to clients as their sync token. A row moved to
+another worker or job also gets a delete entry scoped to where it was.
+"""
+from sqlalchemy import event, insert, inspect, select
+from sqlalchemy.orm import Session
+
+from app.models.models import Expertise, Job, JobAssignment, SyncChange, TimeEntry, User, WorkerExpertise
+
+# Model -> entity name stored in sync_changes
+TRACKED_MODELS = {
+    Job: "job",
+    JobAssignment: "assignment",
+    TimeEntry: "time_entry",
+    WorkerExpertise: "worker_expertise",
+    Expertise: "expertise",
+    User: "user",
+}
+
+
+def change_row(entity: str, entity_id: int, op: str, worker_id: int = None, job_id: int = None) -> dict:
+    """Build a sync_changes row for `record_changes`"""
+    return {"entity": entity, "entity_id": entity_id, "op": op, "worker_id": worker_id, "job_id": job_id}
+
+
+def record_changes(connection, rows: list) -> None:
+    """
+    Append rows to the change sequence.
+    ORM writes are tracked automatically; Core write paths (bulk inserts,
+    raw updates) must call this on the connection they write with.
+    """
+    if rows:
+        connection.execute(insert(SyncChange.__table__), rows)
+
+
+def _scope(entity: str, obj) -> tuple:
+    """Return (worker_id, job_id) the changed row belongs to"""
+    if entity == "job":
+        return None, obj.id
+    if entity in ("assignment", "time_entry"):
+        return obj.worker_id, obj.job_id
+    if entity == "worker_expertise":
+        return obj.worker_id, None
+    if entity == "user":
+        return obj.id, None
+    return None, None
+
+
+# Entities whose rows can move to another worker or job
+_MOVABLE = {"assignment": ("worker_id", "job_id"), "time_entry": ("worker_id", "job_id"),
+            "worker_expertise": ("worker_id",)}
+
+
+def _moved_from(session) -> dict:
+    """
+    {obj: (worker_id, job_id)} as stored, for updated rows whose worker or job
+    changes in this flush. Read from the database: the attribute history has no
+    old value when the object was expired (e.g. after a commit) before the change.
+    """
+    moved = {}
+    for obj in session.dirty:
+        entity = TRACKED_MODELS.get(type(obj))
+        keys = _MOVABLE.get(entity)
+        if keys is None or obj.id is None:
+            continue
+        attrs = inspect(obj).attrs
+        if not any(attrs[key].history.has_changes() for key in keys):
+            continue
+        model = type(obj)
+        stored = session.connection().execute(
+            select(*[getattr(model, key) for key in keys]).where(model.id == obj.id)
+        ).first()
+        if stored is not None:
+            values = dict(zip(keys, stored))
+            moved[obj] = (values["worker_id"], values.get("job_id"))
+    return moved
+
+
+@event.listens_for(Session, "before_flush")
+def _remember_scope(session, flush_context, instances):
+    session.info["moved_from"] = _moved_from(session)
+
+
+def _deactivated(obj) -> bool:
+    history = inspect(obj).attrs.is_active.history
+    return bool(history.deleted) and history.added == [False]
+
+
+@event.listens_for(Session, "after_flush")
+def _track_flush(session, flush_context):
+    moved_from = session.info.pop("moved_from", {})
+    rows = []
+    for objects, op in ((session.new, "upsert"), (session.dirty, "upsert"), (session.deleted, "delete")):
+        for obj in objects:
+            entity = TRACKED_MODELS.get(type(obj))
+            if entity is None:
+                continue
+            if op == "upsert" and obj in session.dirty and not session.is_modified(obj, include_collections=False):
+                continue
+            row_op = op
+            if entity == "user" and op == "upsert" and obj not in session.new and _deactivated(obj):
+                row_op = "deactivate"
+            worker_id, job_id = _scope(entity, obj)
+            previous = moved_from.get(obj) if op == "upsert" else None
+            if previous is not None and previous != (worker_id, job_id):
+                # Tombstone for the old worker's client; written before the upsert, so a
+                # row moved to another job of the same worker still ends as an upsert
+                rows.append(change_row(entity, obj.id, "delete", *previous))
+            rows.append(change_row(entity, obj.id, row_op, worker_id, job_id))
+    record_changes(session.connection(), rows)
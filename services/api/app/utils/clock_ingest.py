@@ -0,0 +1,310 @@
+"""
+Clock-in/clock-out ingestion with group commit.
+
+Request handlers hand their batch of events to a single writer thread and
+wait for the per-event outcome. The writer collects every batch that
+arrives within CLOCK_GROUP_WAIT_MS (up to CLOCK_GROUP_MAX_EVENTS events) and
+applies them in one transaction: one indexed lookup for idempotency keys,
+one for assignments, one for open time entries, bulk inserts/updates and a
+single commit. On SQLite that turns thousands of small write transactions
+(each waiting for the database lock and a sync to disk) into a few large ones.
+
+Per event the outcome is:
+- accepted: `in` opened a time entry / `out` closed the open one
+- duplicate: the (worker, idempotency key) pair was already accepted; the
+  original time entry is reported and nothing is written
+- rejected: not assigned to the job, already clocked in, not clocked in,
+  or the timestamp is implausible; not stored, so a retry is re-validated
+
+Writes bypass the ORM, so sync changes and counters are recorded explicitly
+(app/utils/change_tracking.py, app/utils/counters.py). Each tenant database
+has its own writer thread (`clock_writer` is TenantLocal).
+"""
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from datetime import timedelta
+
+from sqlalchemy import and_, bindparam, insert, select, tuple_, update
+
+from app.db import get_engine
+from app.models.models import ClockEvent, JobAssignment, TimeEntry
+from app.utils.change_tracking import change_row, record_changes
+from app.utils.counters import apply_deltas, tally
+from app.utils.tenancy import TenantLocal
+from app.utils.timeutil import utc_now
+
+CLOCK_GROUP_WAIT_MS = float(os.getenv("CLOCK_GROUP_WAIT_MS", "5"))
+CLOCK_GROUP_MAX_EVENTS = int(os.getenv("CLOCK_GROUP_MAX_EVENTS", "5000"))
+# Events stamped further in the future than this (device clock skew) are rejected
+CLOCK_MAX_SKEW_SECONDS = int(os.getenv("CLOCK_MAX_SKEW_SECONDS", "300"))
+# Oldest event accepted, for devices that were offline
+CLOCK_MAX_AGE_DAYS = int(os.getenv("CLOCK_MAX_AGE_DAYS", "7"))
+LOOKUP_CHUNK = 400
+
+
+class ClockEventIn:
+    __slots__ = ("worker_id", "key", "job_id", "kind", "at")
+
+    def __init__(self, worker_id: int, key: str, job_id: int, kind: str, at):
+        self.worker_id = worker_id
+        self.key = key
+        self.job_id = job_id
+        self.kind = kind  # in, out
+        self.at = at  # Naive UTC
+
+
+class _NewEntry:
+    """Time entry opened in the current group, inserted at the end"""
+    __slots__ = ("worker_id", "job_id", "start_time", "end_time", "id")
+
+    def __init__(self, worker_id, job_id, start_time):
+        self.worker_id = worker_id
+        self.job_id = job_id
+        self.start_time = start_time
+        self.end_time = None
+        self.id = None
+
+
+def _chunks(items: list):
+    for start in range(0, len(items), LOOKUP_CHUNK):
+        yield items[start:start + LOOKUP_CHUNK]
+
+
+def _rejected(detail: str) -> dict:
+    return {"status": "rejected", "detail": detail, "time_entry_id": None}
+
+
+class ClockWriter:
+    def __init__(self, tenant: str = None):
+        self.tenant = tenant
+        self.queue = queue.Queue()
+        self.thread = None
+        self.lock = threading.Lock()
+        self.groups = 0
+        self.batches = 0
+        self.events = 0
+        self.accepted = 0
+        self.duplicates = 0
+        self.rejected = 0
+        self.largest_group = 0
+        self.last_commit_ms = None
+
+    def submit(self, events: list) -> Future:
+        """Queue a batch of ClockEventIn; the future resolves to one result dict per event"""
+        self._ensure_started()
+        future = Future()
+        self.queue.put((events, future))
+        return future
+
+    def _ensure_started(self):
+        if self.thread is not None and self.thread.is_alive():
+            return
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._run, name=f"clock-writer-{self.tenant}", daemon=True)
+                self.thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        """Write what is queued and stop the writer thread"""
+        if self.thread is not None and self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join(timeout)
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            group = [item]
+            size = len(item[0])
+            deadline = time.monotonic() + CLOCK_GROUP_WAIT_MS / 1000
+            stopping = False
+            while size < CLOCK_GROUP_MAX_EVENTS:
+                try:
+                    item = self.queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                group.append(item)
+                size += len(item[0])
+            self._commit_group(group)
+            if stopping:
+                return
+
+    def _commit_group(self, group: list):
+        started = time.perf_counter()
+        try:
+            results = self._apply([events for events, _ in group])
+        except Exception:
+            # Apply batches one by one so a failure only affects its own request
+            results = []
+            for events, future in group:
+                try:
+                    results.append(self._apply([events])[0])
+                except Exception as e:
+                    results.append(e)
+        for (_, future), result in zip(group, results):
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+        self.last_commit_ms = round((time.perf_counter() - started) * 1000, 2)
+        self.groups += 1
+        self.batches += len(group)
+        self.largest_group = max(self.largest_group, sum(len(events) for events, _ in group))
+
+    def _apply(self, batches: list) -> list:
+        """Apply batches in one transaction. Returns the result lists, one per batch."""
+        events = [event for batch in batches for event in batch]
+        now = utc_now()
+        with get_engine(self.tenant).begin() as connection:
+            workers = sorted({e.worker_id for e in events})
+            jobs = sorted({e.job_id for e in events})
+
+            accepted_before = {}
+            for keys in _chunks(sorted({(e.worker_id, e.key) for e in events})):
+                for row in connection.execute(
+                    select(ClockEvent.worker_id, ClockEvent.idempotency_key, ClockEvent.time_entry_id)
+                    .where(tuple_(ClockEvent.worker_id, ClockEvent.idempotency_key).in_(keys))
+                ):
+                    accepted_before[(row.worker_id, row.idempotency_key)] = row.time_entry_id
+
+            assigned = set()
+            for worker_chunk in _chunks(workers):
+                assigned.update(connection.execute(
+                    select(JobAssignment.worker_id, JobAssignment.job_id)
+                    .where(JobAssignment.worker_id.in_(worker_chunk), JobAssignment.job_id.in_(jobs))
+                ).tuples())
+
+            open_entries = {}  # (worker_id, job_id) -> (entry id or _NewEntry, start_time)
+            for worker_chunk in _chunks(workers):
+                for row in connection.execute(
+                    select(TimeEntry.id, TimeEntry.worker_id, TimeEntry.job_id, TimeEntry.start_time)
+                    .where(TimeEntry.worker_id.in_(worker_chunk), TimeEntry.end_time.is_(None))
+                    .order_by(TimeEntry.start_time)
+                ):
+                    open_entries[(row.worker_id, row.job_id)] = (row.id, row.start_time)
+
+            earliest = now - timedelta(days=CLOCK_MAX_AGE_DAYS)
+            latest = now + timedelta(seconds=CLOCK_MAX_SKEW_SECONDS)
+            seen = {}  # (worker_id, key) accepted in this group -> entry
+            new_entries = []
+            closes = []  # (existing entry id, end_time, worker_id, job_id)
+            accepted_events = []  # (event, entry)
+            all_results = []
+            for batch in batches:
+                results = [None] * len(batch)
+                # Apply each batch in time order; results keep the submitted order
+                for index in sorted(range(len(batch)), key=lambda i: batch[i].at):
+                    event = batch[index]
+                    pair = (event.worker_id, event.key)
+                    if pair in accepted_before:
+                        results[index] = {"status": "duplicate", "detail": None,
+                                          "time_entry_id": accepted_before[pair]}
+                        continue
+                    if pair in seen:
+                        results[index] = {"status": "duplicate", "detail": None, "time_entry_id": seen[pair]}
+                        continue
+                    if not (earliest <= event.at <= latest):
+                        results[index] = _rejected("Timestamp is too far in the past or future")
+                        continue
+                    if (event.worker_id, event.job_id) not in assigned:
+                        results[index] = _rejected("Worker is not assigned to this job")
+                        continue
+                    slot = (event.worker_id, event.job_id)
+                    current = open_entries.get(slot)
+                    if event.kind == "in":
+                        if current is not None:
+                            results[index] = _rejected("Already clocked in to this job")
+                            continue
+                        entry = _NewEntry(event.worker_id, event.job_id, event.at)
+                        new_entries.append(entry)
+                        open_entries[slot] = (entry, event.at)
+                    else:
+                        if current is None:
+                            results[index] = _rejected("Not clocked in to this job")
+                            continue
+                        entry, start_time = current
+                        if event.at < start_time:
+                            results[index] = _rejected("Clock-out is before the clock-in")
+                            continue
+                        if isinstance(entry, _NewEntry):
+                            entry.end_time = event.at
+                        else:
+                            closes.append((entry, event.at, event.worker_id, event.job_id))
+                        del open_entries[slot]
+                    results[index] = {"status": "accepted", "detail": None, "time_entry_id": entry}
+                    seen[pair] = entry
+                    accepted_events.append((event, entry))
+                all_results.append(results)
+
+            closed_ids = [close[0] for close in closes]
+            before = tally(connection, time_entries=closed_ids)
+            if new_entries:
+                inserted = connection.execute(
+                    insert(TimeEntry).returning(TimeEntry.id, sort_by_parameter_order=True),
+                    [{"worker_id": e.worker_id, "job_id": e.job_id, "start_time": e.start_time,
+                      "end_time": e.end_time} for e in new_entries],
+                )
+                for entry, row in zip(new_entries, inserted):
+                    entry.id = row.id
+            if closes:
+                connection.execute(
+                    update(TimeEntry)
+                    .where(and_(TimeEntry.id == bindparam("entry_id"), TimeEntry.end_time.is_(None)))
+                    .values(end_time=bindparam("closed_at")),
+                    [{"entry_id": entry_id, "closed_at": closed_at} for entry_id, closed_at, _, _ in closes],
+                )
+
+            def entry_id(entry):
+                return entry.id if isinstance(entry, _NewEntry) else entry
+
+            if accepted_events:
+                connection.execute(insert(ClockEvent), [
+                    {"worker_id": e.worker_id, "idempotency_key": e.key, "job_id": e.job_id, "kind": e.kind,
+                     "occurred_at": e.at, "received_at": now, "time_entry_id": entry_id(entry)}
+                    for e, entry in accepted_events
+                ])
+            changed = [(e.id, e.worker_id, e.job_id) for e in new_entries]
+            changed += [(entry_id, worker_id, job_id) for entry_id, _, worker_id, job_id in closes]
+            apply_deltas(connection, before, tally(connection, time_entries=[c[0] for c in changed]))
+            record_changes(connection, [
+                change_row("time_entry", entry_id, "upsert", worker_id, job_id) for entry_id, worker_id, job_id in changed
+            ])
+
+        for results in all_results:
+            for result in results:
+                if result["status"] == "accepted":
+                    result["time_entry_id"] = entry_id(result["time_entry_id"])
+                    self.accepted += 1
+                elif result["status"] == "duplicate":
+                    result["time_entry_id"] = entry_id(result["time_entry_id"])
+                    self.duplicates += 1
+                else:
+                    self.rejected += 1
+        self.events += len(events)
+        return all_results
+
+    def stats(self) -> dict:
+        return {
+            "running": self.thread is not None and self.thread.is_alive(),
+            "queued_batches": self.queue.qsize(),
+            "groups": self.groups,
+            "batches": self.batches,
+            "events": self.events,
+            "accepted": self.accepted,
+            "duplicates": self.duplicates,
+            "rejected": self.rejected,
+            "events_per_group": round(self.events / self.groups, 1) if self.groups else None,
+            "largest_group": self.largest_group,
+            "last_commit_ms": self.last_commit_ms,
+            "group_wait_ms": CLOCK_GROUP_WAIT_MS,
+        }
+
+
+clock_writer = TenantLocal(ClockWriter)
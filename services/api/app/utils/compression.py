@@ -0,0 +1,304 @@
+"""
+Response compression with a cache of compressed bodies.
+
+Compressible responses (allowlisted content types, at least
+COMPRESSION_MIN_BYTES) are compressed with the best encoding the client
+accepts: brotli or zstd when their packages are installed, gzip otherwise.
+Successful GET responses get an ETag derived from the body, so clients can
+revalidate with If-None-Match and receive a body-less 304. Compressed bodies
+are kept in an LRU keyed by (ETag, encoding) and bounded in bytes, so
+repeated requests for an unchanged user list or log page skip the
+compression step.
+
+Written as a plain ASGI middleware so streamed, non-compressible and large
+responses pass through without buffering: only bodies with a Content-Length
+up to COMPRESSION_MAX_BYTES are compressed, so big FileResponse downloads
+(task exports) and StreamingResponse bodies go out as they are, and so do
+HEAD responses. Their own ETags are still honoured with a 304.
+"""
+import gzip
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # Optional: pip install brotli
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # Optional: pip install zstandard
+    zstandard = None
+
+COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "true").lower() not in ("0", "false", "no")
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+# Larger bodies are sent uncompressed rather than read into memory
+COMPRESSION_MAX_BYTES = int(os.getenv("COMPRESSION_MAX_BYTES", str(8 * 1024 * 1024)))
+COMPRESSION_CACHE_BYTES = int(os.getenv("COMPRESSION_CACHE_BYTES", str(32 * 1024 * 1024)))
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+ZSTD_LEVEL = 6
+# Bodies larger than this are compressed in the threadpool instead of on the event loop
+OFFLOAD_BYTES = 256 * 1024
+
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+    "text/",
+)
+
+
+def _compress_gzip(body: bytes) -> bytes:
+    # mtime=0 keeps the output deterministic for identical bodies
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+# Server preference when the client rates several encodings equally
+ENCODERS = {}
+if brotli is not None:
+    ENCODERS["br"] = lambda body: brotli.compress(body, quality=BROTLI_QUALITY)
+if zstandard is not None:
+    ENCODERS["zstd"] = lambda body: zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(body)
+ENCODERS["gzip"] = _compress_gzip
+
+
+def negotiate(accept_encoding: str):
+    """Pick an available encoding from an Accept-Encoding header, or None for identity"""
+    ranked = {}
+    wildcard = None
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if name == "*":
+            wildcard = q
+        elif name:
+            ranked[name] = q
+    best, best_q = None, 0.0
+    for name in ENCODERS:
+        q = ranked.get(name, wildcard if wildcard is not None else 0.0)
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+
+class CompressedCache:
+    """LRU of compressed bodies keyed by (etag, encoding), bounded by total bytes"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self.lock:
+            body = self.entries.get(key)
+            if body is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return body
+
+    def put(self, key, body: bytes):
+        if len(body) > self.max_bytes // 4:
+            return  # One huge body would flush everything else
+        with self.lock:
+            if key in self.entries:
+                return
+            self.entries[key] = body
+            self.bytes += len(body)
+            while self.bytes > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.bytes -= len(evicted)
+                self.evictions += 1
+
+
+def _etag(body: bytes) -> str:
+    # Weak: the same tag covers every encoding of the body
+    return 'W/"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison (RFC 9110), as If-None-Match uses"""
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.strip().removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(","))
+
+
+class Compressor:
+    """Compression counters and the compressed-body cache, shared by every request"""
+
+    def __init__(self, minimum_size: int = COMPRESSION_MIN_BYTES, cache_bytes: int = COMPRESSION_CACHE_BYTES):
+        self.minimum_size = minimum_size
+        self.cache = CompressedCache(cache_bytes)
+        self.compressed = 0
+        self.not_modified = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.by_encoding = dict.fromkeys(ENCODERS, 0)
+
+    async def encode(self, body: bytes, etag: str, encoding: str) -> bytes:
+        key = (etag, encoding)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        encoder = ENCODERS[encoding]
+        if len(body) > OFFLOAD_BYTES:
+            compressed = await run_in_threadpool(encoder, body)
+        else:
+            compressed = encoder(body)
+        self.cache.put(key, compressed)
+        return compressed
+
+    def stats(self) -> dict:
+        return {
+            "enabled": COMPRESSION_ENABLED,
+            "encodings": list(ENCODERS),
+            "minimum_size": self.minimum_size,
+            "maximum_size": COMPRESSION_MAX_BYTES,
+            "compressed_responses": self.compressed,
+            "by_encoding": self.by_encoding,
+            "not_modified": self.not_modified,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "ratio": round(self.bytes_out / self.bytes_in, 3) if self.bytes_in else None,
+            "cache": {
+                "entries": len(self.cache.entries),
+                "bytes": self.cache.bytes,
+                "max_bytes": self.cache.max_bytes,
+                "hits": self.cache.hits,
+                "misses": self.cache.misses,
+                "evictions": self.cache.evictions,
+            },
+        }
+
+
+compressor = Compressor()
+
+
+class CompressionMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not COMPRESSION_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        responder = _Responder(compressor, scope["method"], Headers(scope=scope), send)
+        await self.app(scope, receive, responder.send)
+
+
+class _Responder:
+    """Send wrapper for one response: passes it through or buffers it for compression"""
+
+    def __init__(self, compressor, method: str, request_headers: Headers, send):
+        self.compressor = compressor
+        self.method = method
+        self.encoding = negotiate(request_headers.get("accept-encoding", ""))
+        self.if_none_match = request_headers.get("if-none-match")
+        self._send = send
+        self.start = None
+        self.chunks = []
+        self.passthrough = False
+        self.dropping = False  # Body of a response answered with 304
+
+    def _eligible(self, headers: Headers) -> bool:
+        content_type = headers.get("content-type", "").lower()
+        if not content_type.startswith(COMPRESSIBLE_TYPES):
+            return False
+        if "content-encoding" in headers:
+            return False
+        # Streamed responses (no Content-Length) and large ones are passed through rather than buffered
+        content_length = headers.get("content-length")
+        return content_length is not None and content_length.isdigit() and int(content_length) <= COMPRESSION_MAX_BYTES
+
+    def _not_modified(self, status_code: int, etag) -> bool:
+        return (self.method in ("GET", "HEAD") and status_code == 200 and etag is not None
+                and self.if_none_match is not None and _etag_matches(self.if_none_match, etag))
+
+    async def _send_not_modified(self, headers: MutableHeaders):
+        self.compressor.not_modified += 1
+        del headers["content-length"]
+        await self._send({"type": "http.response.start", "status": 304, "headers": headers.raw})
+        await self._send({"type": "http.response.body", "body": b""})
+
+    async def send(self, message):
+        if self.dropping:
+            return
+        if self.passthrough:
+            await self._send(message)
+            return
+        if message["type"] == "http.response.start":
+            headers = Headers(raw=message["headers"])
+            if self._not_modified(message["status"], headers.get("etag")):
+                # The endpoint's own ETag (e.g. FileResponse): skip its body
+                self.dropping = True
+                await self._send_not_modified(MutableHeaders(raw=list(message["headers"])))
+                return
+            # HEAD has no body to compress: keep the endpoint's Content-Length
+            if self.method == "HEAD" or not self._eligible(headers):
+                self.passthrough = True
+                await self._send(message)
+                return
+            self.start = message
+            return
+        if message["type"] != "http.response.body":
+            await self._send(message)
+            return
+        self.chunks.append(message.get("body", b""))
+        if message.get("more_body", False):
+            return
+        await self._finish(b"".join(self.chunks))
+
+    async def _finish(self, body: bytes):
+        compressor = self.compressor
+        start = self.start
+        headers = MutableHeaders(raw=list(start["headers"]))
+        headers.add_vary_header("Accept-Encoding")
+
+        etag = None
+        if self.method in ("GET", "HEAD") and start["status"] == 200 and body:
+            etag = headers.get("etag") or _etag(body)
+            headers["ETag"] = etag
+            if self._not_modified(start["status"], etag):
+                await self._send_not_modified(headers)
+                return
+
+        if self.encoding and len(body) >= compressor.minimum_size:
+            if etag is not None:
+                compressed = await compressor.encode(body, etag, self.encoding)
+            else:
+                compressed = ENCODERS[self.encoding](body)
+            if len(compressed) < len(body):
+                compressor.compressed += 1
+                compressor.by_encoding[self.encoding] += 1
+                compressor.bytes_in += len(body)
+                compressor.bytes_out += len(compressed)
+                headers["Content-Encoding"] = self.encoding
+                if etag is not None and not etag.startswith("W/"):
+                    # A strong tag names the uncompressed bytes
+                    headers["ETag"] = "W/" + etag
+                body = compressed
+
+        headers["Content-Length"] = str(len(body))
+        await self._send({"type": "http.response.start", "status": start["status"], "headers": headers.raw})
+        await self._send({"type": "http.response.body", "body": body})
@@ -0,0 +1,235 @@
+"""
+Denormalized counters maintained on write.
+
+`entity_counters` holds per-user and per-job counts so list views can show
+them without COUNT(*) joins:
+
+    user  assignments        per week (bucket = Monday of the job's start week)
+    user  open_completions   completion records not yet approved
+    user  time_entries       per week of the entry's start
+    user  open_time_entries  entries without an end time (clocked in)
+    job   assigned           assignments (compare with jobs.required_headcount)
+    job   open_completions   completion records not yet approved
+    job   time_entries       all entries
+
+Counters are updated in the same transaction as the write. ORM writes are
+covered by the session hooks below: before a flush the affected rows are
+counted as stored, after it as written, and the difference is applied.
+Core write paths must do the same on their connection:
+
+    before = tally(connection, time_entries=ids)
+    ... write ...
+    apply_deltas(connection, before, tally(connection, time_entries=ids + new_ids))
+
+`reconcile` (reconcile_counters.py, or the `counters_reconcile` task)
+recounts everything and repairs drift.
+"""
+from datetime import timedelta
+
+from sqlalchemy import and_, delete, event, inspect, or_, select, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.models.models import CompletionRecord, EntityCounter, Job, JobAssignment, TimeEntry
+from app.utils.timeutil import naive_utc, utc_now
+
+TOTAL = ''
+ID_CHUNK = 500
+
+
+def week_bucket(value) -> str:
+    """Bucket of a timestamp: the Monday (UTC) of its week, as YYYY-MM-DD"""
+    value = naive_utc(value)
+    return (value - timedelta(days=value.weekday())).date().isoformat()
+
+
+def current_week() -> str:
+    return week_bucket(utc_now())
+
+
+# What each row of a counted table contributes: [(entity, entity_id, name, bucket)]
+
+def _assignment_keys(row):
+    return [("user", row.worker_id, "assignments", week_bucket(row.planned_start)),
+            ("job", row.job_id, "assigned", TOTAL)]
+
+
+def _completion_keys(row):
+    if row.approved_at is not None:
+        return []
+    return [("user", row.worker_id, "open_completions", TOTAL),
+            ("job", row.job_id, "open_completions", TOTAL)]
+
+
+def _time_entry_keys(row):
+    keys = [("user", row.worker_id, "time_entries", week_bucket(row.start_time)),
+            ("job", row.job_id, "time_entries", TOTAL)]
+    if row.end_time is None:
+        keys.append(("user", row.worker_id, "open_time_entries", TOTAL))
+    return keys
+
+
+# kind -> (model, query of the columns the keys need, keys function)
+SOURCES = {
+    "assignments": (
+        JobAssignment,
+        select(JobAssignment.worker_id, JobAssignment.job_id, Job.planned_start)
+        .join(Job, Job.id == JobAssignment.job_id),
+        _assignment_keys,
+    ),
+    "completions": (
+        CompletionRecord,
+        select(CompletionRecord.worker_id, CompletionRecord.job_id, CompletionRecord.approved_at),
+        _completion_keys,
+    ),
+    "time_entries": (
+        TimeEntry,
+        select(TimeEntry.worker_id, TimeEntry.job_id, TimeEntry.start_time, TimeEntry.end_time),
+        _time_entry_keys,
+    ),
+}
+MODEL_KINDS = {model: kind for kind, (model, _, _) in SOURCES.items()}
+
+
+def _count(counts: dict, rows, keys):
+    for row in rows:
+        for key in keys(row):
+            counts[key] = counts.get(key, 0) + 1
+
+
+def tally(connection, assignments=(), completions=(), time_entries=()) -> dict:
+    """Contributions of the given rows as currently stored: {(entity, id, name, bucket): count}"""
+    counts = {}
+    for kind, ids in (("assignments", assignments), ("completions", completions), ("time_entries", time_entries)):
+        model, query, keys = SOURCES[kind]
+        ids = list(ids)
+        for start in range(0, len(ids), ID_CHUNK):
+            _count(counts, connection.execute(query.where(model.id.in_(ids[start:start + ID_CHUNK]))), keys)
+    return counts
+
+
+def _insert(connection):
+    return (postgresql if connection.dialect.name == "postgresql" else sqlite).insert(EntityCounter.__table__)
+
+
+def apply_deltas(connection, before: dict, after: dict) -> None:
+    """Add (after - before) to the stored counters"""
+    rows = []
+    for key in before.keys() | after.keys():
+        delta = after.get(key, 0) - before.get(key, 0)
+        if delta:
+            entity, entity_id, name, bucket = key
+            rows.append({"entity": entity, "entity_id": entity_id, "name": name, "bucket": bucket, "value": delta})
+    if not rows:
+        return
+    stmt = _insert(connection)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["entity", "entity_id", "name", "bucket"],
+        set_={"value": EntityCounter.__table__.c.value + stmt.excluded.value},
+    )
+    connection.execute(stmt, rows)
+
+
+def read_counters(db, entity: str, entity_ids: list, counters: list) -> dict:
+    """
+    {entity_id: {name: value}} for the given [(name, bucket)] counters;
+    missing counters are 0.
+    """
+    result = {entity_id: {name: 0 for name, _ in counters} for entity_id in entity_ids}
+    if not entity_ids or not counters:
+        return result
+    rows = db.query(EntityCounter.entity_id, EntityCounter.name, EntityCounter.value).filter(
+        EntityCounter.entity == entity,
+        EntityCounter.entity_id.in_(entity_ids),
+        or_(*[and_(EntityCounter.name == name, EntityCounter.bucket == bucket) for name, bucket in counters]),
+    )
+    for row in rows:
+        result[row.entity_id][row.name] = row.value
+    return result
+
+
+def reconcile(connection, dry_run: bool = False, progress=None) -> dict:
+    """
+    Recount every counter from the source tables and repair the stored values.
+    The stored values are overwritten with the counts, so the connection must
+    hold the write lock from before counting (db.begin_write) unless dry_run.
+    """
+    expected = {}
+    for index, (kind, (model, query, keys)) in enumerate(SOURCES.items()):
+        _count(expected, connection.execute(query.execution_options(yield_per=5000)), keys)
+        if progress:
+            progress((index + 1) * 80 / len(SOURCES), f"Counted {kind}")
+
+    table = EntityCounter.__table__
+    stored = {
+        (row.entity, row.entity_id, row.name, row.bucket): row.value
+        for row in connection.execute(select(table.c.entity, table.c.entity_id, table.c.name, table.c.bucket,
+                                             table.c.value))
+    }
+    drift = []
+    for key in expected.keys() | stored.keys():
+        if expected.get(key, 0) != stored.get(key, 0):
+            drift.append((key, stored.get(key, 0), expected.get(key, 0)))
+
+    if drift and not dry_run:
+        fixes = [dict(zip(("entity", "entity_id", "name", "bucket"), key), value=want) for key, _, want in drift if want]
+        stale = [key for key, _, want in drift if not want]
+        if fixes:
+            stmt = _insert(connection)
+            connection.execute(
+                stmt.on_conflict_do_update(index_elements=["entity", "entity_id", "name", "bucket"],
+                                           set_={"value": stmt.excluded.value}),
+                fixes,
+            )
+        for start in range(0, len(stale), ID_CHUNK):
+            connection.execute(delete(table).where(
+                tuple_(table.c.entity, table.c.entity_id, table.c.name, table.c.bucket).in_(stale[start:start + ID_CHUNK])
+            ))
+    return {
+        "counters": len(expected),
+        "drifted": len(drift),
+        "repaired": 0 if dry_run else len(drift),
+        "examples": [
+            {"entity": key[0], "entity_id": key[1], "name": key[2], "bucket": key[3], "stored": have, "expected": want}
+            for key, have, want in sorted(drift, key=lambda d: d[0])[:20]
+        ],
+    }
+
+
+# ORM write paths
+
+def _affected(session) -> dict:
+    """Ids of existing counted rows a flush may change, by kind"""
+    ids = {kind: set() for kind in SOURCES}
+    rescheduled = []
+    for obj in list(session.dirty) + list(session.deleted):
+        kind = MODEL_KINDS.get(type(obj))
+        if kind is not None and obj.id is not None:
+            ids[kind].add(obj.id)
+        elif isinstance(obj, Job) and obj.id is not None and inspect(obj).attrs.planned_start.history.has_changes():
+            # Moving a job moves its assignments to another week
+            rescheduled.append(obj.id)
+    if rescheduled:
+        ids["assignments"].update(session.connection().execute(
+            select(JobAssignment.id).where(JobAssignment.job_id.in_(rescheduled))
+        ).scalars())
+    return ids
+
+
+@event.listens_for(Session, "before_flush")
+def _count_before(session, flush_context, instances):
+    ids = _affected(session)
+    session.info["counter_ids"] = ids
+    session.info["counter_before"] = tally(session.connection(), **ids) if any(ids.values()) else {}
+
+
+@event.listens_for(Session, "after_flush")
+def _apply_after(session, flush_context):
+    ids = session.info.pop("counter_ids", None) or {kind: set() for kind in SOURCES}
+    before = session.info.pop("counter_before", {})
+    for obj in session.new:
+        kind = MODEL_KINDS.get(type(obj))
+        if kind is not None:
+            ids[kind].add(obj.id)
+    if before or any(ids.values()):
+        apply_deltas(session.connection(), before, tally(session.connection(), **ids))
@@ -0,0 +1,361 @@
+"""
+Global dispatch optimizer.
+
+Plans worker assignments for a whole set of jobs at once instead of greedily
+one job at a time. Jobs are swept in start order and grouped into waves of
+mutually overlapping jobs (every job in a wave contains the wave's last
+start time), so within a wave each worker can take at most one slot and
+the wave is a rectangular assignment problem: job slots (one per required
+head) against eligible workers. Each wave is solved with the Hungarian
+method in its sparse form - successive shortest augmenting paths with
+Dijkstra and node potentials - over a candidate graph that only holds each
+job's best-fitting free workers. A job's candidates are widened (doubling)
+when a slot cannot be filled or when the duals show that a worker not yet
+in the graph could improve the wave; if a new candidate undercuts the
+current potentials the wave is solved again, so each wave is exact: it
+fills the most slots possible and, among those plans, maximizes fit.
+
+Waves are solved one after another and the workers booked in a wave are
+excluded from later overlapping jobs, so across a chain of overlapping
+jobs (A overlaps B, B overlaps C, but A and C do not) the plan is not
+guaranteed optimal: an earlier wave may take the worker a later job needed
+most. The plan is reported as optimal only when no candidate was excluded
+by such a booking. Bookings outside the plan (existing assignments) are
+constraints and do not affect this.
+
+If the time budget runs out, the remaining slots are filled greedily and the
+plan is reported as not optimal.
+
+This module is pure Python with no database access; see app/routers/dispatch.py.
+"""
+import heapq
+import time
+
+# Candidates first added to a job's graph; each widening doubles the job's list
+CANDIDATE_BATCH = 16
+
+
+class DispatchJob:
+    __slots__ = ("id", "start", "end", "headcount", "requirements")
+
+    def __init__(self, id: int, start: float, end: float, headcount: int, requirements: list):
+        self.id = id
+        self.start = start  # Epoch seconds
+        self.end = end
+        self.headcount = headcount
+        self.requirements = requirements  # [(expertise_id, min_level, required)]
+
+
+class DispatchPlan:
+    __slots__ = ("assignments", "unfilled", "total_fit", "optimal", "elapsed_ms")
+
+    def __init__(self):
+        self.assignments = []  # [(job_id, worker_id, fit)]
+        self.unfilled = {}  # job_id -> missing headcount
+        self.total_fit = 0
+        self.optimal = True
+        self.elapsed_ms = 0.0
+
+
+class _Candidates:
+    """Eligible workers of one job, handed out best fit first and skipping busy workers"""
+
+    def __init__(self, job, skills, by_expertise, all_workers, busy, booked):
+        self.job = job
+        self.busy = busy  # Bookings outside the plan
+        self.booked = booked  # Bookings made by earlier waves of the plan
+        self.blocked = False  # A candidate was skipped only because of `booked`
+        self.edges = []  # [(worker_id, fit)] currently in the graph
+        self.fit = {}
+        required = [(e, lvl) for e, lvl, req in job.requirements if req]
+        if required:
+            # Start from the rarest required expertise and check the rest per worker
+            required.sort(key=lambda r: len(by_expertise.get(r[0], ())))
+            pool = by_expertise.get(required[0][0], ())
+            pool = [w for w, _ in pool if all(skills[w].get(e, 0) >= lvl for e, lvl in required)]
+            scored = set(pool)
+            rest = ()
+        else:
+            # No hard requirements: workers with any matching expertise are scored,
+            # everyone else follows with fit 0
+            scored = {w for e, _, _ in job.requirements for w, _ in by_expertise.get(e, ())}
+            pool = list(scored)
+            rest = all_workers
+        self.heap = [(-self._score(skills[w]), w) for w in pool]
+        heapq.heapify(self.heap)
+        self.rest = rest
+        self.rest_at = 0
+        self.scored = scored
+
+    def _score(self, levels: dict) -> int:
+        return sum(levels.get(e, 0) for e, lvl, _ in self.job.requirements if levels.get(e, 0) >= lvl)
+
+    def _overlaps(self, intervals) -> bool:
+        return any(s < self.job.end and self.job.start < e for s, e in intervals)
+
+    def _free(self, worker_id) -> bool:
+        if self._overlaps(self.busy.get(worker_id, ())):
+            return False
+        if self._overlaps(self.booked.get(worker_id, ())):
+            self.blocked = True
+            return False
+        return True
+
+    @property
+    def exhausted(self) -> bool:
+        return not self.heap and self.rest_at >= len(self.rest)
+
+    @property
+    def next_fit(self) -> int:
+        """Upper bound on the fit of every eligible worker not yet in the graph"""
+        return -self.heap[0][0] if self.heap else 0
+
+    def grow(self, count: int = None) -> list:
+        """Add up to count more free candidates to the graph (default: double the list). Returns the new edges."""
+        count = count or max(CANDIDATE_BATCH, len(self.edges))
+        start = len(self.edges)
+        while len(self.edges) - start < count:
+            if self.heap:
+                neg_fit, worker_id = heapq.heappop(self.heap)
+                fit = -neg_fit
+            elif self.rest_at < len(self.rest):
+                worker_id = self.rest[self.rest_at]
+                self.rest_at += 1
+                if worker_id in self.scored:
+                    continue
+                fit = 0
+            else:
+                break
+            if self._free(worker_id):
+                self.edges.append((worker_id, fit))
+                self.fit[worker_id] = fit
+        return self.edges[start:]
+
+
+class _Wave:
+    """
+    Sparse min-cost assignment for one set of mutually overlapping jobs.
+
+    Successive shortest paths from all unfilled slots at once, so each step
+    fills the slot whose cheapest augmenting path is globally shortest.
+    Potentials follow Johnson's update: unfilled slots stay at 0 and every
+    other node gains min(distance, path length), stored relative to the
+    running offset `shift` so a step only touches the nodes it finalized.
+    An edge costs max_fit - fit, so minimum cost is maximum fit.
+    """
+
+    def __init__(self, candidates: list, max_fit: int):
+        self.max_fit = max_fit
+        self.jobs = candidates
+        self.rows = []  # Slot -> its job's _Candidates
+        self.slots = {}  # _Candidates -> its slots
+        for cand in candidates:
+            self.slots[cand] = list(range(len(self.rows), len(self.rows) + cand.job.headcount))
+            self.rows.extend([cand] * cand.job.headcount)
+        self.costs = {}  # _Candidates -> [(worker_id, cost)]
+        self.reached = []  # Jobs the last failed search reached
+        self._reset()
+
+    def _reset(self):
+        """Drop the assignment (keeping the candidate graph) to solve again from scratch"""
+        self.free = {cand: list(slots) for cand, slots in self.slots.items()}  # _Candidates -> its unfilled slots
+        self.match_row = [None] * len(self.rows)
+        self.match_col = {}
+        self.row_pot = {}  # Filled slots only; unfilled slots are at -shift
+        self.col_pot = {}  # Matched workers only; the others are at 0
+        self.shift = 0
+
+    def _min_pot(self, cand) -> float:
+        """Lowest potential among a job's slots"""
+        return min((self.row_pot[row] if self.match_row[row] is not None else -self.shift)
+                   for row in self.slots[cand])
+
+    def widen(self, cands) -> bool:
+        """
+        Add candidates to jobs. Returns False if none could be added. A new
+        edge with a negative reduced cost means the current assignment is no
+        longer optimal for its size; the wave is then solved again.
+        """
+        stale = False
+        grown = False
+        for cand in cands:
+            new = cand.grow()
+            if not new:
+                continue
+            grown = True
+            edges = self.costs.setdefault(cand, [])
+            pot = self._min_pot(cand)
+            for worker_id, fit in new:
+                cost = self.max_fit - fit
+                edges.append((worker_id, cost))
+                if cost + pot - self.col_pot.get(worker_id, 0) < 0:
+                    stale = True
+        if stale:
+            self._reset()
+        return grown
+
+    def _improvable(self, cand) -> bool:
+        """
+        Could a worker not yet in the job's graph lower the cost? Unlisted
+        workers have fit <= next_fit and potential <= 0, so if no edge at
+        that bound has a negative reduced cost, none of them does.
+        """
+        return not cand.exhausted and self.max_fit - cand.next_fit + self._min_pot(cand) < 0
+
+    def augment(self) -> bool:
+        """Fill one slot along the shortest augmenting path. Returns False if none exists."""
+        rows, costs, row_pot, col_pot, match_col, shift = (
+            self.rows, self.costs, self.row_pot, self.col_pot, self.match_col, self.shift)
+        dist_col = {}
+        pred = {}
+        done = set()
+        done_rows = []
+        done_cols = []
+        heap = []
+
+        def relax(row, cand, base):
+            pot = row_pot[row] if row is not None else -shift
+            for c, cost in costs.get(cand, ()):
+                if c in done:
+                    continue
+                d = base + cost + pot - col_pot.get(c, 0)
+                if d < dist_col.get(c, float("inf")):
+                    dist_col[c] = d
+                    pred[c] = (row, cand)
+                    heapq.heappush(heap, (d, c))
+
+        # Unfilled slots of a job are interchangeable: one source per job
+        for cand, slots in self.free.items():
+            if slots:
+                relax(None, cand, 0)
+        free_col = None
+        while heap:
+            d, c = heapq.heappop(heap)
+            if c in done or d > dist_col[c]:
+                continue
+            done.add(c)
+            done_cols.append((c, d))
+            row = match_col.get(c)
+            if row is None:
+                free_col = c
+                break
+            # Filled slots have zero reduced cost back to their worker
+            done_rows.append((row, d))
+            relax(row, rows[row], d)
+        if free_col is None:
+            # Only these jobs' slots can start or continue an augmenting path
+            self.reached = [cand for cand, slots in self.free.items() if slots] + [rows[row] for row, _ in done_rows]
+            return False
+
+        total = dist_col[free_col]
+        self.shift += total
+        for row, d in done_rows:
+            row_pot[row] += d - total
+        for c, d in done_cols:
+            col_pot[c] = col_pot.get(c, 0) + d - total
+
+        c = free_col
+        while True:
+            row, cand = pred[c]
+            if row is None:
+                row = self.free[cand].pop()
+                row_pot[row] = -self.shift
+                self.match_row[row] = c
+                match_col[c] = row
+                break
+            previous = self.match_row[row]
+            self.match_row[row] = c
+            match_col[c] = row
+            c = previous
+        return True
+
+    def solve(self, deadline: float) -> bool:
+        """Fill as many slots as possible at maximum fit. Returns False if the deadline cut the search short."""
+        self.widen(self.jobs)
+        while True:
+            while any(self.free.values()):
+                if time.monotonic() > deadline:
+                    self._greedy()
+                    return False
+                if not self.augment():
+                    # No augmenting path left: widen the jobs it could have passed through
+                    if not self.widen(dict.fromkeys(self.reached)):
+                        break
+            # Optimal over the graph; check that no worker outside it would do better
+            short = [cand for cand in self.jobs if self._improvable(cand)]
+            if not short:
+                return True
+            self.widen(short)
+
+    def _greedy(self):
+        for cand, slots in self.free.items():
+            while slots:
+                free = [(fit, c) for c, fit in cand.edges if c not in self.match_col]
+                if not free:
+                    if cand.grow():
+                        continue
+                    break
+                _, c = max(free)
+                row = slots.pop()
+                self.match_row[row] = c
+                self.match_col[c] = row
+
+
+def _waves(jobs: list):
+    """Group jobs (sorted by start) into runs that all overlap a common instant"""
+    wave = []
+    min_end = None
+    for job in jobs:
+        if wave and job.start >= min_end:
+            yield wave
+            wave = []
+        min_end = job.end if not wave else min(min_end, job.end)
+        wave.append(job)
+    if wave:
+        yield wave
+
+
+def plan_dispatch(jobs: list, skills: dict, busy: dict = None, time_budget: float = 5.0) -> DispatchPlan:
+    """
+    Assign workers to jobs maximizing total expertise fit, wave by wave
+    (optimal=False when a wave's booking kept a worker from a later job).
+
+    jobs: DispatchJob list; skills: worker_id -> {expertise_id: level} for every
+    candidate worker (empty dict for workers without expertise); busy:
+    worker_id -> [(start, end)] bookings that must not be overlapped.
+    """
+    started = time.monotonic()
+    deadline = started + time_budget
+    plan = DispatchPlan()
+    busy = busy or {}
+    booked = {}  # Workers booked by earlier waves
+
+    by_expertise = {}
+    for worker_id, levels in skills.items():
+        for expertise_id, level in levels.items():
+            by_expertise.setdefault(expertise_id, []).append((worker_id, level))
+    all_workers = sorted(skills)
+
+    for wave in _waves(sorted(jobs, key=lambda j: (j.start, j.end, j.id))):
+        candidates = [_Candidates(job, skills, by_expertise, all_workers, busy, booked)
+                      for job in wave if job.headcount > 0]
+        max_fit = max((-c.heap[0][0] for c in candidates if c.heap), default=0)
+        solver = _Wave(candidates, max_fit)
+        if not solver.solve(deadline) or any(c.blocked for c in candidates):
+            plan.optimal = False
+
+        filled = {}
+        for row, worker_id in enumerate(solver.match_row):
+            cand = solver.rows[row]
+            if worker_id is None:
+                plan.unfilled[cand.job.id] = plan.unfilled.get(cand.job.id, 0) + 1
+                continue
+            fit = cand.fit[worker_id]
+            plan.assignments.append((cand.job.id, worker_id, fit))
+            plan.total_fit += fit
+            filled[worker_id] = cand.job
+        for worker_id, job in filled.items():
+            booked.setdefault(worker_id, []).append((job.start, job.end))
+
+    plan.elapsed_ms = round((time.monotonic() - started) * 1000, 1)
+    return plan
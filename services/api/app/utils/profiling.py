@@ -0,0 +1,303 @@
+"""
+On-demand per-request profiling.
+
+A request is profiled when an admin sends `X-Profile: 1`, or at random with
+probability PROFILE_SAMPLE_RATE. While it runs, a sampling thread records
+the Python stacks of every interpreter thread executing app code
+(`sys._current_frames`; sync handlers run on threadpool threads, where a
+deterministic profiler started by the middleware could not see them), and
+SQL statements issued in the request's context are captured with their
+timings. Under concurrent load, other requests' stacks can appear too.
+
+Profiles are written to a bounded on-disk ring per tenant (PROFILE_DIR, or
+PROFILE_DIR/<tenant> for other tenants; newest PROFILE_RING_SIZE kept), since
+they hold request paths, query strings and SQL, and are exported as
+speedscope JSON or a pstats file.
+When no profile is active the cost is a header lookup per request and a
+context-variable read per SQL statement.
+"""
+import json
+import marshal
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+
+from fastapi import HTTPException
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.concurrency import run_in_threadpool
+
+from app.db import DEFAULT_TENANT, current_tenant
+from app.routers.auth import get_current_user
+from app.utils.timeutil import utc_now
+
+PROFILE_DIR = os.getenv("PROFILE_DIR", "./profiles")
+PROFILE_RING_SIZE = int(os.getenv("PROFILE_RING_SIZE", "50"))
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+MAX_SQL_STATEMENTS = 1000
+
+# Only stacks passing through the app package are kept (drops idle pool threads and the idle event loop)
+_APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_active = ContextVar("active_profile", default=None)
+
+
+class RequestProfile:
+    def __init__(self, method: str, path: str, query: str, interval: float):
+        self.id = f"{utc_now():%Y%m%d%H%M%S}-{uuid.uuid4().hex[:8]}"
+        self.method = method
+        self.path = path
+        self.query = query
+        self.interval = interval
+        self.started_at = utc_now().isoformat()
+        self.frames = {}  # (file, line, name) -> index
+        self.stacks = {}  # thread name -> {stack tuple: sample count}
+        self.sql = []
+        self.sql_dropped = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self._started = None
+        self.duration_ms = None
+
+    def _frame_index(self, code) -> int:
+        key = (code.co_filename, code.co_firstlineno, code.co_name)
+        index = self.frames.get(key)
+        if index is None:
+            index = self.frames[key] = len(self.frames)
+        return index
+
+    def _sample(self):
+        own = threading.get_ident()
+        names = {t.ident: t.name for t in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            codes = []
+            in_app = False
+            while frame is not None:
+                codes.append(frame.f_code)
+                in_app = in_app or frame.f_code.co_filename.startswith(_APP_DIR)
+                frame = frame.f_back
+            if not in_app:
+                continue
+            stack = tuple(self._frame_index(code) for code in reversed(codes))
+            samples = self.stacks.setdefault(names.get(ident, str(ident)), {})
+            samples[stack] = samples.get(stack, 0) + 1
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self):
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.duration_ms = round((time.perf_counter() - self._started) * 1000, 2)
+
+    def to_dict(self, status_code: int) -> dict:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "query": self.query,
+            "status": status_code,
+            "started_at": self.started_at,
+            "duration_ms": self.duration_ms,
+            "interval_ms": self.interval * 1000,
+            "frames": [list(key) for key in self.frames],
+            "threads": {
+                name: [{"stack": list(stack), "count": count} for stack, count in samples.items()]
+                for name, samples in self.stacks.items()
+            },
+            "sql": self.sql,
+            "sql_dropped": self.sql_dropped,
+        }
+
+
+# SQL capture: statements executed in the context of an active profile
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _active.get() is not None:
+        conn.info.setdefault("profile_query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _active.get()
+    if profile is None:
+        return
+    starts = conn.info.get("profile_query_start")
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    if len(profile.sql) >= MAX_SQL_STATEMENTS:
+        profile.sql_dropped += 1
+        return
+    profile.sql.append({
+        "statement": statement,
+        "duration_ms": round(elapsed * 1000, 3),
+        "executemany": executemany,
+        "rows": cursor.rowcount,
+    })
+
+
+# Storage ring
+
+def profile_dir(tenant: str = None) -> str:
+    """Where a tenant's profiles are stored"""
+    tenant = tenant or current_tenant.get()
+    return PROFILE_DIR if tenant == DEFAULT_TENANT else os.path.join(PROFILE_DIR, tenant)
+
+
+def _profile_path(profile_id: str) -> str:
+    # Ids are generated here; reject anything that could escape the directory
+    if not profile_id or any(ch not in "0123456789abcdef-" for ch in profile_id):
+        raise FileNotFoundError(profile_id)
+    return os.path.join(profile_dir(), f"{profile_id}.json")
+
+
+def store_profile(data: dict):
+    directory = profile_dir()
+    os.makedirs(directory, exist_ok=True)
+    with open(_profile_path(data["id"]), "w") as f:
+        json.dump(data, f)
+    files = sorted(name for name in os.listdir(directory) if name.endswith(".json"))
+    for name in files[:max(len(files) - PROFILE_RING_SIZE, 0)]:
+        try:
+            os.remove(os.path.join(directory, name))
+        except OSError:
+            pass
+
+
+def list_profiles() -> list:
+    directory = profile_dir()
+    if not os.path.isdir(directory):
+        return []
+    result = []
+    for name in sorted(os.listdir(directory), reverse=True):
+        if not name.endswith(".json"):
+            continue
+        try:
+            data = load_profile(name[:-5])
+        except (OSError, ValueError):
+            continue
+        result.append({
+            "id": data["id"],
+            "method": data["method"],
+            "path": data["path"],
+            "status": data["status"],
+            "started_at": data["started_at"],
+            "duration_ms": data["duration_ms"],
+            "samples": sum(s["count"] for samples in data["threads"].values() for s in samples),
+            "sql_statements": len(data["sql"]) + data["sql_dropped"],
+        })
+    return result
+
+
+def load_profile(profile_id: str) -> dict:
+    with open(_profile_path(profile_id)) as f:
+        return json.load(f)
+
+
+# Export formats
+
+def to_speedscope(data: dict) -> dict:
+    """speedscope file format: one sampled profile per thread"""
+    interval = data["interval_ms"]
+    profiles = []
+    for name, samples in data["threads"].items():
+        total = sum(s["count"] for s in samples) * interval
+        profiles.append({
+            "type": "sampled",
+            "name": name,
+            "unit": "milliseconds",
+            "startValue": 0,
+            "endValue": total,
+            "samples": [s["stack"] for s in samples],
+            "weights": [s["count"] * interval for s in samples],
+        })
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "name": f"{data['method']} {data['path']} ({data['id']})",
+        "exporter": "workerapp",
+        "shared": {"frames": [{"name": n, "file": f, "line": l} for f, l, n in data["frames"]]},
+        "profiles": profiles,
+    }
+
+
+def to_pstats(data: dict) -> bytes:
+    """
+    Marshalled stats loadable with pstats.Stats / snakeviz. Built from samples:
+    times are sample counts x interval (seconds), call counts are sample counts.
+    Raises ValueError for a profile without samples (a request shorter than
+    the sampling interval), which pstats cannot load.
+    """
+    if not any(data["threads"].values()):
+        raise ValueError("Profile has no samples")
+    interval = data["interval_ms"] / 1000
+    keys = [tuple(frame) for frame in data["frames"]]
+    stats = {}
+
+    def entry(key):
+        return stats.setdefault(key, [0, 0, 0.0, 0.0, {}])
+
+    for samples in data["threads"].values():
+        for sample in samples:
+            count, stack = sample["count"], [keys[i] for i in sample["stack"]]
+            elapsed = count * interval
+            for key in set(stack):
+                e = entry(key)
+                e[0] += count
+                e[1] += count
+                e[3] += elapsed
+            entry(stack[-1])[2] += elapsed
+            for caller, callee in set(zip(stack, stack[1:])):
+                callers = entry(callee)[4]
+                c = callers.get(caller, [0, 0, 0.0, 0.0])
+                callers[caller] = [c[0] + count, c[1] + count, c[2] + (elapsed if callee == stack[-1] else 0.0),
+                                   c[3] + elapsed]
+    return marshal.dumps({
+        key: (cc, nc, tt, ct, {caller: tuple(v) for caller, v in callers.items()})
+        for key, (cc, nc, tt, ct, callers) in stats.items()
+    })
+
+
+# Middleware
+
+async def _wants_profile(request) -> bool:
+    if request.headers.get("x-profile") == "1":
+        try:
+            user = await run_in_threadpool(get_current_user, request.headers.get("authorization"))
+        except HTTPException:
+            return False
+        return user.get("role") == "admin"
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+async def profiling_middleware(request, call_next):
+    if "x-profile" not in request.headers and PROFILE_SAMPLE_RATE <= 0:
+        return await call_next(request)
+    if not await _wants_profile(request):
+        return await call_next(request)
+
+    profile = RequestProfile(request.method, request.url.path, request.url.query, PROFILE_INTERVAL_MS / 1000)
+    token = _active.set(profile)
+    profile.start()
+    try:
+        response = await call_next(request)
+    finally:
+        profile.stop()
+        _active.reset(token)
+    await run_in_threadpool(store_profile, profile.to_dict(response.status_code))
+    response.headers["X-Profile-Id"] = profile.id
+    return response
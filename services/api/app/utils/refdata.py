@@ -0,0 +1,232 @@
+"""
+Process-level cache of reference data: the Expertise catalog and the
+worker x expertise skill matrix.
+
+Both change rarely but are read by every matching, filtering and scheduling
+request. They are loaded lazily into `__slots__` records and a dense
+row-major `array` of levels (one byte per cell, 0 = no expertise) plus a
+parallel array of verified flags, so a lookup is an index computation
+instead of an ORM query.
+
+Invalidation is by version: commits that touch Expertise or WorkerExpertise
+bump the version in this process (session hooks below), and other processes
+notice through the sync change sequence (`sync_changes`, see
+app/utils/change_tracking.py), checked at most every REFDATA_CHECK_SECONDS.
+Readers take an immutable snapshot, so a reload never changes data under a
+request that is already using it. There is one cache per tenant database
+(`refdata` is TenantLocal, see app/utils/tenancy.py).
+"""
+import os
+import sys
+import threading
+import time
+from array import array
+
+from sqlalchemy import event, func
+from sqlalchemy.orm import Session
+
+from app.db import SessionLocal
+from app.models.models import Expertise, SyncChange, WorkerExpertise
+from app.utils.tenancy import TenantLocal
+
+REFDATA_CHECK_SECONDS = float(os.getenv("REFDATA_CHECK_SECONDS", "2"))
+REFDATA_ENTITIES = ("expertise", "worker_expertise")
+
+
+class ExpertiseRecord:
+    __slots__ = ("id", "key", "name", "category", "description")
+
+    def __init__(self, id: int, key: str, name: str, category, description):
+        self.id = id
+        self.key = key
+        self.name = name
+        self.category = category
+        self.description = description
+
+
+class SkillMatrix:
+    """Dense worker x expertise level matrix; rows are workers holding any expertise"""
+
+    def __init__(self, expertise_ids: list, rows: list):
+        self.expertise_ids = expertise_ids
+        self.column = {expertise_id: i for i, expertise_id in enumerate(expertise_ids)}
+        self.worker_ids = sorted({worker_id for worker_id, _, _, _ in rows})
+        self.row = {worker_id: i for i, worker_id in enumerate(self.worker_ids)}
+        width = len(expertise_ids)
+        self.width = width
+        cells = len(self.worker_ids) * width
+        top = max((level or 0 for _, _, level, _ in rows), default=0)
+        self.levels = array("B" if top <= 0xFF else "H", [0]) * cells
+        self.verified = array("B", [0]) * cells
+        for worker_id, expertise_id, level, verified in rows:
+            column = self.column.get(expertise_id)
+            if column is None or level is None or level <= 0:
+                continue
+            cell = self.row[worker_id] * width + column
+            self.levels[cell] = level
+            self.verified[cell] = 1 if verified else 0
+
+    def level(self, worker_id: int, expertise_id: int) -> int:
+        row = self.row.get(worker_id)
+        column = self.column.get(expertise_id)
+        if row is None or column is None:
+            return 0
+        return self.levels[row * self.width + column]
+
+    def skills(self, worker_id: int) -> dict:
+        """expertise_id -> level for one worker"""
+        row = self.row.get(worker_id)
+        if row is None:
+            return {}
+        base = row * self.width
+        levels = self.levels
+        return {e: levels[base + i] for i, e in enumerate(self.expertise_ids) if levels[base + i]}
+
+    def workers_with(self, expertise_id: int, min_level: int = 1, verified: bool = False) -> list:
+        """Worker ids holding expertise_id at min_level or above (verified only, if asked)"""
+        column = self.column.get(expertise_id)
+        if column is None:
+            return []
+        width, levels, flags = self.width, self.levels, self.verified
+        min_level = max(min_level, 1)
+        return [
+            worker_id for i, worker_id in enumerate(self.worker_ids)
+            if levels[i * width + column] >= min_level and (not verified or flags[i * width + column])
+        ]
+
+    def nbytes(self) -> int:
+        return (
+            self.levels.itemsize * len(self.levels) + len(self.verified)
+            + sys.getsizeof(self.row) + sys.getsizeof(self.column)
+            + sys.getsizeof(self.worker_ids) + sys.getsizeof(self.expertise_ids)
+        )
+
+
+class RefDataSnapshot:
+    __slots__ = ("catalog", "by_key", "matrix", "version", "seq")
+
+    def __init__(self, catalog: dict, matrix: SkillMatrix, version: int, seq: int):
+        self.catalog = catalog  # expertise_id -> ExpertiseRecord
+        self.by_key = {record.key: record for record in catalog.values()}
+        self.matrix = matrix
+        self.version = version
+        self.seq = seq  # Last sync change seq reflected in this snapshot
+
+
+class RefDataCache:
+    def __init__(self, tenant: str = None):
+        self.tenant = tenant
+        self.version = 0  # Bumped on every local commit touching reference data
+        self.current = None
+        self.lock = threading.Lock()
+        self.checked_at = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.load_ms = None
+        self.loaded_at = None
+
+    def _head_seq(self, db) -> int:
+        return db.query(func.max(SyncChange.seq)).filter(SyncChange.entity.in_(REFDATA_ENTITIES)).scalar() or 0
+
+    def _load(self, version: int) -> RefDataSnapshot:
+        started = time.perf_counter()
+        db = SessionLocal(self.tenant)
+        try:
+            # Read the change head first: a write landing mid-load leaves the snapshot behind it
+            seq = self._head_seq(db)
+            catalog = {
+                row.id: ExpertiseRecord(row.id, row.key, row.name, row.category, row.description)
+                for row in db.query(Expertise.id, Expertise.key, Expertise.name, Expertise.category,
+                                    Expertise.description).order_by(Expertise.id)
+            }
+            rows = db.query(WorkerExpertise.worker_id, WorkerExpertise.expertise_id,
+                            WorkerExpertise.level, WorkerExpertise.verified).all()
+        finally:
+            db.close()
+        snapshot = RefDataSnapshot(catalog, SkillMatrix(list(catalog), rows), version, seq)
+        self.loads += 1
+        self.load_ms = round((time.perf_counter() - started) * 1000, 2)
+        self.loaded_at = time.time()
+        return snapshot
+
+    def _changed_elsewhere(self, snapshot) -> bool:
+        now = time.monotonic()
+        if now - self.checked_at < REFDATA_CHECK_SECONDS:
+            return False
+        self.checked_at = now
+        db = SessionLocal(self.tenant)
+        try:
+            return self._head_seq(db) != snapshot.seq
+        finally:
+            db.close()
+
+    def snapshot(self) -> RefDataSnapshot:
+        """Current reference data, loading it if missing or out of date"""
+        snapshot = self.current
+        if snapshot is not None and snapshot.version == self.version and not self._changed_elsewhere(snapshot):
+            self.hits += 1
+            return snapshot
+        with self.lock:
+            # Another request may have reloaded while this one waited for the lock
+            if self.current is snapshot or self.current.version != self.version:
+                self.misses += 1
+                self.current = self._load(self.version)
+            else:
+                self.hits += 1
+            return self.current
+
+    def invalidate(self):
+        self.version += 1
+
+    def stats(self) -> dict:
+        snapshot = self.current
+        lookups = self.hits + self.misses
+        result = {
+            "version": self.version,
+            "loads": self.loads,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            "last_load_ms": self.load_ms,
+            "loaded_at": self.loaded_at,
+            "check_seconds": REFDATA_CHECK_SECONDS,
+        }
+        if snapshot is not None:
+            catalog_bytes = sum(
+                sys.getsizeof(r) + sum(sys.getsizeof(getattr(r, f)) for f in ExpertiseRecord.__slots__)
+                for r in snapshot.catalog.values()
+            ) + sys.getsizeof(snapshot.catalog) + sys.getsizeof(snapshot.by_key)
+            matrix = snapshot.matrix
+            result.update({
+                "current": snapshot.version == self.version,
+                "expertise": len(snapshot.catalog),
+                "workers": len(matrix.worker_ids),
+                "matrix_cells": len(matrix.levels),
+                "memory_bytes": {"catalog": catalog_bytes, "matrix": matrix.nbytes()},
+            })
+        return result
+
+
+refdata = TenantLocal(RefDataCache)
+
+
+# Bump the version when a commit changed reference data in this process
+
+@event.listens_for(Session, "after_flush")
+def _collect(session, flush_context):
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, (Expertise, WorkerExpertise)):
+            session.info["refdata_changed"] = True
+            return
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate(session):
+    if session.info.pop("refdata_changed", False):
+        refdata.get(session.info.get("tenant")).invalidate()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard(session):
+    session.info.pop("refdata_changed", None)
@@ -0,0 +1,164 @@
+"""
+Background task handlers (see app/utils/tasks.py).
+
+Imported by the task workers and by the tasks router, so every kind listed
+here can be enqueued through POST /api/tasks.
+"""
+import csv
+import os
+
+from fastapi import HTTPException
+from pydantic import ValidationError
+from sqlalchemy.exc import IntegrityError
+
+from app.db import SessionLocal, begin_write
+from app.models.models import User
+from app.routers.users import UserCreate, add_user, log_activity
+from app.utils import change_tracking  # noqa: F401  (workers must feed sync_changes like the API does)
+from app.utils.backup import BACKUP_COMPRESS, BackupError, backup_scheduler
+from app.utils.counters import reconcile
+from app.utils.tasks import TaskError, task
+
+EXPORT_FIELDS = ['id', 'name', 'email', 'phone', 'role', 'is_active', 'created_at']
+EXPORT_PAGE = 1000
+IMPORT_CHUNK = 200
+MAX_REPORTED_ERRORS = 100
+
+
+@task("users_export")
+def users_export(ctx):
+    """
+    Write users to a CSV file, downloadable from GET /api/tasks/{id}/download.
+    Payload: optional `role` and `is_active` filters.
+    """
+    role = ctx.payload.get("role")
+    is_active = ctx.payload.get("is_active")
+    db = SessionLocal()
+    try:
+        query = db.query(*[getattr(User, name) for name in EXPORT_FIELDS])
+        if role is not None:
+            query = query.filter(User.role == role)
+        if is_active is not None:
+            query = query.filter(User.is_active == bool(is_active))
+        total = query.count()
+
+        path = ctx.output_path("users.csv")
+        written = 0
+        last_id = 0
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(EXPORT_FIELDS)
+            # Keyset pages so memory stays flat however many users there are
+            while True:
+                rows = query.filter(User.id > last_id).order_by(User.id).limit(EXPORT_PAGE).all()
+                if not rows:
+                    break
+                writer.writerows(rows)
+                written += len(rows)
+                last_id = rows[-1].id
+                ctx.progress(written * 100 / max(total, 1), f"{written}/{total} users written")
+    finally:
+        db.close()
+    return {"file": os.path.basename(path), "rows": written}
+
+
+def _import_one(db, index: int, row: dict, errors: list) -> bool:
+    if not isinstance(row, dict):
+        errors.append({"index": index, "detail": "Row must be an object"})
+        return False
+    try:
+        add_user(db, UserCreate(**row))
+        db.flush()
+        return True
+    except ValidationError as e:
+        errors.append({"index": index, "detail": str(e.errors()[0]["msg"]) if e.errors() else str(e)})
+    except HTTPException as e:
+        errors.append({"index": index, "detail": e.detail})
+    return False
+
+
+@task("users_import", max_attempts=1)
+def users_import(ctx):
+    """
+    Create users from payload `users` (a list of UserCreate objects), committed
+    in chunks. Rows that fail validation or collide with existing users are
+    reported and skipped. Not retried: a partial import is not safe to replay blindly.
+    """
+    rows = ctx.payload.get("users")
+    if not isinstance(rows, list):
+        raise TaskError("payload.users must be a list")
+
+    created = 0
+    errors = []
+    db = SessionLocal()
+    try:
+        for start in range(0, len(rows), IMPORT_CHUNK):
+            chunk = list(enumerate(rows[start:start + IMPORT_CHUNK], start))
+            chunk_errors = []
+            try:
+                added = sum(_import_one(db, index, row, chunk_errors) for index, row in chunk)
+                db.commit()
+            except IntegrityError:
+                # A unique column (e.g. phone) collided: redo this chunk row by row
+                db.rollback()
+                added = 0
+                chunk_errors = []
+                for index, row in chunk:
+                    try:
+                        if _import_one(db, index, row, chunk_errors):
+                            db.commit()
+                            added += 1
+                    except IntegrityError as e:
+                        db.rollback()
+                        chunk_errors.append({"index": index, "detail": f"Conflicts with an existing user: {e.orig}"})
+            created += added
+            errors.extend(chunk_errors)
+            done = min(start + IMPORT_CHUNK, len(rows))
+            ctx.progress(done * 100 / max(len(rows), 1), f"{done}/{len(rows)} rows processed")
+
+        if ctx.created_by is not None:
+            log_activity(
+                db=db,
+                action="users_imported",
+                description=f"Imported {created} users ({len(errors)} rows skipped)",
+                performed_by=ctx.created_by,
+                metadata={"task_id": ctx.task_id, "created": created, "failed": len(errors)},
+            )
+    finally:
+        db.close()
+    return {"created": created, "failed": len(errors), "errors": errors[:MAX_REPORTED_ERRORS]}
+
+
+@task("counters_reconcile", max_attempts=2)
+def counters_reconcile(ctx):
+    """
+    Recount the maintained counters from the source tables and repair drift.
+    Payload: optional `dry_run` to only report it.
+    """
+    dry_run = bool(ctx.payload.get("dry_run"))
+    db = SessionLocal()
+    try:
+        if not dry_run:
+            begin_write(db)
+        result = reconcile(db.connection(), dry_run=dry_run, progress=ctx.progress)
+        db.commit()
+    finally:
+        db.close()
+    return result
+
+
+@task("db_backup", max_attempts=2)
+def db_backup(ctx):
+    """
+    Take an online snapshot of the database into BACKUP_DIR (see app/utils/backup.py).
+    Payload: optional `compress` (default BACKUP_COMPRESS) and `label`.
+    """
+    label = ctx.payload.get("label")
+    if label is not None and not (isinstance(label, str) and label.isalnum() and len(label) <= 32):
+        raise TaskError("payload.label must be up to 32 letters or digits")
+    try:
+        meta = backup_scheduler.run_now(compress=bool(ctx.payload.get("compress", BACKUP_COMPRESS)), label=label,
+                                        progress=ctx.progress)
+    except BackupError as e:
+        raise TaskError(str(e))
+    return meta
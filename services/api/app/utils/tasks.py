@@ -0,0 +1,313 @@
+"""
+Background tasks without an external broker.
+
+Tasks are rows in `background_tasks` in the application database. Request
+handlers enqueue a task and answer 202 straight away; a pool of worker
+processes started next to uvicorn (TASK_WORKERS, see the app lifespan in
+app/main.py, or run_task_workers.py for a standalone pool) claims them and
+runs the registered handler.
+
+- Claiming is a compare-and-set UPDATE on the row, so two workers never run
+  the same task.
+- A claimed task holds a lease that progress updates renew; a task whose
+  worker died is requeued once its lease expires.
+- Failures are retried with exponential backoff up to max_attempts.
+  Raise TaskError for failures that retrying cannot fix.
+- Higher priority runs first, then oldest first.
+- With several tenants (app/utils/tenancy.py) each tenant's queue lives in
+  its own database; workers take turns between tenants, one task each, so
+  a tenant with a long backlog does not starve the others.
+
+Handlers are plain functions taking a TaskContext, registered with @task in
+app/utils/task_kinds.py, and return a JSON-serializable result.
+"""
+import multiprocessing
+import os
+import signal
+import socket
+import time
+import traceback
+from datetime import timedelta
+
+from sqlalchemy import and_, func, select, update
+
+from app.db import DEFAULT_TENANT, SessionLocal, current_tenant, tenants, use_tenant
+from app.models.models import BackgroundTask
+from app.utils.timeutil import utc_now
+
+TASK_WORKERS = int(os.getenv("TASK_WORKERS", "2"))
+TASK_POLL_SECONDS = float(os.getenv("TASK_POLL_SECONDS", "1"))
+TASK_LEASE_SECONDS = int(os.getenv("TASK_LEASE_SECONDS", "300"))
+TASK_RETRY_BASE_SECONDS = float(os.getenv("TASK_RETRY_BASE_SECONDS", "10"))
+TASK_OUTPUT_DIR = os.getenv("TASK_OUTPUT_DIR", "./task_output")
+# Progress is written at most this often (plus always at 100%)
+PROGRESS_INTERVAL_SECONDS = 0.5
+
+TASK_STATUSES = ('queued', 'running', 'succeeded', 'failed')
+
+
+def task_output_dir(tenant: str = None) -> str:
+    """Where a tenant's task output files are written"""
+    tenant = tenant or current_tenant.get()
+    return TASK_OUTPUT_DIR if tenant == DEFAULT_TENANT else os.path.join(TASK_OUTPUT_DIR, tenant)
+
+
+class TaskError(Exception):
+    """Permanent task failure: recorded without retrying"""
+
+
+class LeaseLost(Exception):
+    """The task was reclaimed by another worker (our lease expired)"""
+
+
+class TaskSpec:
+    __slots__ = ("kind", "fn", "max_attempts", "roles")
+
+    def __init__(self, kind: str, fn, max_attempts: int, roles: tuple):
+        self.kind = kind
+        self.fn = fn
+        self.max_attempts = max_attempts
+        self.roles = roles  # Roles allowed to enqueue this kind through the API
+
+
+REGISTRY = {}
+
+
+def task(kind: str, max_attempts: int = 3, roles: tuple = ("admin",)):
+    """Register fn(ctx) -> result as the handler for `kind`"""
+    def register(fn):
+        REGISTRY[kind] = TaskSpec(kind, fn, max_attempts, roles)
+        return fn
+    return register
+
+
+def enqueue(db, kind: str, payload: dict = None, priority: int = 0, created_by: int = None,
+            delay_seconds: float = 0) -> BackgroundTask:
+    """Stage a task in the session (caller commits)"""
+    spec = REGISTRY[kind]
+    background_task = BackgroundTask(
+        kind=kind,
+        status='queued',
+        priority=priority,
+        payload=payload,
+        progress=0,
+        attempts=0,
+        max_attempts=spec.max_attempts,
+        run_after=utc_now() + timedelta(seconds=delay_seconds),
+        created_by=created_by,
+    )
+    db.add(background_task)
+    return background_task
+
+
+class TaskContext:
+    """Handed to task handlers: the payload plus progress reporting"""
+
+    def __init__(self, task_id: int, kind: str, payload: dict, attempt: int, created_by, worker: str):
+        self.task_id = task_id
+        self.kind = kind
+        self.payload = payload or {}
+        self.attempt = attempt
+        self.created_by = created_by
+        self.worker = worker
+        self._reported_at = 0.0
+
+    def progress(self, percent: float, message: str = None, force: bool = False):
+        """Record progress and renew the lease. Raises LeaseLost if the task was reclaimed."""
+        now = time.monotonic()
+        if not force and percent < 100 and now - self._reported_at < PROGRESS_INTERVAL_SECONDS:
+            return
+        self._reported_at = now
+        db = SessionLocal()
+        try:
+            result = db.execute(
+                update(BackgroundTask)
+                .where(BackgroundTask.id == self.task_id, BackgroundTask.worker == self.worker,
+                       BackgroundTask.status == 'running')
+                .values(progress=max(0, min(int(percent), 100)), progress_message=message,
+                        lease_until=utc_now() + timedelta(seconds=TASK_LEASE_SECONDS))
+            )
+            db.commit()
+        finally:
+            db.close()
+        if result.rowcount != 1:
+            raise LeaseLost(self.task_id)
+
+    def output_path(self, suffix: str) -> str:
+        """Path for a result file of this task under the tenant's TASK_OUTPUT_DIR"""
+        directory = task_output_dir()
+        os.makedirs(directory, exist_ok=True)
+        return os.path.join(directory, f"{self.task_id}-{suffix}")
+
+
+# Worker side
+
+def _reclaim_expired(db):
+    """Requeue (or fail, when out of attempts) running tasks whose lease ran out"""
+    now = utc_now()
+    expired = and_(BackgroundTask.status == 'running', BackgroundTask.lease_until < now)
+    # Look first (ix_background_tasks_claim serves the status): an UPDATE takes
+    # SQLite's write lock even when it matches nothing, and idle workers poll often
+    if db.execute(select(BackgroundTask.id).where(expired).limit(1)).first() is None:
+        return
+    db.execute(
+        update(BackgroundTask)
+        .where(expired, BackgroundTask.attempts >= BackgroundTask.max_attempts)
+        .values(status='failed', error="Worker stopped responding (lease expired)", finished_at=now)
+    )
+    db.execute(
+        update(BackgroundTask)
+        .where(expired)
+        .values(status='queued', error="Worker stopped responding (lease expired)", run_after=now)
+    )
+
+
+def claim(worker: str):
+    """Claim the next due task for this worker. Returns the claimed row or None."""
+    db = SessionLocal()
+    try:
+        _reclaim_expired(db)
+        now = utc_now()
+        due = and_(BackgroundTask.status == 'queued', BackgroundTask.run_after <= now)
+        candidates = db.execute(
+            select(BackgroundTask.id)
+            .where(due)
+            .order_by(BackgroundTask.priority.desc(), BackgroundTask.run_after, BackgroundTask.id)
+            .limit(5)
+        ).scalars().all()
+        for task_id in candidates:
+            # Compare-and-set: only one worker's UPDATE matches a still-queued row
+            claimed = db.execute(
+                update(BackgroundTask)
+                .where(BackgroundTask.id == task_id, due)
+                .values(status='running', worker=worker, attempts=BackgroundTask.attempts + 1,
+                        lease_until=now + timedelta(seconds=TASK_LEASE_SECONDS), started_at=now)
+            )
+            if claimed.rowcount == 1:
+                db.commit()
+                return db.get(BackgroundTask, task_id)
+        db.commit()
+        return None
+    finally:
+        db.close()
+
+
+def _finish(task_id: int, worker: str, **values):
+    db = SessionLocal()
+    try:
+        db.execute(
+            update(BackgroundTask)
+            .where(BackgroundTask.id == task_id, BackgroundTask.worker == worker,
+                   BackgroundTask.status == 'running')
+            .values(**values)
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def run_one(worker: str) -> bool:
+    """Claim and run one task. Returns False when nothing was due."""
+    claimed = claim(worker)
+    if claimed is None:
+        return False
+    spec = REGISTRY.get(claimed.kind)
+    if spec is None:
+        _finish(claimed.id, worker, status='failed', error=f"Unknown task kind: {claimed.kind}",
+                finished_at=utc_now())
+        return True
+
+    ctx = TaskContext(claimed.id, claimed.kind, claimed.payload, claimed.attempts, claimed.created_by, worker)
+    try:
+        result = spec.fn(ctx)
+    except LeaseLost:
+        return True
+    except TaskError as e:
+        _finish(claimed.id, worker, status='failed', error=str(e), finished_at=utc_now())
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}\n{traceback.format_exc(limit=5)}"
+        if claimed.attempts < claimed.max_attempts:
+            backoff = TASK_RETRY_BASE_SECONDS * 2 ** (claimed.attempts - 1)
+            _finish(claimed.id, worker, status='queued', error=error, lease_until=None,
+                    run_after=utc_now() + timedelta(seconds=backoff))
+        else:
+            _finish(claimed.id, worker, status='failed', error=error, finished_at=utc_now())
+    else:
+        _finish(claimed.id, worker, status='succeeded', result=result, progress=100, lease_until=None,
+                finished_at=utc_now())
+    return True
+
+
+def worker_main(stop_event, index: int):
+    """Entry point of a worker process"""
+    # Ctrl+C reaches the whole process group; the parent stops us through stop_event
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    from app.utils import task_kinds  # noqa: F401  (registers the handlers)
+
+    worker = f"{socket.gethostname()}:{os.getpid()}:{index}"
+    while not stop_event.is_set():
+        ran = False
+        for tenant in tenants():
+            if stop_event.is_set():
+                return
+            try:
+                with use_tenant(tenant):
+                    ran = run_one(worker) or ran
+            except Exception:
+                traceback.print_exc()
+        if not ran:
+            stop_event.wait(TASK_POLL_SECONDS)
+
+
+class TaskPool:
+    """Worker processes started and stopped with the API process"""
+
+    def __init__(self):
+        self.context = multiprocessing.get_context("spawn")
+        self.stop_event = None
+        self.processes = []
+
+    def start(self, workers: int = TASK_WORKERS):
+        if self.processes or workers <= 0:
+            return
+        self.stop_event = self.context.Event()
+        for index in range(workers):
+            process = self.context.Process(
+                target=worker_main, args=(self.stop_event, index), name=f"task-worker-{index}", daemon=True
+            )
+            process.start()
+            self.processes.append(process)
+
+    def stop(self, timeout: float = 10.0):
+        """Let workers finish their current task; stragglers are terminated and their tasks requeued on lease expiry"""
+        if not self.processes:
+            return
+        self.stop_event.set()
+        deadline = time.monotonic() + timeout
+        for process in self.processes:
+            process.join(max(deadline - time.monotonic(), 0))
+            if process.is_alive():
+                process.terminate()
+                process.join(1)
+        self.processes = []
+
+    def stats(self) -> dict:
+        db = SessionLocal()
+        try:
+            counts = dict(
+                db.query(BackgroundTask.status, func.count(BackgroundTask.id)).group_by(BackgroundTask.status).all()
+            )
+            oldest = db.query(func.min(BackgroundTask.run_after)).filter(
+                BackgroundTask.status == 'queued', BackgroundTask.run_after <= utc_now()
+            ).scalar()
+        finally:
+            db.close()
+        return {
+            "workers": len(self.processes),
+            "workers_alive": sum(1 for p in self.processes if p.is_alive()),
+            "counts": {status: counts.get(status, 0) for status in TASK_STATUSES},
+            "oldest_due_seconds": round((utc_now() - oldest).total_seconds(), 1) if oldest else None,
+        }
+
+
+task_pool = TaskPool()
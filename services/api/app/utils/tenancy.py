@@ -0,0 +1,111 @@
+"""
+Per-tenant routing.
+
+Each tenant (contractor company, listed in TENANTS) has its own database
+(see app/db.py), so one tenant's writes never wait for another's file lock.
+TenantMiddleware resolves the tenant of each request and sets
+`current_tenant`, which SessionLocal() and the per-tenant caches follow.
+The tenant is named by the host: `acme.example.com` is tenant `acme`, and
+any other host is the default tenant, which is only served when TENANTS is
+empty or lists `default`.
+
+Tokens issued by a tenant carry it as a suffix,
+`demo-token-{id}-{role}@{tenant}` (none for the default tenant). The suffix
+is not signed, so it never selects a database on its own: a token must
+name the tenant of the host it is used on. A token from another tenant, or
+a tenant not in TENANTS, is rejected before any database is opened.
+
+Process-level structures that hold one database's data (reference-data
+cache, availability index, clock writer) are TenantLocal: one instance per
+tenant, created on first use, with attribute access going to the current
+tenant's instance so call sites stay `refdata.snapshot()`.
+"""
+import threading
+
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers
+
+from app.db import DEFAULT_TENANT, TENANT_NAME, current_tenant, is_tenant
+
+
+def split_token(token: str) -> tuple:
+    """(token without tenant suffix, tenant or None)"""
+    token, _, tenant = token.partition("@")
+    return token, (tenant.strip().lower() or None)
+
+
+def tenant_token(token: str, tenant: str) -> str:
+    """Token as issued by a tenant"""
+    return token if tenant == DEFAULT_TENANT else f"{token}@{tenant}"
+
+
+def tenant_from_host(host: str):
+    """Tenant named by the first label of a host name, if it is one"""
+    name = host.rsplit(":", 1)[0].strip().lower() if not host.startswith("[") else ""
+    label, dot, _ = name.partition(".")
+    if dot and TENANT_NAME.match(label) and is_tenant(label):
+        return label
+    return None
+
+
+def resolve_tenant(headers: Headers) -> str:
+    """Tenant of a request. Raises LookupError (unknown) or ValueError (token of another tenant)."""
+    tenant = tenant_from_host(headers.get("host", "")) or DEFAULT_TENANT
+    if not is_tenant(tenant):
+        raise LookupError("No tenant: use your company's host name")
+    authorization = headers.get("authorization")
+    if authorization and (split_token(authorization)[1] or DEFAULT_TENANT) != tenant:
+        raise ValueError("Token was issued by another tenant")
+    return tenant
+
+
+class TenantMiddleware:
+    """Sets current_tenant for API requests"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith("/api/"):
+            await self.app(scope, receive, send)
+            return
+        try:
+            tenant = resolve_tenant(Headers(scope=scope))
+        except LookupError as e:
+            await JSONResponse(status_code=404, content={"detail": str(e)})(scope, receive, send)
+            return
+        except ValueError as e:
+            await JSONResponse(status_code=400, content={"detail": str(e)})(scope, receive, send)
+            return
+        # Endpoints running in the threadpool inherit this context
+        token = current_tenant.set(tenant)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_tenant.reset(token)
+
+
+class TenantLocal:
+    """One instance of factory(tenant) per tenant; attributes resolve on the current tenant's"""
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._instances = {}
+        self._lock = threading.Lock()
+
+    def get(self, tenant: str = None):
+        tenant = tenant or current_tenant.get()
+        instance = self._instances.get(tenant)
+        if instance is None:
+            with self._lock:
+                instance = self._instances.get(tenant)
+                if instance is None:
+                    instance = self._instances[tenant] = self._factory(tenant)
+        return instance
+
+    def instances(self) -> list:
+        """[(tenant, instance)] created so far"""
+        return list(self._instances.items())
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
@@ -0,0 +1,25 @@
+from datetime import datetime, timezone
+
+
+def naive_utc(value: datetime) -> datetime:
+    """Convert to the naive UTC datetimes SQLite stores (naive values are assumed UTC)"""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def to_epoch(value: datetime) -> float:
+    """Seconds since the epoch (naive values are assumed UTC)"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def from_epoch(epoch: float) -> datetime:
+    """Naive UTC datetime for seconds since the epoch"""
+    return datetime.fromtimestamp(epoch, timezone.utc).replace(tzinfo=None)
+
+
+def utc_now() -> datetime:
+    """Current time as a naive UTC datetime"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
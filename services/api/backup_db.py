@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Online backups of the SQLite database (see app/utils/backup.py).
+Snapshots can be taken while the API is running; restoring replaces the
+live database, so stop the API first.
+Run inside the API container or with DATABASE_URL set. With several
+tenants, pick the database with --tenant.
+
+Usage:
+  python backup_db.py snapshot [--no-compress] [--label nightly]
+  python backup_db.py --tenant acme snapshot
+  python backup_db.py list
+  python backup_db.py verify test-20250101T020000000000Z.db.gz
+  python backup_db.py restore test-20250101T020000000000Z.db.gz --yes
+"""
+import argparse
+import json
+import sys
+
+# Add app to path so we can import the backup helpers
+sys.path.insert(0, '/app')
+from app.db import DEFAULT_TENANT, is_tenant, use_tenant
+from app.utils.backup import (
+    BACKUP_COMPRESS, BACKUP_PAGES_PER_STEP, BACKUP_STEP_SLEEP_MS, BackupError, list_backups, restore, snapshot,
+    verify,
+)
+
+
+def _size(n) -> str:
+    return f"{n / 1e6:.1f} MB" if n is not None else "?"
+
+
+def cmd_snapshot(args) -> int:
+    meta = snapshot(compress=args.compress, pages=args.pages, sleep_ms=args.sleep_ms, label=args.label)
+    lock_wait = meta["writer_lock_wait"]
+    print(f"Wrote {meta['file']} ({_size(meta['file_bytes'])}, database {_size(meta['database_bytes'])})")
+    print(f"  {meta['pages']} pages in {meta['steps']} steps, {meta['restarts']} restarts, "
+          f"{meta['copy_seconds']} s: {meta['pages_per_second']} pages/s, {meta['mb_per_second']} MB/s")
+    baseline, during = lock_wait["baseline"], lock_wait["during_backup"]
+    print(f"  Writer lock wait p50/p95/max: baseline {baseline['p50_ms']}/{baseline['p95_ms']}/"
+          f"{baseline['max_ms']} ms, during backup " + (
+              "none (WAL: writers do not wait for the backup)" if during is None else
+              f"up to one step, {during['p50_ms']}/{during['p95_ms']}/{during['max_ms']} ms "
+              f"({during['samples']} steps)"))
+    for name in meta["rotated"]:
+        print(f"  Rotated out {name}")
+    return 0
+
+
+def cmd_list(args) -> int:
+    backups = list_backups()
+    if not backups:
+        print("No backups")
+    for meta in backups:
+        print(f"{meta['file']:<60} {_size(meta.get('file_bytes')):>10}  {meta.get('created_at', '')}")
+    return 0
+
+
+def cmd_verify(args) -> int:
+    result = verify(args.file)
+    print(json.dumps(result, indent=2))
+    return 0 if result["ok"] else 1
+
+
+def cmd_restore(args) -> int:
+    if not args.yes:
+        print("Restoring replaces the live database. Stop the API, then re-run with --yes.")
+        return 2
+    if not args.no_safety_snapshot:
+        meta = snapshot(label="prerestore")
+        print(f"Saved the current database as {meta['file']}")
+    result = restore(args.file)
+    print(f"Restored {result['file']} to {result['restored_to']} in {result['seconds']} s "
+          f"(schema revision {result['schema_revision']})")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Online SQLite backups")
+    parser.add_argument("--tenant", default=DEFAULT_TENANT, help="Tenant whose database to use")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    take = commands.add_parser("snapshot", help="Take a backup while the API keeps running")
+    take.add_argument("--no-compress", dest="compress", action="store_false", default=BACKUP_COMPRESS,
+                      help="Store the database file uncompressed")
+    take.add_argument("--compress", dest="compress", action="store_true", help="gzip the backup")
+    take.add_argument("--label", help="Appended to the file name (letters and digits)")
+    take.add_argument("--pages", type=int, default=BACKUP_PAGES_PER_STEP, help="Pages copied per step")
+    take.add_argument("--sleep-ms", type=float, default=BACKUP_STEP_SLEEP_MS, help="Pause between steps")
+    take.set_defaults(run=cmd_snapshot)
+
+    commands.add_parser("list", help="List stored backups").set_defaults(run=cmd_list)
+
+    check = commands.add_parser("verify", help="Check a backup's checksum and integrity")
+    check.add_argument("file", help="Backup file name (in BACKUP_DIR) or path")
+    check.set_defaults(run=cmd_verify)
+
+    back = commands.add_parser("restore", help="Replace the database with a verified backup")
+    back.add_argument("file", help="Backup file name (in BACKUP_DIR) or path")
+    back.add_argument("--yes", action="store_true", help="Confirm that the API is stopped")
+    back.add_argument("--no-safety-snapshot", action="store_true",
+                      help="Do not back up the current database first")
+    back.set_defaults(run=cmd_restore)
+
+    args = parser.parse_args()
+    if getattr(args, "label", None) and not args.label.isalnum():
+        parser.error("--label must be letters and digits")
+    if not is_tenant(args.tenant):
+        parser.error(f"Unknown tenant: {args.tenant} (see TENANTS)")
+    try:
+        with use_tenant(args.tenant):
+            return args.run(args)
+    except BackupError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
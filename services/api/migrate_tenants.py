@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Apply the Alembic migrations (alembic/versions) to every tenant database,
+several shards at a time. Each shard is migrated in its own process:
+Alembic's migration context is process-global, and separate processes keep
+one slow shard from holding up the others.
+
+Databases the API created (tables but no alembic_version) are matched to a
+revision first: one with the whole current schema is stamped head; one with
+only the first release's tables is stamped 0001 and upgraded; one that a
+later release's create_all() partly updated is completed the way the API
+does on startup and stamped head.
+Requires alembic (pip install alembic); run from services/api with
+DATABASE_URL, TENANTS and TENANT_DATABASE_URL set as for the API.
+
+Usage:
+  python migrate_tenants.py                  # Every tenant, up to 4 at a time
+  python migrate_tenants.py --jobs 8
+  python migrate_tenants.py --tenant acme --tenant globex
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# Add app to path so we can import the tenant configuration
+sys.path.insert(0, '/app')
+import app.models.models  # noqa: F401 (registers the tables for missing_schema)
+from app.db import Base, is_tenant, missing_schema, tenant_url, tenants, upgrade_schema
+
+ALEMBIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "alembic")
+# Tables of the first release: revision 0001, plus activity_logs, which its
+# create_all() made but no migration creates
+BASELINE_REVISION = "0001"
+BASELINE_TABLES = {
+    "users", "jobs", "job_assignments", "time_entries", "job_change_log", "completion_records", "expertise",
+    "worker_expertise", "job_required_expertise", "activity_logs",
+}
+
+
+def migrate(tenant: str, revision: str) -> dict:
+    """Bring one tenant database to `revision` (runs in a worker process)"""
+    from alembic import command
+    from alembic.config import Config
+    from alembic.runtime.migration import MigrationContext
+    from alembic.script import ScriptDirectory
+    from sqlalchemy import create_engine, inspect
+    from sqlalchemy.engine import make_url
+    from sqlalchemy.pool import NullPool
+
+    started = time.perf_counter()
+    url = tenant_url(tenant)
+    database = make_url(url).database
+    if url.startswith("sqlite") and database and database != ":memory:":
+        os.makedirs(os.path.dirname(os.path.abspath(database)), exist_ok=True)
+
+    config = Config(os.path.join(ALEMBIC_DIR, "alembic.ini"))
+    config.set_main_option("script_location", ALEMBIC_DIR)
+    config.set_main_option("sqlalchemy.url", url.replace("%", "%%"))
+
+    engine = create_engine(url, poolclass=NullPool)
+    try:
+        with engine.connect() as connection:
+            before = MigrationContext.configure(connection).get_current_revision()
+            tables = {t for t in inspect(connection).get_table_names() if not t.startswith("sqlite_")}
+
+        if before is not None or not tables:
+            command.upgrade(config, revision)
+            action = "upgraded"
+        elif tables <= BASELINE_TABLES:
+            # First release's schema, created without Alembic
+            command.stamp(config, BASELINE_REVISION)
+            command.upgrade(config, revision)
+            action = "upgraded"
+        else:
+            # create_all() of a later release: only the current schema can be recognized
+            if revision not in ("head", ScriptDirectory.from_config(config).get_current_head()):
+                raise RuntimeError(f"Database created by the API can only be migrated to head, not {revision}")
+            action = "stamped"
+            if missing_schema(engine):
+                Base.metadata.create_all(bind=engine)
+                upgrade_schema(engine)
+                action = "completed"
+            command.stamp(config, "head")
+    finally:
+        engine.dispose()
+
+    engine = create_engine(url, poolclass=NullPool)
+    try:
+        with engine.connect() as connection:
+            after = MigrationContext.configure(connection).get_current_revision()
+    finally:
+        engine.dispose()
+    return {"tenant": tenant, "action": action, "from": before, "to": after,
+            "seconds": round(time.perf_counter() - started, 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate every tenant database in parallel")
+    parser.add_argument("--tenant", action="append", help="Tenant to migrate (repeatable; default all)")
+    parser.add_argument("--jobs", type=int, default=min(4, os.cpu_count() or 1), help="Shards migrated at once")
+    parser.add_argument("--revision", default="head", help="Target revision")
+    args = parser.parse_args()
+
+    try:
+        # The alembic/ scripts folder would satisfy a bare `import alembic`
+        from alembic import command  # noqa: F401
+    except ImportError:
+        print("Error: alembic is not installed (pip install alembic)", file=sys.stderr)
+        return 1
+    selected = args.tenant or tenants()
+    for tenant in selected:
+        if not is_tenant(tenant):
+            parser.error(f"Unknown tenant: {tenant} (see TENANTS)")
+
+    failed = 0
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=max(args.jobs, 1), mp_context=multiprocessing.get_context("spawn")) as pool:
+        futures = {pool.submit(migrate, tenant, args.revision): tenant for tenant in selected}
+        for future in as_completed(futures):
+            tenant = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                failed += 1
+                print(f"{tenant:<32} FAILED  {type(e).__name__}: {e}")
+                continue
+            print(f"{tenant:<32} {result['action']:<9} {result['from'] or '-'} -> {result['to']} "
+                  f"({result['seconds']} s)")
+
+    print(f"{len(selected) - failed}/{len(selected)} tenants migrated in {time.perf_counter() - started:.1f} s")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Recount the denormalized counters (entity_counters) from the source tables
+and repair any drift. Run once after upgrading to fill the counters for
+existing rows, and whenever data was changed outside the API.
+Run inside the API container or with DATABASE_URL set.
+
+Usage:
+  python reconcile_counters.py               # Repair (every tenant)
+  python reconcile_counters.py --dry-run     # Only report drift
+  python reconcile_counters.py --tenant acme # One tenant
+"""
+import argparse
+import json
+import sys
+
+# Add app to path so we can import the counters
+sys.path.insert(0, '/app')
+from app.db import SessionLocal, begin_write, is_tenant, tenants
+from app.utils.counters import reconcile
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recount and repair entity counters")
+    parser.add_argument("--dry-run", action="store_true", help="Report drift without repairing it")
+    parser.add_argument("--tenant", action="append", help="Tenant to reconcile (repeatable; default all)")
+    args = parser.parse_args()
+    selected = args.tenant or tenants()
+    for tenant in selected:
+        if not is_tenant(tenant):
+            parser.error(f"Unknown tenant: {tenant} (see TENANTS)")
+
+    drifted = 0
+    for tenant in selected:
+        db = SessionLocal(tenant)
+        try:
+            if not args.dry_run:
+                begin_write(db)
+            result = reconcile(db.connection(), dry_run=args.dry_run)
+            db.commit()
+        finally:
+            db.close()
+
+        if len(selected) > 1:
+            print(f"[{tenant}]")
+        print(f"Counters: {result['counters']}")
+        print(f"Drifted:  {result['drifted']}")
+        print(f"Repaired: {result['repaired']}")
+        for example in result["examples"]:
+            print("  " + json.dumps(example))
+        drifted += result["drifted"]
+    return 1 if args.dry_run and drifted else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
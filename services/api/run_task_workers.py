@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+Run the background task workers on their own, e.g. when the API runs several
+uvicorn workers (set TASK_WORKERS=0 for the API so only this pool runs tasks).
+Run inside the API container or with DATABASE_URL set.
+
+Usage:
+  python run_task_workers.py            # TASK_WORKERS processes (default 2)
+  python run_task_workers.py --workers 4
+"""
+import argparse
+import signal
+import sys
+import threading
+
+# Add app to path so we can import the task queue
+sys.path.insert(0, '/app')
+from app.utils.tasks import TASK_WORKERS, task_pool
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run background task workers")
+    parser.add_argument("--workers", type=int, default=max(TASK_WORKERS, 1), help="Worker processes")
+    args = parser.parse_args()
+
+    stopped = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stopped.set())
+    signal.signal(signal.SIGINT, lambda *_: stopped.set())
+
+    task_pool.start(args.workers)
+    print(f"Started {args.workers} task workers; Ctrl+C to stop")
+    stopped.wait()
+    print("Stopping task workers...")
+    task_pool.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+"""
+API tests run against a throwaway SQLite database.
+Run from services/api: python -m pytest tests
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Configure the app before it is imported: settings are read at import time
+_DATA_DIR = tempfile.mkdtemp(prefix="workerapp-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_DATA_DIR, 'test.db')}"
+os.environ.setdefault("ADMISSION_ENABLED", "false")
+os.environ.setdefault("TASK_WORKERS", "0")
+os.environ.setdefault("TASK_OUTPUT_DIR", os.path.join(_DATA_DIR, "task_output"))
+os.environ.setdefault("PROFILE_DIR", os.path.join(_DATA_DIR, "profiles"))
+os.environ.setdefault("BACKUP_DIR", os.path.join(_DATA_DIR, "backups"))
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+ADMIN = {"Authorization": "demo-token-1-admin"}
+
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    with TestClient(app) as test_client:
+        yield test_client
@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse
+
+from app.utils import admission
+from app.utils.admission import AdmissionController
+
+
+@pytest.fixture(autouse=True)
+def enabled(monkeypatch):
+    monkeypatch.setattr(admission, "ADMISSION_ENABLED", True)
+
+
+def _request(path, method="GET", headers=None):
+    scope = {"type": "http", "method": method, "path": path, "query_string": b"", "client": ("172.18.0.5", 40000),
+             "headers": [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()]}
+    return Request(scope)
+
+
+async def _ok(request):
+    return PlainTextResponse("ok")
+
+
+def _statuses(controller, requests):
+    async def run():
+        return [(await controller(request, _ok)).status_code for request in requests]
+    return asyncio.run(run())
+
+
+def test_login_storm_from_one_proxy_address_is_not_rate_limited_per_caller():
+    controller = AdmissionController(user_rate=1, user_burst=2, global_rate=1000, global_burst=1000)
+    statuses = _statuses(controller, [_request("/api/auth/login", "POST") for _ in range(50)])
+    assert statuses == [200] * 50
+
+
+def test_login_storm_is_still_capped_by_the_global_bucket():
+    controller = AdmissionController(user_rate=1, user_burst=2, global_rate=1, global_burst=10)
+    statuses = _statuses(controller, [_request("/api/auth/login", "POST") for _ in range(20)])
+    assert statuses.count(200) == 10 and statuses.count(429) == 10
+
+
+def test_other_unauthenticated_requests_share_the_caller_bucket():
+    controller = AdmissionController(user_rate=1, user_burst=2, global_rate=1000, global_burst=1000)
+    statuses = _statuses(controller, [_request("/api/users/") for _ in range(5)])
+    assert statuses == [200, 200, 429, 429, 429]
+
+
+def _concurrent_statuses(controller, requests, hold=0.2):
+    async def slow(request):
+        await asyncio.sleep(hold)
+        return PlainTextResponse("ok")
+
+    async def run():
+        responses = await asyncio.gather(*(controller(request, slow) for request in requests))
+        return [response.status_code for response in responses]
+    return asyncio.run(run())
+
+
+def test_clock_events_do_not_queue_behind_the_write_lane():
+    controller = AdmissionController(user_rate=1000, user_burst=1000, global_rate=1000, global_burst=1000,
+                                     max_writes=1, queue_budget_ms=50)
+    writes = _concurrent_statuses(controller, [_request("/api/users/", "POST") for _ in range(8)])
+    assert writes.count(200) == 1 and writes.count(503) == 7
+    clock = _concurrent_statuses(controller, [_request("/api/clock/events", "POST") for _ in range(8)])
+    assert clock == [200] * 8
@@ -0,0 +1,47 @@
+from datetime import timedelta
+
+from sqlalchemy import create_engine, insert
+
+from app.db import DATABASE_URL, DEFAULT_TENANT, SessionLocal
+from app.models.models import Job, JobAssignment, User
+from app.utils import availability
+from app.utils.change_tracking import change_row, record_changes
+from app.utils.timeutil import to_epoch, utc_now
+
+
+def test_booking_from_another_process_is_seen(client, monkeypatch):
+    monkeypatch.setattr(availability, "AVAILABILITY_CHECK_SECONDS", 0)
+    index = availability.availability_index.get(DEFAULT_TENANT)
+    db = SessionLocal()
+    try:
+        worker_id = db.query(User.id).filter(User.email == "worker3@example.com").scalar()
+    finally:
+        db.close()
+    start = utc_now().replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=3, hours=8)
+    end = start + timedelta(hours=8)
+
+    def free():
+        windows = index.find_windows([worker_id], to_epoch(start), to_epoch(end), 8 * 3600, 1, 1)
+        return bool(windows)
+
+    assert free()
+
+    # Another process (a task worker) books the worker: no commit hook runs here
+    other = create_engine(DATABASE_URL)
+    try:
+        with other.begin() as connection:
+            job_id = connection.execute(insert(Job).values(
+                title="Elsewhere", site_address="Main St 1", client_name="Acme",
+                planned_start=start, planned_end=end, status="planned",
+            )).inserted_primary_key[0]
+            assignment_id = connection.execute(insert(JobAssignment).values(
+                job_id=job_id, worker_id=worker_id,
+            )).inserted_primary_key[0]
+            record_changes(connection, [
+                change_row("job", job_id, "upsert", None, job_id),
+                change_row("assignment", assignment_id, "upsert", worker_id, job_id),
+            ])
+    finally:
+        other.dispose()
+
+    assert not free()
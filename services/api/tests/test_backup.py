@@ -0,0 +1,45 @@
+import sqlite3
+import threading
+
+from app.utils.backup import database_path, resolve, snapshot, verify
+
+
+def test_snapshot_under_concurrent_writes_is_consistent(client):
+    path = database_path()
+    setup = sqlite3.connect(path, timeout=5)
+    setup.execute("CREATE TABLE IF NOT EXISTS backup_load (id INTEGER PRIMARY KEY, payload TEXT)")
+    setup.executemany("INSERT INTO backup_load (payload) VALUES (?)", [("x" * 500,)] * 2000)
+    setup.commit()
+    setup.close()
+
+    stop = threading.Event()
+    written = []
+
+    def write():
+        connection = sqlite3.connect(path, timeout=5)
+        try:
+            while not stop.is_set():
+                connection.execute("INSERT INTO backup_load (payload) VALUES (?)", ("y" * 500,))
+                connection.commit()
+                written.append(1)
+                stop.wait(0.002)
+        finally:
+            connection.close()
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    try:
+        # Small steps with pauses, so the writer commits while the copy is in progress
+        meta = snapshot(compress=False, pages=8, sleep_ms=1)
+    finally:
+        stop.set()
+        writer.join()
+
+    assert written and meta["steps"] > 1
+    copy = sqlite3.connect(resolve(meta["file"]))
+    try:
+        assert copy.execute("PRAGMA integrity_check").fetchone()[0] == "ok"
+        assert copy.execute("SELECT count(*) FROM backup_load").fetchone()[0] >= 2000
+    finally:
+        copy.close()
+    assert verify(meta["file"])["ok"]
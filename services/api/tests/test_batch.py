@@ -0,0 +1,67 @@
+from conftest import ADMIN
+
+
+def _create(client, email, phone=None):
+    response = client.post("/api/users/", headers=ADMIN,
+                           json={"name": email.split("@")[0], "email": email, "phone": phone, "role": "worker"})
+    assert response.status_code in (200, 201), response.text
+    return response.json()
+
+
+def test_failed_operation_changes_are_not_committed(client):
+    first = _create(client, "batch-a@example.com")
+    second = _create(client, "batch-b@example.com")
+    response = client.post("/api/batch", headers=ADMIN, json={"operations": [
+        {"op": "update", "user_id": first["id"], "data": {"name": "Renamed", "email": "admin@example.com"}},
+        {"op": "update", "user_id": second["id"], "data": {"name": "X"}},
+    ]})
+    body = response.json()
+    assert body["committed"] and body["applied"] == 1 and body["failed"] == 1
+    assert [r["status"] for r in body["results"]] == [400, 200]
+    assert client.get(f"/api/users/{first['id']}", headers=ADMIN).json()["name"] == "batch-a"
+    assert client.get(f"/api/users/{second['id']}", headers=ADMIN).json()["name"] == "X"
+
+
+def test_integrity_error_fails_only_that_operation(client):
+    _create(client, "batch-c@example.com", phone="+15550001")
+    target = _create(client, "batch-d@example.com")
+    response = client.post("/api/batch", headers=ADMIN, json={"operations": [
+        {"op": "update", "user_id": target["id"], "data": {"name": "Before"}},
+        {"op": "update", "user_id": target["id"], "data": {"name": "Dup", "phone": "+15550001"}},
+        {"op": "create", "data": {"name": "New", "email": "batch-e@example.com", "role": "worker"}},
+    ]})
+    assert response.status_code == 200
+    body = response.json()
+    assert [r["status"] for r in body["results"]] == [200, 409, 201]
+    assert body["committed"] and body["applied"] == 2
+    assert client.get(f"/api/users/{target['id']}", headers=ADMIN).json()["name"] == "Before"
+    assert client.get(f"/api/users/{body['results'][2]['user']['id']}", headers=ADMIN).status_code == 200
+
+
+def test_atomic_batch_rolls_back_everything(client):
+    target = _create(client, "batch-f@example.com")
+    response = client.post("/api/batch", headers=ADMIN, json={"atomic": True, "operations": [
+        {"op": "create", "data": {"name": "Kept?", "email": "batch-g@example.com", "role": "worker"}},
+        {"op": "update", "user_id": target["id"], "data": {"name": "Changed"}},
+        {"op": "deactivate", "user_id": 1},
+    ]})
+    body = response.json()
+    assert (body["committed"], body["applied"], body["failed"]) == (False, 0, 1)
+    assert [r["status"] for r in body["results"]] == [424, 424, 400]
+    assert [r["user"] for r in body["results"]] == [None, None, None]
+    assert body["results"][0]["detail"] == "Not applied: operation 2 failed and the batch is atomic"
+    assert client.get(f"/api/users/{target['id']}", headers=ADMIN).json()["name"] == "batch-f"
+    users = client.get("/api/users/", headers=ADMIN, params={"limit": 500}).json()
+    emails = [u["email"] for u in (users["items"] if isinstance(users, dict) else users)]
+    assert "batch-g@example.com" not in emails
+
+
+def test_atomic_batch_stops_at_the_first_failure(client):
+    response = client.post("/api/batch", headers=ADMIN, json={"atomic": True, "operations": [
+        {"op": "update", "user_id": 999999, "data": {"name": "Missing"}},
+        {"op": "create", "data": {"name": "Never", "email": "batch-h@example.com", "role": "worker"}},
+    ]})
+    body = response.json()
+    assert [(r["status"], r["user"]) for r in body["results"]] == [(404, None), (424, None)]
+    users = client.get("/api/users/", headers=ADMIN, params={"email_prefix": "batch-h@"}).json()
+    assert users == []
@@ -0,0 +1,78 @@
+from concurrent.futures import Future
+from datetime import timedelta
+
+from app.db import DEFAULT_TENANT, SessionLocal
+from app.models.models import Job, JobAssignment, TimeEntry, User
+from app.utils.clock_ingest import ClockEventIn, ClockWriter
+from app.utils.timeutil import utc_now
+
+
+def _assigned_job(email):
+    db = SessionLocal()
+    try:
+        worker_id = db.query(User.id).filter(User.email == email).scalar()
+        start = utc_now() - timedelta(hours=2)
+        job = Job(title="Clocked", site_address="Main St 1", client_name="Acme",
+                  planned_start=start, planned_end=start + timedelta(hours=8))
+        db.add(job)
+        db.flush()
+        db.add(JobAssignment(job_id=job.id, worker_id=worker_id))
+        db.commit()
+        return worker_id, job.id
+    finally:
+        db.close()
+
+
+def _open_entries(worker_id, job_id):
+    db = SessionLocal()
+    try:
+        return db.query(TimeEntry.id).filter(TimeEntry.worker_id == worker_id, TimeEntry.job_id == job_id,
+                                             TimeEntry.end_time.is_(None)).count()
+    finally:
+        db.close()
+
+
+def test_batches_queued_together_share_one_commit(client):
+    worker_id, job_id = _assigned_job("worker1@example.com")
+    at = utc_now() - timedelta(minutes=30)
+    writer = ClockWriter(DEFAULT_TENANT)
+    batches = [
+        [ClockEventIn(worker_id, "in-1", job_id, "in", at)],
+        # Second device of the same worker: the entry opened above is still open
+        [ClockEventIn(worker_id, "in-2", job_id, "in", at + timedelta(minutes=1))],
+        # Retry of the first batch
+        [ClockEventIn(worker_id, "in-1", job_id, "in", at)],
+    ]
+    futures = []
+    for events in batches:
+        future = Future()
+        writer.queue.put((events, future))
+        futures.append(future)
+    writer._ensure_started()
+    try:
+        results = [future.result(timeout=10)[0] for future in futures]
+    finally:
+        writer.stop()
+
+    assert (writer.groups, writer.batches) == (1, 3)
+    assert results[0]["status"] == "accepted"
+    assert results[1] == {"status": "rejected", "detail": "Already clocked in to this job", "time_entry_id": None}
+    assert results[2] == {"status": "duplicate", "detail": None, "time_entry_id": results[0]["time_entry_id"]}
+    assert _open_entries(worker_id, job_id) == 1
+
+
+def test_events_are_committed_before_the_response(client):
+    worker_id, job_id = _assigned_job("worker2@example.com")
+    at = (utc_now() - timedelta(minutes=10)).isoformat()
+    headers = {"Authorization": f"demo-token-{worker_id}-worker"}
+    event = {"idempotency_key": "shift-start", "job_id": job_id, "type": "in", "at": at}
+
+    first = client.post("/api/clock/events", headers=headers, json={"events": [event]}).json()
+    assert first["accepted"] == 1
+    # Acknowledged only after the group's commit: visible to any other session
+    assert _open_entries(worker_id, job_id) == 1
+
+    retry = client.post("/api/clock/events", headers=headers, json={"events": [event]}).json()
+    assert retry["duplicates"] == 1
+    assert retry["results"][0]["time_entry_id"] == first["results"][0]["time_entry_id"]
+    assert _open_entries(worker_id, job_id) == 1
@@ -0,0 +1,67 @@
+from fastapi import FastAPI
+from fastapi.responses import FileResponse, JSONResponse
+from fastapi.testclient import TestClient
+
+from app.utils import compression
+from app.utils.compression import CompressionMiddleware, _etag_matches
+
+
+def _client(tmp_path, size):
+    path = tmp_path / "export.csv"
+    path.write_text("id,name\n" + "".join(f"{i},worker {i}\n" for i in range(size)))
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware)
+
+    @app.api_route("/download", methods=["GET", "HEAD"])
+    def download():
+        return FileResponse(path, filename="export.csv", media_type="text/csv")
+
+    @app.get("/list")
+    def listing():
+        return JSONResponse([{"id": i, "name": f"worker {i}"} for i in range(200)])
+
+    return TestClient(app), path
+
+
+def test_etag_matching_handles_weak_and_strong_tags():
+    assert _etag_matches('"abc"', '"abc"')
+    assert _etag_matches('W/"abc"', '"abc"')
+    assert _etag_matches('"x", "abc"', 'W/"abc"')
+    assert not _etag_matches('"abd"', '"abc"')
+
+
+def test_file_download_revalidates_with_its_strong_etag(tmp_path):
+    client, _ = _client(tmp_path, 10)
+    first = client.get("/download", headers={"Accept-Encoding": "identity"})
+    etag = first.headers["etag"]
+    assert not etag.startswith("W/")
+    second = client.get("/download", headers={"If-None-Match": etag})
+    assert second.status_code == 304 and second.content == b""
+
+
+def test_large_file_download_is_not_buffered(tmp_path, monkeypatch):
+    monkeypatch.setattr(compression, "COMPRESSION_MAX_BYTES", 64 * 1024)
+    client, path = _client(tmp_path, 50000)
+    response = client.get("/download", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert "content-encoding" not in response.headers
+    assert int(response.headers["content-length"]) == path.stat().st_size
+    assert response.content == path.read_bytes()
+    small_client, _ = _client(tmp_path, 100)
+    assert small_client.get("/download", headers={"Accept-Encoding": "gzip"}).headers["content-encoding"] == "gzip"
+
+
+def test_json_is_compressed_and_revalidated(tmp_path):
+    client, _ = _client(tmp_path, 10)
+    first = client.get("/list", headers={"Accept-Encoding": "gzip"})
+    assert first.headers["content-encoding"] == "gzip"
+    second = client.get("/list", headers={"Accept-Encoding": "gzip", "If-None-Match": first.headers["etag"]})
+    assert second.status_code == 304
+
+
+def test_head_keeps_the_content_length(tmp_path):
+    client, path = _client(tmp_path, 100)
+    response = client.head("/download", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert "content-encoding" not in response.headers
+    assert int(response.headers["content-length"]) == path.stat().st_size
@@ -0,0 +1,49 @@
+import threading
+from datetime import datetime, timedelta
+
+from app.db import SessionLocal, begin_write
+from app.models.models import Job, TimeEntry, User
+from app.utils.counters import reconcile
+
+
+def test_write_during_reconcile_is_not_lost(client):
+    db = SessionLocal()
+    start = datetime(2025, 3, 3, 8, 0)
+    job = Job(title="Counted", site_address="Main St 1", client_name="Acme",
+              planned_start=start, planned_end=start + timedelta(hours=8))
+    db.add(job)
+    db.commit()
+    job_id = job.id
+    worker_id = db.query(User.id).filter(User.role == "worker").first()[0]
+    db.close()
+
+    def clock_in():
+        session = SessionLocal()
+        try:
+            session.add(TimeEntry(job_id=job_id, worker_id=worker_id, start_time=start))
+            session.commit()
+        finally:
+            session.close()
+
+    writer = threading.Thread(target=clock_in)
+
+    def progress(percent, message):
+        # Another request clocks in after the time entries were counted
+        if message == "Counted time_entries":
+            writer.start()
+            writer.join(0.5)
+
+    db = SessionLocal()
+    try:
+        begin_write(db)
+        reconcile(db.connection(), progress=progress)
+        db.commit()
+    finally:
+        db.close()
+    writer.join()
+
+    db = SessionLocal()
+    try:
+        assert reconcile(db.connection(), dry_run=True)["drifted"] == 0
+    finally:
+        db.close()
@@ -0,0 +1,79 @@
+import random
+
+import pytest
+
+from app.utils import dispatch
+from app.utils.dispatch import DispatchJob, plan_dispatch
+
+H = 3600
+
+
+def _brute_force(jobs, skills):
+    """(slots filled, total fit) of the best plan for jobs that all overlap"""
+    slots = [job for job in jobs for _ in range(job.headcount)]
+
+    def fit(job, levels):
+        if any(required and levels.get(e, 0) < lvl for e, lvl, required in job.requirements):
+            return None
+        return sum(levels.get(e, 0) for e, lvl, _ in job.requirements if levels.get(e, 0) >= lvl)
+
+    def best(i, used):
+        if i == len(slots):
+            return (0, 0)
+        result = best(i + 1, used)
+        for worker_id, levels in skills.items():
+            f = None if worker_id in used else fit(slots[i], levels)
+            if f is not None:
+                filled, total = best(i + 1, used | {worker_id})
+                result = max(result, (filled + 1, total + f))
+        return result
+
+    return best(0, frozenset())
+
+
+@pytest.fixture
+def small_batches(monkeypatch):
+    # Start every job with one candidate so widening is exercised
+    monkeypatch.setattr(dispatch, "CANDIDATE_BATCH", 1)
+
+
+def test_widened_candidates_can_replace_earlier_choices(small_batches):
+    skills = {0: {0: 3, 1: 6, 2: 9}, 1: {0: 7, 1: 9, 2: 9}, 2: {1: 7, 2: 5}}
+    jobs = [DispatchJob(0, 0, 10, 1, [(1, 1, False)]), DispatchJob(1, 0, 10, 1, [(0, 1, False)])]
+    plan = plan_dispatch(jobs, skills)
+    assert plan.optimal
+    assert sorted(plan.assignments) == [(0, 2, 7), (1, 1, 7)]
+    assert plan.total_fit == 14
+
+
+def test_single_wave_matches_brute_force(small_batches):
+    rng = random.Random(1)
+    for _ in range(200):
+        skills = {w: {e: rng.randint(1, 9) for e in range(3) if rng.random() < 0.6} for w in range(rng.randint(2, 6))}
+        jobs = [DispatchJob(i, 0, 10, rng.randint(1, 2),
+                            [(e, rng.randint(1, 5), rng.random() < 0.4) for e in rng.sample(range(3), rng.randint(0, 2))])
+                for i in range(rng.randint(1, 3))]
+        plan = plan_dispatch(jobs, skills)
+        assert plan.optimal
+        assert (len(plan.assignments), plan.total_fit) == _brute_force(jobs, skills)
+
+
+def test_chain_of_overlapping_jobs_is_not_reported_optimal():
+    # A overlaps B and B overlaps C; the best plan (A=2, B=1, C=2) scores 16
+    jobs = [DispatchJob(1, 8 * H, 10 * H, 1, [(1, 1, False)]),
+            DispatchJob(2, 9 * H, 11 * H, 1, [(2, 1, False)]),
+            DispatchJob(3, 10 * H, 12 * H, 1, [(3, 1, False)])]
+    skills = {1: {1: 5, 2: 5, 3: 1}, 2: {1: 1, 2: 5, 3: 10}}
+    plan = plan_dispatch(jobs, skills)
+    assert not plan.optimal
+    assert plan.total_fit <= 16
+    by_job = {job_id: worker_id for job_id, worker_id, _ in plan.assignments}
+    assert by_job[1] != by_job[2] and by_job[2] != by_job[3]
+
+
+def test_bookings_outside_the_plan_keep_it_optimal():
+    jobs = [DispatchJob(1, 8 * H, 10 * H, 1, [(1, 1, False)])]
+    skills = {1: {1: 5}, 2: {1: 3}}
+    plan = plan_dispatch(jobs, skills, busy={1: [(9 * H, 12 * H)]})
+    assert plan.optimal
+    assert plan.assignments == [(1, 2, 3)]
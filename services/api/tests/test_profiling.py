@@ -0,0 +1,32 @@
+import pstats
+
+import pytest
+
+from app.utils.profiling import to_pstats
+from conftest import ADMIN
+
+
+def _profile(threads):
+    return {"interval_ms": 5, "frames": [["app.py", 1, "handler"], ["app.py", 9, "query"]], "threads": threads}
+
+
+def test_pstats_export_loads(tmp_path):
+    path = tmp_path / "profile.pstats"
+    path.write_bytes(to_pstats(_profile({"MainThread": [{"count": 3, "stack": [0, 1]}]})))
+    stats = pstats.Stats(str(path))
+    assert stats.total_calls == 6
+
+
+def test_pstats_export_rejects_empty_profile():
+    with pytest.raises(ValueError):
+        to_pstats(_profile({"MainThread": []}))
+    with pytest.raises(ValueError):
+        to_pstats(_profile({}))
+
+
+def test_empty_profile_download_is_409(client, monkeypatch):
+    from app.utils import profiling
+    monkeypatch.setattr(profiling, "load_profile", lambda profile_id: _profile({}))
+    response = client.get("/api/admin/profiles/0123abcd", headers=ADMIN, params={"format": "pstats"})
+    assert response.status_code == 409
+    assert client.get("/api/admin/profiles/0123abcd", headers=ADMIN, params={"format": "raw"}).status_code == 200
@@ -0,0 +1,32 @@
+from sqlalchemy import create_engine, inspect, text
+
+import app.models.models  # noqa: F401 (registers the tables)
+from app.db import Base, upgrade_schema
+
+
+def test_database_from_an_older_version_is_upgraded(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as connection:
+        # jobs and users as the first version created them
+        connection.execute(text(
+            "CREATE TABLE jobs (id INTEGER NOT NULL PRIMARY KEY, title VARCHAR NOT NULL, "
+            "site_address VARCHAR NOT NULL, client_name VARCHAR NOT NULL, description TEXT, priority VARCHAR, "
+            "planned_start DATETIME NOT NULL, planned_end DATETIME NOT NULL, status VARCHAR NOT NULL, "
+            "created_at DATETIME DEFAULT CURRENT_TIMESTAMP, updated_at DATETIME)"))
+        connection.execute(text(
+            "CREATE TABLE users (id INTEGER NOT NULL PRIMARY KEY, name VARCHAR NOT NULL, email VARCHAR NOT NULL UNIQUE, "
+            "phone VARCHAR UNIQUE, role VARCHAR NOT NULL, is_active BOOLEAN, password_hash VARCHAR, "
+            "created_at DATETIME DEFAULT CURRENT_TIMESTAMP)"))
+        connection.execute(text(
+            "INSERT INTO jobs (title, site_address, client_name, planned_start, planned_end, status) "
+            "VALUES ('Roof', 'Main St 1', 'Acme', '2025-01-01 08:00', '2025-01-01 16:00', 'planned')"))
+
+    Base.metadata.create_all(bind=engine)
+    added = upgrade_schema(engine)
+
+    assert "jobs.required_headcount" in added
+    assert {"ix_users_name_id", "ix_users_role_id"} <= set(added)
+    with engine.connect() as connection:
+        assert connection.execute(text("SELECT required_headcount FROM jobs")).scalar() == 1
+    assert "clock_events" in inspect(engine).get_table_names()
+    assert upgrade_schema(engine) == []
@@ -0,0 +1,65 @@
+from datetime import datetime, timedelta
+
+from app.db import SessionLocal
+from app.models.models import Job, JobAssignment, User
+
+
+def _worker_headers(db, email):
+    worker = db.query(User).filter(User.email == email).one()
+    return worker.id, {"Authorization": f"demo-token-{worker.id}-worker"}
+
+
+def _assign(db, worker_id):
+    start = datetime(2025, 4, 7, 8, 0)
+    job = Job(title="Synced", site_address="Main St 1", client_name="Acme",
+              planned_start=start, planned_end=start + timedelta(hours=8))
+    db.add(job)
+    db.flush()
+    assignment = JobAssignment(job_id=job.id, worker_id=worker_id)
+    db.add(assignment)
+    db.commit()
+    return assignment
+
+
+def test_moved_assignment_is_deleted_for_the_old_worker(client):
+    db = SessionLocal()
+    try:
+        old_id, old_worker = _worker_headers(db, "worker1@example.com")
+        new_id, new_worker = _worker_headers(db, "worker2@example.com")
+        assignment = _assign(db, old_id)
+        old_token = client.get("/api/sync", headers=old_worker).json()["token"]
+        new_token = client.get("/api/sync", headers=new_worker).json()["token"]
+
+        assignment.worker_id = new_id
+        db.commit()
+        assignment_id = assignment.id
+    finally:
+        db.close()
+
+    old = client.get("/api/sync", headers=old_worker, params={"since": old_token}).json()
+    assert old["assignments"] == []
+    assert assignment_id in old["deleted"]["assignments"]
+
+    new = client.get("/api/sync", headers=new_worker, params={"since": new_token}).json()
+    assert [a["id"] for a in new["assignments"]] == [assignment_id]
+    assert assignment_id not in new["deleted"].get("assignments", [])
+
+
+def test_deleted_assignment_is_a_tombstone(client):
+    db = SessionLocal()
+    try:
+        worker_id, worker = _worker_headers(db, "worker3@example.com")
+        assignment = _assign(db, worker_id)
+        assignment_id = assignment.id
+        full = client.get("/api/sync", headers=worker).json()
+        assert assignment_id in [a["id"] for a in full["assignments"]]
+
+        db.delete(assignment)
+        db.commit()
+    finally:
+        db.close()
+
+    delta = client.get("/api/sync", headers=worker, params={"since": full["token"]}).json()
+    assert delta["full"] is False
+    assert delta["assignments"] == []
+    assert delta["deleted"] == {"assignments": [assignment_id]}
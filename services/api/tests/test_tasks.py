@@ -0,0 +1,40 @@
+from datetime import timedelta
+
+from sqlalchemy import event
+
+from app.db import DEFAULT_TENANT, SessionLocal, get_engine
+from app.models.models import BackgroundTask
+from app.utils.tasks import claim
+from app.utils.timeutil import utc_now
+
+
+def test_idle_poll_does_not_write(client):
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement.split(None, 1)[0].upper())
+
+    engine = get_engine(DEFAULT_TENANT)
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        assert claim("idle-worker") is None
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    assert statements and set(statements) == {"SELECT"}
+
+
+def test_expired_lease_is_requeued_and_claimed(client):
+    db = SessionLocal()
+    try:
+        stuck = BackgroundTask(kind="noop", status="running", attempts=1, worker="gone",
+                               run_after=utc_now() - timedelta(hours=1),
+                               lease_until=utc_now() - timedelta(minutes=1))
+        db.add(stuck)
+        db.commit()
+        stuck_id = stuck.id
+    finally:
+        db.close()
+
+    claimed = claim("new-worker")
+    assert claimed.id == stuck_id
+    assert (claimed.worker, claimed.attempts) == ("new-worker", 2)
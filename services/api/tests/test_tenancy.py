@@ -0,0 +1,52 @@
+import pytest
+from starlette.datastructures import Headers
+
+from app import db
+from app.db import use_tenant
+from app.utils import profiling
+from app.utils.tenancy import resolve_tenant
+
+
+@pytest.fixture
+def tenants(monkeypatch):
+    monkeypatch.setattr(db, "TENANTS", ["acme", "globex"])
+
+
+def _headers(host, token=None):
+    headers = {"host": host}
+    if token:
+        headers["authorization"] = token
+    return Headers(headers)
+
+
+def test_host_names_the_tenant(tenants):
+    assert resolve_tenant(_headers("acme.example.com")) == "acme"
+    assert resolve_tenant(_headers("globex.example.com:8080", "demo-token-1-admin@globex")) == "globex"
+
+
+def test_token_cannot_select_another_tenant(tenants):
+    with pytest.raises(ValueError):
+        resolve_tenant(_headers("acme.example.com", "demo-token-1-admin@globex"))
+    with pytest.raises(ValueError):
+        resolve_tenant(_headers("acme.example.com", "demo-token-1-admin"))
+    # Without a tenant host the suffix alone does not pick a database
+    with pytest.raises(LookupError):
+        resolve_tenant(_headers("localhost:8000", "demo-token-1-admin@globex"))
+
+
+def test_single_tenant_deployment_serves_default():
+    assert resolve_tenant(_headers("localhost:8000", "demo-token-1-admin")) == db.DEFAULT_TENANT
+    with pytest.raises(ValueError):
+        resolve_tenant(_headers("localhost:8000", "demo-token-1-admin@globex"))
+
+
+def test_profiles_are_stored_per_tenant(tenants):
+    profile = {"id": "00000000-0000-0000-0000-0000000000ab", "method": "GET", "path": "/api/users/",
+               "status": 200, "started_at": "", "duration_ms": 1, "threads": {}, "sql": [], "sql_dropped": 0}
+    with use_tenant("acme"):
+        profiling.store_profile(profile)
+        assert [p["id"] for p in profiling.list_profiles()] == [profile["id"]]
+    with use_tenant("globex"):
+        assert profiling.list_profiles() == []
+        with pytest.raises(OSError):
+            profiling.load_profile(profile["id"])
@@ -0,0 +1,14 @@
+from conftest import ADMIN
+
+
+def test_summary_counts_every_user(client):
+    summary = client.get("/api/users/summary", headers=ADMIN).json()
+    first = client.get("/api/users/", headers=ADMIN, params={"limit": 1})
+    assert len(first.json()) == 1
+    assert first.headers["X-Next-Cursor"]
+    assert summary["total"] == sum(summary["by_role"].values()) >= 5
+    assert summary["by_role"]["worker"] >= 3
+
+
+def test_summary_is_admin_only(client):
+    assert client.get("/api/users/summary", headers={"Authorization": "demo-token-3-worker"}).status_code == 403
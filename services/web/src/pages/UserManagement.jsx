@@ -1,8 +1,15 @@
 import React, { useEffect, useState } from 'react';
 import { useNavigate } from 'react-router-dom';
 
+const PAGE_SIZE = 50;
+const SEARCH_DELAY_MS = 300;
+
 const UserManagement = () => {
     const [users, setUsers] = useState([]);
+    const [summary, setSummary] = useState(null);
+    const [nextCursor, setNextCursor] = useState(null);
+    const [loadingMore, setLoadingMore] = useState(false);
+    const [search, setSearch] = useState('');
     const [loading, setLoading] = useState(true);
     const [error, setError] = useState(null);
     const [currentUser, setCurrentUser] = useState(null);
@@ -15,9 +22,14 @@ const UserManagement = () => {
 
     useEffect(() => {
         fetchCurrentUser();
-        fetchUsers();
     }, []);
 
+    // First page on load, and again (after a pause in typing) when the search changes
+    useEffect(() => {
+        const timer = setTimeout(fetchUsers, search ? SEARCH_DELAY_MS : 0);
+        return () => clearTimeout(timer);
+    }, [search]);
+
     const fetchCurrentUser = async () => {
         const token = localStorage.getItem('token');
         if (!token) {
@@ -48,6 +60,15 @@ const UserManagement = () => {
         }
     };
 
+    // Query parameters of the list: one page at a time, filtered on the server
+    const listParams = (cursor) => {
+        const params = new URLSearchParams({ limit: String(PAGE_SIZE) });
+        const term = search.trim();
+        if (term) params.set(term.includes('@') ? 'email_prefix' : 'name_prefix', term);
+        if (cursor) params.set('cursor', cursor);
+        return params;
+    };
+
     const fetchUsers = async () => {
         const token = localStorage.getItem('token');
         if (!token) {
@@ -56,13 +77,17 @@ const UserManagement = () => {
         }
 
         try {
-            const response = await fetch('/api/users/', {
-                headers: { 'Authorization': token }
-            });
+            const [response, summaryResponse] = await Promise.all([
+                fetch(`/api/users/?${listParams(null)}`, { headers: { 'Authorization': token } }),
+                fetch('/api/users/summary', { headers: { 'Authorization': token } })
+            ]);
 
             if (response.ok) {
-                const data = await response.json();
-                setUsers(data);
+                setUsers(await response.json());
+                setNextCursor(response.headers.get('X-Next-Cursor'));
+                if (summaryResponse.ok) {
+                    setSummary(await summaryResponse.json());
+                }
             } else if (response.status === 403) {
                 setError('Access denied. Admin privileges required.');
             } else if (response.status === 401) {
@@ -78,6 +103,29 @@ const UserManagement = () => {
         }
     };
 
+    const loadMore = async () => {
+        const token = localStorage.getItem('token');
+        if (!nextCursor || loadingMore) return;
+        setLoadingMore(true);
+        try {
+            const response = await fetch(`/api/users/?${listParams(nextCursor)}`, {
+                headers: { 'Authorization': token }
+            });
+            if (response.ok) {
+                const page = await response.json();
+                setUsers(previous => previous.concat(page));
+                setNextCursor(response.headers.get('X-Next-Cursor'));
+            } else {
+                alert('Failed to load more users');
+            }
+        } catch (err) {
+            console.error('Error fetching users:', err);
+            alert('Error connecting to server');
+        } finally {
+            setLoadingMore(false);
+        }
+    };
+
     const handleLogout = () => {
         localStorage.removeItem('token');
         localStorage.removeItem('role');
@@ -269,35 +317,43 @@ const UserManagement = () => {
 
             <div style={styles.stats}>
                 <div style={styles.statCard}>
-                    <div style={styles.statNumber}>{users.length}</div>
+                    <div style={styles.statNumber}>{summary ? summary.total : '–'}</div>
                     <div style={styles.statLabel}>Total Users</div>
                 </div>
                 <div style={styles.statCard}>
                     <div style={styles.statNumber}>
-                        {users.filter(u => u.role === 'admin').length}
+                        {summary ? summary.by_role.admin : '–'}
                     </div>
                     <div style={styles.statLabel}>Admins</div>
                 </div>
                 <div style={styles.statCard}>
                     <div style={styles.statNumber}>
-                        {users.filter(u => u.role === 'manager').length}
+                        {summary ? summary.by_role.manager : '–'}
                     </div>
                     <div style={styles.statLabel}>Managers</div>
                 </div>
                 <div style={styles.statCard}>
                     <div style={styles.statNumber}>
-                        {users.filter(u => u.role === 'worker').length}
+                        {summary ? summary.by_role.worker : '–'}
                     </div>
                     <div style={styles.statLabel}>Workers</div>
                 </div>
                 <div style={styles.statCard}>
                     <div style={styles.statNumber}>
-                        {users.filter(u => u.is_active).length}
+                        {summary ? summary.active : '–'}
                     </div>
                     <div style={styles.statLabel}>Active</div>
                 </div>
             </div>
 
+            <input
+                type="search"
+                value={search}
+                onChange={(e) => setSearch(e.target.value)}
+                placeholder="Search by name or email (starts with, case-sensitive)"
+                style={styles.searchInput}
+            />
+
             <div style={styles.tableContainer}>
                 <table style={styles.table}>
                     <thead>
@@ -379,6 +435,14 @@ const UserManagement = () => {
                 </table>
             </div>
 
+            {nextCursor && (
+                <div style={styles.loadMore}>
+                    <button onClick={loadMore} style={styles.secondaryButton} disabled={loadingMore}>
+                        {loadingMore ? 'Loading...' : 'Load more'}
+                    </button>
+                </div>
+            )}
+
             {/* Create/Edit Modal */}
             {showModal && (
                 <div style={styles.modalOverlay} onClick={closeModal}>
@@ -551,6 +615,20 @@ const styles = {
         gap: '15px',
         marginBottom: '30px'
     },
+    searchInput: {
+        width: '100%',
+        padding: '10px',
+        marginBottom: '15px',
+        border: '1px solid #dee2e6',
+        borderRadius: '4px',
+        fontSize: '14px',
+        boxSizing: 'border-box'
+    },
+    loadMore: {
+        display: 'flex',
+        justifyContent: 'center',
+        marginTop: '20px'
+    },
     tr: {
         borderBottom: '1px solid #dee2e6',
         transition: 'background-color 0.2s'